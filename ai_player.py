@@ -0,0 +1,83 @@
+from config import CONTROL_PANEL_HEIGHT, TOTAL_HEIGHT, WIDTH, AI_PLAN_TOLERANCE
+from collision import predict_intercept
+
+class InterceptAI:
+    """
+    Event-driven ai paddle.
+
+    Instead of chasing the ball every tick, the ai predicts where the ball
+    will meet its paddle face (wall bounces included, see collision.py) once
+    per trajectory, i.e. after a paddle hit or a serve, and sends that height
+    as a plan packet through the engine. Plans are absolute, so a lost plan is
+    simply never acted on and a reordered old plan is ignored. Released plans
+    are followed by the paddle at its (difficulty scaled) speed.
+    While the ball moves away the paddle heads back to the middle.
+    """
+    def __init__(self, paddle, ball, engine, rng, difficulty):
+        self.paddle = paddle
+        self.ball = ball
+        self.engine = engine
+        # anything with uniform(), draws the aim error per plan
+        self.rng = rng
+        self.speed = paddle.speed * difficulty['speed']
+        self.aim_error = difficulty['aim_error']
+        self.plans_made = 0
+        self.plans_sent = 0
+        self.reset()
+
+    def reset(self):
+        """Forget plans in flight, hold the current position"""
+        self.stale = True
+        self.last_sent = None
+        self.target_y = self.paddle.centery
+        self.applied_sequence = -1
+
+    def invalidate(self):
+        """The ball's trajectory changed (paddle hit, serve), plan again on the next tick"""
+        self.stale = True
+
+    def plan(self):
+        """Send a new plan if the trajectory changed since the last one. Cheap otherwise"""
+        if not self.stale:
+            return
+        self.stale = False
+        self.plans_made += 1
+
+        ball = self.ball
+        paddle = self.paddle
+        # the face the ball touches: left side of the right paddle or right side of the left one
+        if paddle.centerx > WIDTH // 2:
+            face_x = paddle.left - ball.width
+        else:
+            face_x = paddle.right
+        intercept_y = predict_intercept(ball.position_x, ball.position_y, ball.width,
+                                        ball.velocity_x, ball.velocity_y, face_x)
+        if intercept_y is None:
+            target = (CONTROL_PANEL_HEIGHT + TOTAL_HEIGHT) / 2
+        else:
+            target = intercept_y + ball.height / 2
+            if self.aim_error:
+                target += self.rng.uniform(-self.aim_error, self.aim_error)
+        half_height = paddle.height / 2
+        target = min(max(target, CONTROL_PANEL_HEIGHT + half_height), TOTAL_HEIGHT - half_height)
+
+        if self.last_sent is not None and abs(target - self.last_sent) < AI_PLAN_TOLERANCE:
+            return
+        self.engine.queue_input(paddle, target)
+        self.last_sent = target
+        self.plans_sent += 1
+
+    def on_packet(self, packet):
+        """A plan was released to the paddle"""
+        if packet.sequence > self.applied_sequence:
+            self.applied_sequence = packet.sequence
+            self.target_y = packet.data
+
+    def follow(self, tick_scale):
+        """Move the paddle towards the released plan for one tick"""
+        paddle = self.paddle
+        difference = self.target_y - paddle.centery
+        if abs(difference) < 1:
+            return
+        speed = self.speed * tick_scale
+        paddle.y += round(min(max(difference, -speed), speed))
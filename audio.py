@@ -0,0 +1,78 @@
+"""
+Game audio, loaded off the main thread.
+
+The audio device is opened on the main thread (SDL subsystem init isn't
+thread-safe, and it's cheap), decoding the sound effects and starting the
+music happen on a background thread, so the first frame is drawn without
+waiting for them. Sounds that aren't loaded yet are skipped. The background music is
+streamed from disk by pygame.mixer.music instead of being decoded whole
+into a Sound.
+"""
+import threading
+import time
+
+import pygame
+
+from config import AUDIO_FILES, MUSIC_FILE, MUSIC_VOLUME
+
+class GameAudio:
+    def __init__(self, enabled=True):
+        # False: the mixer is never initialized (--no-audio)
+        self.enabled = enabled
+        # name -> pygame.mixer.Sound, filled in by the loader thread
+        self.sounds = {}
+        self.music_volume = MUSIC_VOLUME
+        self.music_playing = False
+        # ms from start() until everything was loaded, None while loading
+        self.load_ms = None
+        self._loader = None
+
+    def start(self):
+        """
+        Open the mixer, then start the music and load sounds in the background,
+        returns once the device is open. Call it from the main thread
+        """
+        if not self.enabled:
+            return
+        start = time.perf_counter()
+        try:
+            pygame.mixer.pre_init(44100, -16, 2, 512)
+            pygame.mixer.init()
+        except pygame.error as error:
+            print(f"Warning: Could not open audio device ({error}). Sound will be disabled.")
+            self.enabled = False
+            return
+        self._loader = threading.Thread(target=self._load, args=(start,), name="audio loader", daemon=True)
+        self._loader.start()
+
+    def _load(self, start):
+        # music first, it's what the player notices missing
+        try:
+            pygame.mixer.music.load(MUSIC_FILE)
+            pygame.mixer.music.set_volume(self.music_volume)
+            pygame.mixer.music.play(-1)
+            self.music_playing = True
+            # in case it was muted while loading
+            pygame.mixer.music.set_volume(self.music_volume)
+        except (FileNotFoundError, pygame.error):
+            print(f"Warning: Could not load {MUSIC_FILE}. Music will be disabled.")
+
+        for name, filename in AUDIO_FILES.items():
+            try:
+                # only ever added whole, the game loop reads the dict without a lock
+                self.sounds[name] = pygame.mixer.Sound(filename)
+            except (FileNotFoundError, pygame.error):
+                print(f"Warning: Could not load {filename}. Sound will be disabled.")
+        self.load_ms = (time.perf_counter() - start) * 1000
+
+    def play(self, name):
+        """Play a sound effect, nothing if audio is off or it isn't loaded yet"""
+        sound = self.sounds.get(name)
+        if sound is not None:
+            sound.play()
+
+    def set_music_volume(self, volume):
+        """Takes effect at once, or when the music starts if it is still loading"""
+        self.music_volume = volume
+        if self.music_playing:
+            pygame.mixer.music.set_volume(volume)
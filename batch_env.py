@@ -0,0 +1,540 @@
+"""
+Thousands of headless matches stepped together in NumPy.
+
+BatchPong keeps N matches as arrays (struct of arrays): ball, paddles,
+scores, pause timers, loss / jitter model state and every flow's packets
+in flight, and steps all of them at once with vectorized versions of
+Ball.move (swept collision), Simulation.check_collision, ai_movement, the
+input coalescers and the engine's loss / jitter / latency pipeline.
+Each match gets its own conditions (PRESET_MAP style dicts), so one batch
+can cover every preset.
+
+Packets in flight sit in a timing wheel per flow: one slot per tick, each
+holding the summed moves, count and send times of the packets released at
+that tick. Sending is a write into the slot of the packet's due tick and
+releasing is reading one slot, so a tick costs O(N) whatever the latency.
+
+It follows Simulation tick for tick but not its random draws (one
+generator for the whole batch), so results agree statistically, not bit
+for bit. Packets of one flow released in the same tick are applied as one
+move and clamped once, uniform jitter comes from a JITTER_TABLE_SIZE level
+table like the other jitter models. Only the 'track' ai is vectorized, and
+there is no bottleneck link (link_model.py).
+
+usage: python batch_env.py --matches 4096 --presets
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+from config import *
+from clock import NS_PER_MS, NS_PER_SECOND
+from collision import MAX_IMPACTS
+from impairment import (make_loss_model, make_jitter_model, max_jitter_for,
+                        BernoulliLoss, GilbertElliottLoss, UniformJitter, CorrelatedJitter, TableJitter)
+
+PAUSE_DURATION_NS = PAUSE_DURATION * NS_PER_MS
+
+# paddles as Simulation places them, only their tops (y) move
+LEFT_PADDLE_X = 50
+RIGHT_PADDLE_X = WIDTH - PADDLE_WIDTH - 50
+PADDLE_START_Y = (HEIGHT // 2 - PADDLE_HEIGHT // 2) + CONTROL_PANEL_HEIGHT
+PADDLE_MAX_Y = TOTAL_HEIGHT - PADDLE_HEIGHT
+# ball top left after Ball.reset
+SERVE_X = float(WIDTH // 2 - BALL_SIZE // 2)
+SERVE_Y = float((HEIGHT // 2) + CONTROL_PANEL_HEIGHT - BALL_SIZE // 2)
+
+# what a sweep step ended on
+NO_IMPACT, WALL, PADDLE, PADDLE_EDGE, LEFT_GOAL, RIGHT_GOAL = range(6)
+
+PLAYER, AI = 0, 1
+
+# BatchPong.conditions columns
+LATENCY, MAX_JITTER, GOOD_TO_BAD, BAD_TO_GOOD, GOOD_LOSS, BAD_LOSS, CORRELATION, JITTER_TABLE = range(8)
+CONDITION_COLUMNS = 8
+
+def sweep_balls(x, y, vx, vy, duration, left_top, right_top):
+    """
+    collision.sweep_ball for arrays of balls, updates x, y, vx, vy in place.
+    left_top / right_top are the paddles' tops. Returns (paddle hits, left goal, right goal) per ball
+    """
+    size = BALL_SIZE
+    top = CONTROL_PANEL_HEIGHT
+    bottom = TOTAL_HEIGHT - size
+    left_face = LEFT_PADDLE_X + PADDLE_WIDTH
+    right_face = RIGHT_PADDLE_X - size
+    hits = np.zeros(len(x), np.int64)
+    left_goal = np.zeros(len(x), bool)
+    right_goal = np.zeros(len(x), bool)
+
+    # usual case: a straight line strictly between the walls and the paddle faces
+    end_x = x + vx * duration
+    end_y = y + vy * duration
+    free = ((top < y) & (y < bottom) & (top < end_y) & (end_y < bottom) &
+            (left_face < x) & (x < right_face) & (left_face < end_x) & (end_x < right_face))
+    x[free] = end_x[free]
+    y[free] = end_y[free]
+    index = np.flatnonzero(~free)
+    if len(index) == 0:
+        return hits, left_goal, right_goal
+
+    # the rest bounce through the same impacts as sweep_ball, earliest first
+    bx, by, bvx, bvy = x[index], y[index], vx[index], vy[index]
+    left_top = left_top[index].astype(float)
+    right_top = right_top[index].astype(float)
+    remaining = np.full(len(index), float(duration))
+    bhits = np.zeros(len(index), np.int64)
+    active = np.ones(len(index), bool)
+    impact = np.zeros(len(index), np.int8)
+    for _ in range(MAX_IMPACTS):
+        # already overlapping a paddle it moves towards: bounce straight away
+        overlap = active & (by < np.where(bvx < 0, left_top, right_top) + PADDLE_HEIGHT) & \
+            (by + size > np.where(bvx < 0, left_top, right_top)) & \
+            np.where(bvx < 0, (bx < LEFT_PADDLE_X + PADDLE_WIDTH) & (bx + size > LEFT_PADDLE_X),
+                     (bx < RIGHT_PADDLE_X + PADDLE_WIDTH) & (bx + size > RIGHT_PADDLE_X))
+        bvx[overlap] = -bvx[overlap]
+        bhits += overlap
+        moving = active & ~overlap
+
+        # velocities are never 0, every t below is finite
+        earliest = remaining.copy()
+        impact[:] = NO_IMPACT
+        t = (np.where(bvy < 0, top, bottom) - by) / bvy
+        hit = (t >= 0) & (t <= earliest)
+        earliest[hit] = t[hit]
+        impact[hit] = WALL
+
+        # the face of the paddle the ball moves towards, from in front, within its height at impact
+        towards_left = bvx < 0
+        face = np.where(towards_left, left_face, right_face)
+        paddle_top = np.where(towards_left, left_top, right_top)
+        t = (face - bx) / bvx
+        y_at = by + bvy * t
+        hit = (np.where(towards_left, bx >= left_face, bx <= right_face) & (t >= 0) & (t <= earliest) &
+               (y_at < paddle_top + PADDLE_HEIGHT) & (y_at + size > paddle_top))
+        earliest[hit] = t[hit]
+        impact[hit] = PADDLE
+
+        # paddle top / bottom edges, reached from beside the face
+        for paddle_x, paddle_top in ((LEFT_PADDLE_X, left_top), (RIGHT_PADDLE_X, right_top)):
+            down = bvy > 0
+            edge_y = np.where(down, paddle_top - size, paddle_top + PADDLE_HEIGHT)
+            t = (edge_y - by) / bvy
+            x_at = bx + bvx * t
+            hit = (np.where(down, by + size <= paddle_top, by >= paddle_top + PADDLE_HEIGHT) &
+                   (t >= 0) & (t < earliest) & (x_at < paddle_x + PADDLE_WIDTH) & (x_at + size > paddle_x))
+            earliest[hit] = t[hit]
+            impact[hit] = PADDLE_EDGE
+
+        # goal lines
+        t = (np.where(towards_left, 0, WIDTH - size) - bx) / bvx
+        hit = (t >= 0) & (t < earliest)
+        earliest[hit] = t[hit]
+        impact[hit] = np.where(towards_left[hit], LEFT_GOAL, RIGHT_GOAL)
+
+        earliest[~moving] = 0
+        impact[~moving] = NO_IMPACT
+        bx += bvx * earliest
+        by += bvy * earliest
+        remaining -= earliest
+
+        wall = (impact == WALL) | (impact == PADDLE_EDGE)
+        bvy[wall] = -bvy[wall]
+        paddle = impact == PADDLE
+        bvx[paddle] = -bvx[paddle]
+        bhits += paddle | (impact == PADDLE_EDGE)
+        left_goal[index[impact == LEFT_GOAL]] = True
+        right_goal[index[impact == RIGHT_GOAL]] = True
+        # done once nothing is hit before the step ends, or at a goal line
+        active &= ~(moving & ((impact == NO_IMPACT) | (impact >= LEFT_GOAL)))
+        if not active.any():
+            break
+
+    x[index] = bx
+    y[index] = by
+    vx[index] = bvx
+    vy[index] = bvy
+    hits[index] = bhits
+    return hits, left_goal, right_goal
+
+def preset_conditions(matches):
+    """(labels, conditions) cycling through PRESET_MAP, one per match"""
+    names = list(PRESET_MAP)
+    labels = [names[i % len(names)] for i in range(matches)]
+    return labels, [PRESET_MAP[name] for name in labels]
+
+class BatchPong:
+    """
+    N matches of tracking_player-style player input (or the caller's moves)
+    against the 'track' ai. conditions: one dict (every match) or a list of
+    N dicts with latency, loss and optional loss_model / jitter_model / max_jitter.
+    """
+    def __init__(self, matches, conditions=None, seed=None, send_rate=DEFAULT_SEND_RATE, tick_rate=SIMULATION_RATE,
+                 ai_difficulty=DEFAULT_AI_DIFFICULTY):
+        self.matches = matches
+        self.rng = np.random.default_rng(seed)
+        self.tick_rate = tick_rate
+        self.tick_ns = NS_PER_SECOND // tick_rate
+        self.tick_scale = SPEED_REFERENCE_RATE / tick_rate
+        self.send_interval_ns = NS_PER_SECOND // send_rate
+        level = AI_DIFFICULTY[ai_difficulty]
+        self.ai_reaction_time = AI_REACTION_TIME * level['reaction']
+        self.ai_speed = round(PADDLE_SPEED * level['speed'] * self.tick_scale)
+        self.player_speed = round(PADDLE_SPEED * self.tick_scale)
+        self.set_conditions(conditions or {'latency' : 0, 'loss' : 0.0})
+        self.reset()
+
+    def set_conditions(self, conditions):
+        """Per match latency, loss and models, configured like DegradationEngine does. Call reset() after"""
+        if isinstance(conditions, dict):
+            conditions = [conditions] * self.matches
+        if len(conditions) != self.matches:
+            raise ValueError(f"need one condition per match ({self.matches}), got {len(conditions)}")
+        # jitter unit draws go through a table, uniform jitter through the table of the uniform distribution
+        tables = [[(i + 0.5) / JITTER_TABLE_SIZE for i in range(JITTER_TABLE_SIZE)]]
+        table_ids = {}
+        # one CONDITION_COLUMNS row per distinct condition, models are built once for each
+        rows = {}
+        self.conditions = np.zeros((self.matches, CONDITION_COLUMNS))
+        for i, condition in enumerate(conditions):
+            key = repr(sorted(condition.items()))
+            if key not in rows:
+                rows[key] = self._condition_row(condition, tables, table_ids)
+            self.conditions[i] = rows[key]
+
+        self.jitter_tables = np.array(tables)
+        # wheel slots: the longest delay any packet can get, in ticks, and the tick it was sent in
+        max_unit = self.jitter_tables.max(axis=1)[self.conditions[:, JITTER_TABLE].astype(np.int64)]
+        max_delay_ms = float(np.max(self.conditions[:, LATENCY] + max_unit * self.conditions[:, MAX_JITTER]))
+        self.wheel_size = math.ceil((max_delay_ms + self.ai_reaction_time) * NS_PER_MS / self.tick_ns) + 2
+
+    def _condition_row(self, condition, tables, table_ids):
+        latency = condition['latency']
+        max_jitter = condition.get('max_jitter')
+        max_jitter = max_jitter_for(latency) if max_jitter is None else max_jitter
+        row = np.zeros(CONDITION_COLUMNS)
+        row[LATENCY] = latency
+        row[MAX_JITTER] = max_jitter
+
+        # loss as a two state chain, Bernoulli loss never leaves the good state
+        loss_model = make_loss_model(condition.get('loss_model'))
+        loss_model.configure(latency, condition['loss'], max_jitter)
+        if isinstance(loss_model, GilbertElliottLoss):
+            row[GOOD_TO_BAD] = loss_model.good_to_bad
+            row[BAD_TO_GOOD] = loss_model.bad_to_good
+            row[GOOD_LOSS] = loss_model.good_loss
+            row[BAD_LOSS] = loss_model.bad_loss
+        elif isinstance(loss_model, BernoulliLoss):
+            row[BAD_TO_GOOD] = 1.0
+            row[GOOD_LOSS] = loss_model.loss_percent / 100
+        else:
+            raise ValueError(f"{type(loss_model).__name__} has no vectorized version")
+
+        # jitter: a unit draw from the table, scaled by max jitter, then AR(1) with the correlation
+        jitter_model = make_jitter_model(condition.get('jitter_model'))
+        if isinstance(jitter_model, CorrelatedJitter):
+            row[CORRELATION] = jitter_model.correlation
+        elif isinstance(jitter_model, TableJitter):
+            # models with the same table share it
+            values = tuple(jitter_model.table.values)
+            if values not in table_ids:
+                table_ids[values] = len(tables)
+                tables.append(values)
+            row[JITTER_TABLE] = table_ids[values]
+        elif not isinstance(jitter_model, UniformJitter):
+            raise ValueError(f"{type(jitter_model).__name__} has no vectorized version")
+        return row
+
+    def reset(self):
+        """Start every match: scores 0, serve, paddles in the middle, nothing in flight"""
+        n = self.matches
+        self.frame = 0
+        self.time_ns = 0
+        # match-steps run, only counting matches that weren't over
+        self.match_steps = 0
+
+        self.ball_x = np.full(n, SERVE_X)
+        self.ball_y = np.full(n, SERVE_Y)
+        self.ball_speed = np.full(n, float(BALL_SPEED))
+        self.ball_vx = np.where(self.rng.random(n) < 0.5, self.ball_speed, -self.ball_speed)
+        self.ball_vy = np.where(self.rng.random(n) < 0.5, self.ball_speed, -self.ball_speed)
+        self.player_y = np.full(n, PADDLE_START_Y, np.int64)
+        self.ai_y = np.full(n, PADDLE_START_Y, np.int64)
+
+        self.player_score = np.zeros(n, np.int64)
+        self.ai_score = np.zeros(n, np.int64)
+        self.points_played = np.zeros(n, np.int64)
+        self.rally_hits = np.zeros(n, np.int64)
+        self.running = np.ones(n, bool)
+        self.paused = np.zeros(n, bool)
+        self.paused_since = np.zeros(n, np.int64)
+        self.finished_ns = np.zeros(n, np.int64)
+
+        # input coalescers: moves not sent yet; the player's flushes every tick so its grid is shared
+        self.pending = np.zeros((2, n), np.int64)
+        self.player_next_send_ns = 0
+        self.ai_next_send_ns = np.zeros(n, np.int64)
+
+        # loss / jitter state per flow
+        self.in_bad_state = np.zeros((2, n), bool)
+        self.previous_jitter = np.full((2, n), np.nan)
+
+        # timing wheel per flow: summed moves, packet count, summed send times per (tick % wheel size, match)
+        shape = (2, self.wheel_size, n)
+        self.wheel_moves = np.zeros(shape, np.int64)
+        self.wheel_count = np.zeros(shape, np.int64)
+        self.wheel_sent_ns = np.zeros(shape, np.int64)
+        # each flow's wheels flat, indexed slot * matches + match
+        self._wheels = [(self.wheel_moves[flow].reshape(-1), self.wheel_count[flow].reshape(-1),
+                         self.wheel_sent_ns[flow].reshape(-1)) for flow in (PLAYER, AI)]
+
+        self.sent = np.zeros((2, n), np.int64)
+        self.lost = np.zeros((2, n), np.int64)
+        self.delivered = np.zeros((2, n), np.int64)
+        self.delay_ns = np.zeros((2, n), np.int64)
+
+    def ball_centery(self):
+        # the ball's rect is its position rounded down to whole pixels
+        return self.ball_y.astype(np.int64) + BALL_SIZE // 2
+
+    def tracking_moves(self):
+        """tracking_player for every match"""
+        center_diff = self.ball_centery() - (self.player_y + PADDLE_HEIGHT // 2)
+        speed = self.player_speed
+        return np.where(center_diff > speed, speed, np.where(center_diff < -speed, -speed, 0))
+
+    def _send(self, flow, rows, moves):
+        """DegradationEngine.queue_input for one packet of flow from each of rows"""
+        now = self.time_ns
+        # every per match parameter in one gather
+        conditions = self.conditions[rows]
+        self.sent[flow][rows] += 1
+
+        # loss: state transition, then a loss draw for the new state
+        draws = self.rng.random((3, len(rows)))
+        in_bad_state = self.in_bad_state[flow]
+        bad = np.where(in_bad_state[rows], draws[0] >= conditions[:, BAD_TO_GOOD], draws[0] < conditions[:, GOOD_TO_BAD])
+        in_bad_state[rows] = bad
+        lost = draws[1] < np.where(bad, conditions[:, BAD_LOSS], conditions[:, GOOD_LOSS])
+        unit = draws[2]
+        if lost.any():
+            self.lost[flow][rows[lost]] += 1
+            kept = ~lost
+            rows, moves, conditions, unit = rows[kept], moves[kept], conditions[kept], unit[kept]
+
+        latency = conditions[:, LATENCY]
+        fresh = self.jitter_tables[conditions[:, JITTER_TABLE].astype(np.int64),
+                                   (unit * JITTER_TABLE_SIZE).astype(np.int64)] * conditions[:, MAX_JITTER]
+        previous_jitter = self.previous_jitter[flow]
+        previous = previous_jitter[rows]
+        correlation = conditions[:, CORRELATION]
+        jitter = np.where(np.isnan(previous), fresh, correlation * previous + (1 - correlation) * fresh)
+        previous_jitter[rows] = jitter
+        # no jitter at latency 0
+        delay_ms = latency + np.where(latency > 0, jitter, 0.0)
+        if flow == AI:
+            delay_ms += self.ai_reaction_time
+        time_due = now + (delay_ms * NS_PER_MS).astype(np.int64)
+        if flow == PLAYER:
+            # no delay for the player at latency <= 5
+            time_due[latency <= 5] = now
+
+        # released by the first tick at or after it is due
+        index = (-(-time_due // self.tick_ns) % self.wheel_size) * self.matches + rows
+        wheel_moves, wheel_count, wheel_sent_ns = self._wheels[flow]
+        wheel_moves[index] += moves
+        wheel_count[index] += 1
+        wheel_sent_ns[index] += now
+
+    def step(self, player_moves=None):
+        """
+        Advance every match by one tick, like Simulation.step. player_moves
+        (one per match, e.g. tracking_moves()) were made before the tick and are
+        ignored for matches that are paused or over
+        """
+        self.frame += 1
+        self.time_ns += self.tick_ns
+        now = self.time_ns
+        self.match_steps += int(np.count_nonzero(self.running))
+        if player_moves is not None:
+            self.pending[PLAYER] += np.where(self.running & ~self.paused, player_moves, 0)
+
+        # player inputs are sent on the send rate grid
+        if now >= self.player_next_send_ns:
+            self.player_next_send_ns += self.send_interval_ns
+            if self.player_next_send_ns <= now:
+                missed = (now - self.player_next_send_ns) // self.send_interval_ns + 1
+                self.player_next_send_ns += missed * self.send_interval_ns
+            rows = np.flatnonzero(self.pending[PLAYER])
+            if len(rows):
+                self._send(PLAYER, rows, self.pending[PLAYER, rows])
+                self.pending[PLAYER, rows] = 0
+
+        # pause between points (in-flight packets were dropped when it started)
+        resumed = self.paused & (now - self.paused_since > PAUSE_DURATION_NS)
+        if resumed.any():
+            self.paused &= ~resumed
+            self.pending[:, resumed] = 0
+
+        live = np.flatnonzero(self.running & ~self.paused)
+        scored = live[:0]
+        if len(live):
+            scored = self._move_balls(live)
+            self._ai_movement(live)
+
+        # release this tick's wheel slot (only live matches have anything in flight)
+        slot = self.frame % self.wheel_size
+        count = self.wheel_count[:, slot]
+        if count.any():
+            self.delivered += count
+            self.delay_ns += count * now - self.wheel_sent_ns[:, slot]
+            moves = self.wheel_moves[:, slot]
+            np.clip(self.player_y + moves[PLAYER], CONTROL_PANEL_HEIGHT, PADDLE_MAX_Y, out=self.player_y)
+            np.clip(self.ai_y + moves[AI], CONTROL_PANEL_HEIGHT, PADDLE_MAX_Y, out=self.ai_y)
+            self.wheel_moves[:, slot] = 0
+            self.wheel_count[:, slot] = 0
+            self.wheel_sent_ns[:, slot] = 0
+
+        # the engine's reset_stats after the pause drops whatever is still in flight
+        if len(scored):
+            self.wheel_moves[:, :, scored] = 0
+            self.wheel_count[:, :, scored] = 0
+            self.wheel_sent_ns[:, :, scored] = 0
+
+    def _move_balls(self, rows):
+        """Ball.move and check_collision for rows, returns the rows that scored"""
+        everything = len(rows) == self.matches
+        if everything:
+            x, y, vx, vy = self.ball_x, self.ball_y, self.ball_vx, self.ball_vy
+            hits, left_goal, right_goal = sweep_balls(x, y, vx, vy, self.tick_scale, self.player_y, self.ai_y)
+        else:
+            x, y, vx, vy = self.ball_x[rows], self.ball_y[rows], self.ball_vx[rows], self.ball_vy[rows]
+            hits, left_goal, right_goal = sweep_balls(x, y, vx, vy, self.tick_scale,
+                                                      self.player_y[rows], self.ai_y[rows])
+            self.ball_x[rows], self.ball_y[rows], self.ball_vx[rows], self.ball_vy[rows] = x, y, vx, vy
+        self.rally_hits[rows] += hits
+
+        if not (left_goal.any() or right_goal.any()):
+            return rows[:0]
+        ai_scored = rows[left_goal]
+        player_scored = rows[right_goal]
+        self.ai_score[ai_scored] += 1
+        self.player_score[player_scored] += 1
+        # the ball speeds up when the player scores, keeping its direction
+        speed = self.ball_speed[player_scored] + BALL_SPEED_INCREMENT
+        self.ball_speed[player_scored] = speed
+        self.ball_vx[player_scored] = np.where(self.ball_vx[player_scored] > 0, speed, -speed)
+        self.ball_vy[player_scored] = np.where(self.ball_vy[player_scored] > 0, speed, -speed)
+
+        scored = rows[left_goal | right_goal]
+        self.points_played[scored] += 1
+        self.paused[scored] = True
+        self.paused_since[scored] = self.time_ns
+        over = (self.player_score[scored] >= MAX_SCORE) | (self.ai_score[scored] >= MAX_SCORE)
+        finished = scored[over]
+        self.running[finished] = False
+        self.paused[finished] = False
+        self.finished_ns[finished] = self.time_ns
+
+        # serve: from the center, towards the other side, random vertical direction
+        serve = scored[~over]
+        self.ball_x[serve] = SERVE_X
+        self.ball_y[serve] = SERVE_Y
+        self.ball_vx[serve] *= -1
+        speed = self.ball_speed[serve]
+        self.ball_vy[serve] = np.where(self.rng.random(len(serve)) < 0.5, speed, -speed)
+        return scored
+
+    def _ai_movement(self, rows):
+        """ai_movement for rows: follow the ball at the ai speed, sent through the ai's coalescer"""
+        center_diff = self.ball_y[rows].astype(np.int64) + BALL_SIZE // 2 - (self.ai_y[rows] + PADDLE_HEIGHT // 2)
+        self.pending[AI, rows] += np.clip(center_diff, -self.ai_speed, self.ai_speed)
+
+        # each match's ai coalescer only flushes while the match is live, so grids are per match
+        due = rows[self.ai_next_send_ns[rows] <= self.time_ns]
+        if len(due) == 0:
+            return
+        next_send = self.ai_next_send_ns[due] + self.send_interval_ns
+        late = next_send <= self.time_ns
+        next_send[late] += ((self.time_ns - next_send[late]) // self.send_interval_ns + 1) * self.send_interval_ns
+        self.ai_next_send_ns[due] = next_send
+        sending = due[self.pending[AI, due] != 0]
+        if len(sending):
+            self._send(AI, sending, self.pending[AI, sending])
+            self.pending[AI, sending] = 0
+
+    def run(self, max_time_ms=None, player_controller=None):
+        """
+        Play every match to the end (or max_time_ms of simulated time) as fast as possible.
+        player_controller(batch) returns the player moves, tracking_moves by default. Returns results()
+        """
+        self.reset()
+        controller = player_controller or BatchPong.tracking_moves
+        max_time_ns = max_time_ms * NS_PER_MS if max_time_ms is not None else None
+        while self.running.any():
+            if max_time_ns is not None and self.time_ns >= max_time_ns:
+                break
+            self.step(controller(self))
+        return self.results()
+
+    def results(self):
+        """Per match results as arrays, the keys of Simulation.run_match"""
+        finished = ~self.running
+        end_ns = np.where(finished, self.finished_ns, self.time_ns)
+        delivered = self.delivered
+        delay_ms = np.divide(self.delay_ns / NS_PER_MS, delivered, out=np.zeros(delivered.shape), where=delivered > 0)
+        return {
+            'player_score' : self.player_score.copy(),
+            'ai_score' : self.ai_score.copy(),
+            'player_won' : self.player_score > self.ai_score,
+            'finished' : finished,
+            'duration_ms' : end_ns // NS_PER_MS,
+            'points' : self.points_played.copy(),
+            'rally_hits' : self.rally_hits.copy(),
+            'player_delivered' : delivered[PLAYER].copy(),
+            'player_delay_ms' : delay_ms[PLAYER],
+            'ai_delivered' : delivered[AI].copy(),
+            'ai_delay_ms' : delay_ms[AI]
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Play a batch of headless matches in NumPy")
+    parser.add_argument('--matches', type=int, default=4096)
+    parser.add_argument('--presets', action='store_true', help="cycle the matches through PRESET_MAP")
+    parser.add_argument('--latency', type=float, default=0, help="ms, without --presets")
+    parser.add_argument('--loss', type=float, default=0.0, help="percent, without --presets")
+    parser.add_argument('--send-rate', type=int, default=DEFAULT_SEND_RATE, help="client send rate (Hz)")
+    parser.add_argument('--tick-rate', type=int, default=SIMULATION_RATE, help="simulation steps per simulated second")
+    parser.add_argument('--difficulty', choices=list(AI_DIFFICULTY), default=DEFAULT_AI_DIFFICULTY)
+    parser.add_argument('--max-time', type=float, default=600, help="simulated seconds before unfinished matches are cut off")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.presets:
+        labels, conditions = preset_conditions(args.matches)
+    else:
+        labels = ['grid'] * args.matches
+        conditions = {'latency' : args.latency, 'loss' : args.loss}
+    batch = BatchPong(args.matches, conditions, seed=args.seed, send_rate=args.send_rate, tick_rate=args.tick_rate,
+                      ai_difficulty=args.difficulty)
+    start = time.perf_counter()
+    results = batch.run(max_time_ms=args.max_time * 1000)
+    seconds = time.perf_counter() - start
+
+    labels = np.array(labels)
+    for label in dict.fromkeys(labels):
+        chosen = labels == label
+        points = results['points'][chosen].sum()
+        print(f"{label:8} matches={chosen.sum()} win rate={results['player_won'][chosen].mean():.2f} "
+              f"score={results['player_score'][chosen].mean():.2f}-{results['ai_score'][chosen].mean():.2f} "
+              f"rally hits/point={results['rally_hits'][chosen].sum() / max(points, 1):.2f} "
+              f"duration={results['duration_ms'][chosen].mean() / 1000:.1f}s "
+              f"delay player={results['player_delay_ms'][chosen].mean():.0f}ms ai={results['ai_delay_ms'][chosen].mean():.0f}ms "
+              f"unfinished={(~results['finished'][chosen]).sum()}")
+    print(f"{batch.frame} ticks, {batch.match_steps} match-steps in {seconds:.2f} s: "
+          f"{batch.match_steps / seconds:,.0f} match-steps/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Packets per second through udp_proxy.py on one event loop: a client
+sends datagrams through the proxy to an echo service and counts the
+echoes coming back (so every packet crosses the proxy twice). The client
+keeps at most WINDOW packets outstanding. Datagrams the proxy released
+that the receiving socket's buffer had no room for are counted as kernel
+drops, they grow when the offered load is beyond what the loop sustains.
+
+run from repo root: python -m benchmarks.bench_proxy [packets]
+"""
+import asyncio
+import sys
+import time
+
+from config import *
+from udp_proxy import ImpairmentProxy, open_socket, drain, drain_from
+
+WINDOW = 10_000
+
+
+async def run(packets, preset):
+    loop = asyncio.get_running_loop()
+
+    echo = open_socket()
+    echo.bind((NET_HOST, 0))
+    def echo_ready():
+        for data, address in drain_from(echo):
+            echo.sendto(data, address)
+    loop.add_reader(echo.fileno(), echo_ready)
+
+    proxy = ImpairmentProxy(echo.getsockname(), seed=1)
+    proxy.set_scenario(preset)
+    proxy_address = proxy.start(0)
+
+    client = open_socket()
+    client.connect(proxy_address)
+    received = 0
+    def client_ready():
+        nonlocal received
+        for data in drain(client):
+            received += 1
+    loop.add_reader(client.fileno(), client_ready)
+
+    payload = bytes(64)
+    sent = 0
+    start = time.perf_counter()
+    last_progress = start
+    last_count = 0
+    while True:
+        # packets lost on either leg never come back
+        lost = proxy.upstream.lost + proxy.downstream.lost
+        if received + lost >= packets:
+            break
+        # anything still missing after a second with no progress was dropped by the kernel
+        if received + lost != last_count:
+            last_count = received + lost
+            last_progress = time.perf_counter()
+        elif time.perf_counter() - last_progress > 1:
+            break
+        burst = min(packets - sent, WINDOW - (sent - received - lost), PROXY_READ_BATCH)
+        for _ in range(max(0, burst)):
+            try:
+                client.send(payload)
+                sent += 1
+            except BlockingIOError:
+                break
+        await asyncio.sleep(0 if burst > 0 else 0.0005)
+    seconds = time.perf_counter() - start
+
+    for sock in (client, echo):
+        loop.remove_reader(sock.fileno())
+        sock.close()
+    proxy.close()
+    return received, seconds, proxy
+
+
+def main():
+    packets = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    for preset in ('LAN', '4G LTE', 'Sat'):
+        received, seconds, proxy = asyncio.run(run(packets, preset))
+        stats = proxy.get_stats()
+        relayed = stats['upstream']['sent'] + stats['downstream']['sent']
+        # released by the proxy but never read by the echo service / client (receive buffer overflow)
+        kernel_drops = (proxy.upstream.delivered - stats['downstream']['sent'] +
+                        proxy.downstream.delivered - received + proxy.send_errors)
+        print(f"{preset:>7} | {relayed / seconds:>9,.0f} pkt/s relayed | {received}/{packets} echoed | "
+              f"{proxy.timer_callbacks} timer callbacks | kernel drops {kernel_drops} | "
+              f"delay up {stats['upstream']['mean delay']:.1f} ms down {stats['downstream']['mean delay']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
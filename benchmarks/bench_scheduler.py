@@ -0,0 +1,105 @@
+"""
+Throughput of DegradationEngine.queue_input / release_due_actions
+with 10^5 - 10^6 packets in flight, and allocations per packet once
+the packet pool has warmed up.
+
+run from repo root: python -m benchmarks.bench_scheduler
+"""
+import sys
+import time
+import tracemalloc
+
+from config import *
+from clock import SimulatedClock, NS_PER_SECOND
+from degradation_engine import DegradationEngine
+
+
+def ignore_packet(packet):
+    pass
+
+
+def run(in_flight, latency, frames=600):
+    # simulated clock so release does not wait on the wall clock
+    clock = SimulatedClock()
+    # plain objects stand in for paddles, engine only compares identity
+    player, ai = object(), object()
+    engine = DegradationEngine(player, ai, clock=clock)
+    engine.set_parameters(latency, 0.0)
+
+    # queue all packets over one simulated second so jitter reorders them
+    start = time.perf_counter()
+    for i in range(in_flight):
+        clock.time_ns = i * NS_PER_SECOND // in_flight
+        engine.queue_input(player if i & 1 else ai, PADDLE_SPEED)
+    queue_seconds = time.perf_counter() - start
+
+    # release them frame by frame until the queue is drained
+    released = 0
+    frame_ns = NS_PER_SECOND // frames
+    start = time.perf_counter()
+    while engine.action_queue:
+        clock.advance_ns(frame_ns)
+        released += engine.release_due_actions(ignore_packet)
+    release_seconds = time.perf_counter() - start
+
+    assert released == in_flight
+    return queue_seconds, release_seconds
+
+
+def steady_state_allocations(latency, frames=6000):
+    """
+    Both flows send one packet per frame at 60 FPS, like the game.
+    Returns (packet records created, bytes retained) over the measured
+    frames. Records created should be 0, bytes retained a few hundred
+    at most (list over-allocation) and not grow with frames.
+    """
+    clock = SimulatedClock()
+    player, ai = object(), object()
+    engine = DegradationEngine(player, ai, clock=clock)
+    engine.set_parameters(latency, 0.0)
+    frame_ns = NS_PER_SECOND // FPS
+
+    def run_frames(count):
+        for _ in range(count):
+            clock.advance_ns(frame_ns)
+            engine.queue_input(player, PADDLE_SPEED)
+            engine.queue_input(ai, -PADDLE_SPEED)
+            engine.release_due_actions(ignore_packet)
+
+    # warm up: fill the pipe and the random blocks
+    # traced too, so values held by packets already in flight are in both snapshots
+    tracemalloc.start()
+    run_frames(FPS * 10)
+    allocated_before = engine.pool.allocated
+    before = tracemalloc.take_snapshot()
+    run_frames(frames)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    # only count memory held by the engine's own modules
+    filters = [tracemalloc.Filter(True, "*degradation_engine.py"), tracemalloc.Filter(True, "*packet_store.py")]
+    stats = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'filename')
+    leaked_bytes = sum(stat.size_diff for stat in stats)
+    return engine.pool.allocated - allocated_before, leaked_bytes
+
+
+def main():
+    sizes = [100_000, 1_000_000]
+    if len(sys.argv) > 1:
+        sizes = [int(arg) for arg in sys.argv[1:]]
+
+    for preset in ('4G LTE', 'Sat'):
+        latency = PRESET_MAP[preset]['latency']
+        for size in sizes:
+            queue_seconds, release_seconds = run(size, latency)
+            print(f"{preset:>7} {size:>9} in flight | "
+                  f"queue {size / queue_seconds:>12,.0f} pkt/s | "
+                  f"release {size / release_seconds:>12,.0f} pkt/s")
+
+    for preset in ('4G LTE', 'Sat'):
+        created, leaked_bytes = steady_state_allocations(PRESET_MAP[preset]['latency'])
+        print(f"{preset:>7} steady state | packet records created {created} | bytes retained {leaked_bytes}")
+
+
+if __name__ == "__main__":
+    main()
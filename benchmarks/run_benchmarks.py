@@ -0,0 +1,336 @@
+"""
+Benchmark suite for the hot paths: DegradationEngine queue/release,
+get_max_jitter, a headless simulation frame, a batched match-step and
+draw_elements on the SDL dummy display. Every result is a time per operation (lower is
+better), the fastest of several repeats.
+
+Each repeat runs right after a fixed calibration loop, and results are
+compared relative to it (fastest repeat / fastest calibration), so the
+baseline holds no machine-specific times. Its tolerance per benchmark comes
+from the spread of the repeats it was saved from. Any benchmark slower than
+baseline * (1 + tolerance) is reported as a regression and the exit code is 1.
+
+run from repo root:
+    python -m benchmarks.run_benchmarks                     # run & compare with benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --save-baseline     # store this run as the new baseline
+    python -m benchmarks.run_benchmarks --filter engine     # only benchmarks whose name contains 'engine'
+"""
+import argparse
+import heapq
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from config import *
+from clock import SimulatedClock, NS_PER_MS, NS_PER_SECOND
+from degradation_engine import DegradationEngine
+from simulation import Simulation, tracking_player
+from batch_env import BatchPong, preset_conditions
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+DEFAULT_RESULTS = "benchmark_results.json"
+
+CALIBRATION_ITERATIONS = 200_000
+# a saved benchmark may slow down by SPREAD_TOLERANCE times its spread
+# (median / fastest repeat - 1), never less than MIN_TOLERANCE
+SPREAD_TOLERANCE = 3
+MIN_TOLERANCE = 0.10
+
+# (name, function) filled by the @benchmark decorator, in run order
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Register fn() -> (operations, seconds) under name"""
+    def register(fn):
+        BENCHMARKS.append((name, fn))
+        return fn
+    return register
+
+
+def ignore_packet(packet):
+    pass
+
+
+def make_engine(latency, loss):
+    # plain objects stand in for paddles, engine only compares identity
+    clock = SimulatedClock()
+    player, ai = object(), object()
+    engine = DegradationEngine(player, ai, clock=clock)
+    engine.set_parameters(latency, loss)
+    return engine, clock, player, ai
+
+
+def queue_and_release(latency, loss, depth):
+    """
+    Keep `depth` packets in flight: queue them over one latency period,
+    then drain frame by frame. Shallow queues go round several times so
+    every run moves ~100k packets. Returns (packets, seconds)
+    """
+    engine, clock, player, ai = make_engine(latency, loss)
+    # spread sends over the latency so roughly `depth` are in flight
+    step_ns = max(1, int(latency * NS_PER_MS) // depth)
+    frame_ns = NS_PER_SECOND // FPS
+    rounds = max(1, 100_000 // depth)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for i in range(depth):
+            clock.time_ns += step_ns
+            engine.queue_input(player if i & 1 else ai, PADDLE_SPEED)
+        while engine.action_queue or engine.immediate_queue:
+            clock.advance_ns(frame_ns)
+            engine.get_due_actions()
+    return depth * rounds, time.perf_counter() - start
+
+
+# queue_input / get_due_actions across the presets & queue depths
+# (the other presets only change models, which these paths don't time)
+for preset in PRESET_BUTTONS:
+    for depth in (1_000, 10_000, 100_000):
+        settings = PRESET_MAP[preset]
+        benchmark(f"engine queue+release {preset} depth={depth}")(
+            lambda latency=settings['latency'], loss=settings['loss'], depth=depth:
+                queue_and_release(latency, loss, depth))
+
+
+def steady_frames(link=None):
+    """Both flows send every frame at 4G latency, callback api without dicts"""
+    engine, clock, player, ai = make_engine(PRESET_MAP['4G LTE']['latency'], PRESET_MAP['4G LTE']['loss'])
+    engine.set_link(link)
+    frame_ns = NS_PER_SECOND // FPS
+    frames = 20_000
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        clock.advance_ns(frame_ns)
+        engine.queue_input(player, PADDLE_SPEED)
+        engine.queue_input(ai, -PADDLE_SPEED)
+        engine.release_due_actions(ignore_packet)
+    return frames, time.perf_counter() - start
+
+
+@benchmark("engine release_due_actions steady 60fps")
+def steady_release():
+    return steady_frames()
+
+
+# both flows overload a 12 kbit/s link, so the buffer stays full and drops
+for queue in QUEUE_DISCIPLINES:
+    benchmark(f"engine release_due_actions steady 60fps link {queue}")(
+        lambda queue=queue: steady_frames({'rate' : 12, 'buffer' : LINK_BUFFER_PACKETS, 'queue' : (queue, {})}))
+
+
+@benchmark("engine get_max_jitter")
+def max_jitter():
+    engine = make_engine(0, 0.0)[0]
+    latencies = list(range(0, 600, 7))
+    calls = 0
+
+    start = time.perf_counter()
+    for _ in range(2_000):
+        for latency in latencies:
+            engine.latency = latency
+            engine.get_max_jitter()
+        calls += len(latencies)
+    return calls, time.perf_counter() - start
+
+
+def headless_frames(ai_mode):
+    sim = Simulation(seed=1)
+    sim.set_ai(ai_mode, DEFAULT_AI_DIFFICULTY)
+    sim.set_scenario('Wi-Fi')
+    sim.toggle_game_state()
+    frames = 20_000
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        if sim.is_game_over:
+            sim.toggle_game_state()
+        move = tracking_player(sim)
+        if move:
+            sim.queue_player_input(move)
+        sim.step()
+    return frames, time.perf_counter() - start
+
+
+@benchmark("simulation headless frame")
+def headless_frame():
+    """Physics + engine + ai with the tracking bot playing, at Wi-Fi settings"""
+    return headless_frames('track')
+
+
+@benchmark("simulation headless frame intercept ai")
+def headless_frame_intercept():
+    """Same with the event-driven ai"""
+    return headless_frames('intercept')
+
+
+@benchmark("batch env match-step presets N=4096")
+def batch_match_step():
+    """BatchPong ticks of 4096 matches across the presets, per match-step (one match, one tick)"""
+    batch = BatchPong(4096, preset_conditions(4096)[1], seed=1)
+    ticks = 300
+
+    start = time.perf_counter()
+    for _ in range(ticks):
+        batch.step(batch.tracking_moves())
+    return batch.match_steps, time.perf_counter() - start
+
+
+def draw_frames(dirty):
+    # offscreen: no window, no sound card
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import pong_game
+    if pong_game.screen is None:
+        pong_game.setup(audio_enabled=False)
+        pong_game.sim.toggle_game_state()
+    pong_game.DIRTY_RECT_RENDERING = dirty
+    sim = pong_game.sim
+    frames = 600
+
+    elapsed = 0.0
+    for _ in range(frames):
+        if sim.is_game_over:
+            sim.toggle_game_state()
+        move = tracking_player(sim)
+        if move:
+            sim.queue_player_input(move)
+        pong_game.handle_events(sim.step())
+        pong_game.update_flashes()
+        start = time.perf_counter()
+        pong_game.draw_elements()
+        elapsed += time.perf_counter() - start
+    return frames, elapsed
+
+
+@benchmark("render draw_elements full")
+def draw_full():
+    return draw_frames(dirty=False)
+
+
+@benchmark("render draw_elements dirty rects")
+def draw_dirty():
+    return draw_frames(dirty=True)
+
+
+def calibration_loop():
+    """
+    Fixed pure Python workload (calls, tuple compares, heapq, small int math)
+    like the engine's. Returns ns per iteration
+    """
+    heap = []
+    total = 0
+    start = time.perf_counter()
+    for i in range(CALIBRATION_ITERATIONS):
+        heapq.heappush(heap, ((i * 7919) % 1000, i))
+        if len(heap) > 64:
+            total += heapq.heappop(heap)[0]
+    return (time.perf_counter() - start) * 1e9 / CALIBRATION_ITERATIONS
+
+
+def run_benchmarks(name_filter=None, repeats=10):
+    """
+    {name: {'ns_per_op', 'calibration_ns', 'relative', 'spread', 'ops', 'repeats'}}.
+    ns_per_op and calibration_ns are the fastest repeats, relative their ratio
+    """
+    results = {}
+    for name, fn in BENCHMARKS:
+        if name_filter and name_filter not in name:
+            continue
+        timings = []
+        calibrations = []
+        for _ in range(repeats):
+            # back to back, so both see the same clock speed and load
+            calibrations.append(calibration_loop())
+            operations, seconds = fn()
+            timings.append(seconds * 1e9 / operations)
+        fastest = min(timings)
+        calibration = min(calibrations)
+        results[name] = {
+            'ns_per_op' : fastest,
+            'calibration_ns' : calibration,
+            'relative' : fastest / calibration,
+            'spread' : statistics.median(timings) / fastest - 1,
+            'ops' : operations,
+            'repeats' : repeats
+        }
+        print(f"{name:<56} {fastest:>14,.0f} ns/op {fastest / calibration:>10,.2f} x calibration "
+              f"(spread {results[name]['spread']:.1%})")
+    return results
+
+
+def baseline_of(results):
+    """What --save-baseline stores: relative times and their tolerances, no absolute times"""
+    return {name : {'relative' : result['relative'],
+                    'tolerance' : max(MIN_TOLERANCE, SPREAD_TOLERANCE * result['spread'])}
+            for name, result in results.items()}
+
+
+def compare(results, baseline, tolerance=None):
+    """Names of benchmarks slower than baseline by more than their tolerance (or tolerance for all)"""
+    regressions = []
+    print(f"\n{'benchmark':<56} {'baseline':>10} {'now':>10} {'change':>8} {'allowed':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<56} {'-':>10} {result['relative']:>10,.2f}      new")
+            continue
+        before = baseline[name]['relative']
+        allowed = tolerance if tolerance is not None else baseline[name]['tolerance']
+        change = result['relative'] / before - 1
+        regressed = change > allowed
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<56} {before:>10,.2f} {result['relative']:>10,.2f} {change:>+8.1%} {allowed:>+8.0%}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite and compare with a baseline")
+    parser.add_argument('--out', default=DEFAULT_RESULTS, help="json results file")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="json baseline to compare with")
+    parser.add_argument('--save-baseline', action='store_true', help="write this run to --baseline instead of comparing")
+    parser.add_argument('--tolerance', type=float,
+                        help="allowed slowdown for every benchmark (0.25 = 25%%), default the baseline's own")
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--filter', help="only run benchmarks whose name contains this")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.filter, args.repeats)
+    report = {
+        'python' : platform.python_version(),
+        'machine' : platform.machine(),
+        'timestamp' : time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'results' : results,
+    }
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(dict(report, results=baseline_of(results)), f, indent=2, sort_keys=True)
+        print(f"\nbaseline saved to {args.baseline}")
+        return 0
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    if not os.path.exists(args.baseline):
+        print(f"\nno baseline at {args.baseline}, run with --save-baseline first")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+import time
+from abc import ABC, abstractmethod
+
+NS_PER_MS = 1_000_000
+NS_PER_SECOND = 1_000_000_000
+
+class Clock(ABC):
+    """Source of time in integer nanoseconds for the engine and game loop"""
+    @abstractmethod
+    def now_ns(self):
+        """Current time in integer nanoseconds, never decreasing"""
+
+    def now_ms(self):
+        """Current time in whole milliseconds"""
+        return self.now_ns() // NS_PER_MS
+
+class MonotonicClock(Clock):
+    """Real time that never jumps back or forward with wall-clock (NTP) changes"""
+    def __init__(self):
+        # count from creation so values stay small
+        self.start_ns = time.monotonic_ns()
+
+    def now_ns(self):
+        return time.monotonic_ns() - self.start_ns
+
+class SimulatedClock(Clock):
+    """Virtual time that only moves when advanced, for headless and batch runs"""
+    def __init__(self, start_ns=0):
+        self.time_ns = start_ns
+
+    def now_ns(self):
+        return self.time_ns
+
+    def advance_ns(self, delta_ns):
+        """Move time forward by delta_ns"""
+        if delta_ns < 0:
+            raise ValueError("SimulatedClock cannot move backwards")
+        self.time_ns += delta_ns
+
+    def advance_ms(self, delta_ms):
+        """Move time forward by delta_ms (may be fractional)"""
+        self.advance_ns(round(delta_ms * NS_PER_MS))
+
+    def advance_to(self, time_ns):
+        """Jump forward to time_ns, used to skip idle time"""
+        if time_ns > self.time_ns:
+            self.time_ns = time_ns
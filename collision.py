@@ -0,0 +1,145 @@
+"""
+Swept (continuous) ball collision.
+
+The ball moves along its velocity for a whole step, and every wall, paddle
+face, paddle top / bottom edge and goal line it would cross on the way is found by its time of impact,
+earliest first. So a step can cover any distance: the ball bounces off
+everything it meets in between instead of only what it overlaps at the end.
+Paddles are taken as standing still during one step.
+"""
+from config import CONTROL_PANEL_HEIGHT, TOTAL_HEIGHT, WIDTH
+
+# what the ball hit, in the order they happened
+HIT_WALL = 'wall'
+HIT_PADDLE = 'paddle'
+GOAL_LEFT = 'goal_left'    # crossed the left edge, ai scores
+GOAL_RIGHT = 'goal_right'  # crossed the right edge, player scores
+
+# bounces handled per step at most (corner cases keep hitting at t = 0)
+MAX_IMPACTS = 32
+
+def time_to(position, target, velocity):
+    """Time for position to reach target at velocity, None if it never does"""
+    if velocity == 0:
+        return None
+    t = (target - position) / velocity
+    return t if t >= 0 else None
+
+def sweep_ball(x, y, size, velocity_x, velocity_y, duration, left_paddle, right_paddle):
+    """
+    Move a size x size ball at (x, y) for `duration` (velocity units of time).
+    left_paddle / right_paddle are rects the ball bounces back from on their inner face,
+    and up or down from on their top and bottom edges.
+    Returns (x, y, velocity_x, velocity_y, impacts), the ball stops at a goal line.
+    """
+    impacts = []
+    remaining = duration
+    top = CONTROL_PANEL_HEIGHT
+    bottom = TOTAL_HEIGHT - size
+
+    # usual case: start and end strictly between the walls and the paddle faces,
+    # a straight line can't have crossed anything in between
+    end_x = x + velocity_x * duration
+    end_y = y + velocity_y * duration
+    inner_left = left_paddle.right
+    inner_right = right_paddle.left - size
+    if (top < y < bottom and top < end_y < bottom and
+            inner_left < x < inner_right and inner_left < end_x < inner_right):
+        return end_x, end_y, velocity_x, velocity_y, impacts
+
+    for _ in range(MAX_IMPACTS):
+        # ball already overlapping a paddle it moves towards: bounce straight away
+        if velocity_x < 0 and overlaps(x, y, size, left_paddle):
+            velocity_x = -velocity_x
+            impacts.append(HIT_PADDLE)
+            continue
+        if velocity_x > 0 and overlaps(x, y, size, right_paddle):
+            velocity_x = -velocity_x
+            impacts.append(HIT_PADDLE)
+            continue
+
+        earliest = remaining
+        impact = None
+        edge = False
+
+        # walls
+        t = time_to(y, top if velocity_y < 0 else bottom, velocity_y)
+        if t is not None and t <= earliest:
+            earliest, impact = t, HIT_WALL
+
+        # paddle faces, only from in front and within the paddle's height at impact
+        if velocity_x < 0 and x >= left_paddle.right:
+            t = time_to(x, left_paddle.right, velocity_x)
+            if t is not None and t <= earliest and spans(y + velocity_y * t, size, left_paddle):
+                earliest, impact = t, HIT_PADDLE
+        elif velocity_x > 0 and x + size <= right_paddle.left:
+            t = time_to(x, right_paddle.left - size, velocity_x)
+            if t is not None and t <= earliest and spans(y + velocity_y * t, size, right_paddle):
+                earliest, impact = t, HIT_PADDLE
+
+        # paddle top / bottom edges, reached from beside the face
+        for paddle in (left_paddle, right_paddle):
+            t = time_to_edge(x, y, size, velocity_x, velocity_y, paddle)
+            if t is not None and t < earliest:
+                earliest, impact, edge = t, HIT_PADDLE, True
+
+        # goal lines
+        if velocity_x < 0:
+            t = time_to(x, 0, velocity_x)
+            if t is not None and t < earliest:
+                earliest, impact = t, GOAL_LEFT
+        elif velocity_x > 0:
+            t = time_to(x, WIDTH - size, velocity_x)
+            if t is not None and t < earliest:
+                earliest, impact = t, GOAL_RIGHT
+
+        x += velocity_x * earliest
+        y += velocity_y * earliest
+        remaining -= earliest
+        if impact is None:
+            break
+        impacts.append(impact)
+
+        if impact == HIT_WALL or edge:
+            velocity_y = -velocity_y
+        elif impact == HIT_PADDLE:
+            velocity_x = -velocity_x
+        else:
+            break
+
+    return x, y, velocity_x, velocity_y, impacts
+
+def overlaps(x, y, size, rect):
+    return x < rect.right and x + size > rect.left and y < rect.bottom and y + size > rect.top
+
+def time_to_edge(x, y, size, velocity_x, velocity_y, rect):
+    """Time the ball lands on the top or bottom edge of rect from outside, None if it misses"""
+    if velocity_y > 0 and y + size <= rect.top:
+        t = time_to(y, rect.top - size, velocity_y)
+    elif velocity_y < 0 and y >= rect.bottom:
+        t = time_to(y, rect.bottom, velocity_y)
+    else:
+        return None
+    x_at = x + velocity_x * t
+    return t if x_at < rect.right and x_at + size > rect.left else None
+
+def spans(y, size, rect):
+    """Ball at height y overlaps the rect vertically"""
+    return y < rect.bottom and y + size > rect.top
+
+def predict_intercept(x, y, size, velocity_x, velocity_y, face_x):
+    """
+    Height (top) the ball will have when its x reaches face_x, bouncing off the
+    walls on the way, paddles ignored. Wall bounces mirror the path, so the
+    unbounded straight line is folded back into the field. None if the ball
+    moves away from face_x.
+    """
+    t = time_to(x, face_x, velocity_x)
+    if t is None:
+        return None
+    top = CONTROL_PANEL_HEIGHT
+    span = TOTAL_HEIGHT - size - top
+    folded = (y + velocity_y * t - top) % (2 * span)
+    if folded > span:
+        folded = 2 * span - folded
+    return top + folded
@@ -1,30 +1,47 @@
 import pygame
 import random
 from config import *
+from collision import sweep_ball
 
 class Ball(pygame.Rect):
-    def __init__(self, x, y, speed):
+    def __init__(self, x, y, speed, rng=random):
         # init parent class 'pygame.Rect'
         super().__init__(x, y, BALL_SIZE, BALL_SIZE)
         self.speed = speed
+        # anything with choice(), the random module or a sampling.RandomStream
+        self.rng = rng
+
+        # exact position, the rect holds it rounded down to whole pixels
+        self.position_x = float(self.x)
+        self.position_y = float(self.y)
 
         # init velocity
         # start unpredictable
-        self.velocity_x = random.choice([speed, -speed])
-        self.velocity_y = random.choice([speed, -speed])
+        self.velocity_x = self.rng.choice([speed, -speed])
+        self.velocity_y = self.rng.choice([speed, -speed])
 
-    def move(self):
-        """Update balls position based on velocity"""
-        self.x += self.velocity_x
-        self.y += self.velocity_y
+    def move(self, left_paddle, right_paddle, duration=1.0):
+        """
+        Update balls position based on velocity, bouncing off walls and paddles
+        on the way (swept, see collision.py). duration is in ticks of
+        SPEED_REFERENCE_RATE. Returns what was hit, in order
+        """
+        (self.position_x, self.position_y, self.velocity_x, self.velocity_y,
+         impacts) = sweep_ball(self.position_x, self.position_y, self.width, self.velocity_x, self.velocity_y,
+                               duration, left_paddle, right_paddle)
+        self.x = int(self.position_x)
+        self.y = int(self.position_y)
+        return impacts
 
     def reset(self):
         """Reset ball to center of screen & reverse horizontal direction"""
         self.center = (WIDTH // 2, (HEIGHT // 2) + CONTROL_PANEL_HEIGHT)
+        self.position_x = float(self.x)
+        self.position_y = float(self.y)
         # reverse horizontal direction to alternate serves
         self.velocity_x *= -1
         # give new random vertical angle (when combined with horizontal component)
-        self.velocity_y = random.choice([self.speed, -self.speed])
+        self.velocity_y = self.rng.choice([self.speed, -self.speed])
     
     def increase_speed(self):
         """Increase ball speed and apply it to velocity vector after a point is made"""
@@ -1,12 +1,13 @@
 import pygame
 from config import *
+from components.text_cache import get_font, render_text
 
 class Button:
     def __init__(self, x, y, width, height, text, color):
         self.rect = pygame.Rect(x, y, width, height)
         self.text = text
         self.color = color
-        self.font = pygame.font.Font(None, 30)
+        self.font = get_font(30)
         self.is_hovered = False
         self.active = False
 
@@ -23,7 +24,7 @@ class Button:
                 current_color = DARK_GRAY
         pygame.draw.rect(screen, current_color, self.rect, border_radius=5)
 
-        text = self.font.render(self.text, True, WHITE)
+        text = render_text(self.font, self.text, WHITE)
         text_rect = text.get_rect(center=self.rect.center)
         screen.blit(text, text_rect)
 
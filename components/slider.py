@@ -1,5 +1,6 @@
 import pygame
 from config import *
+from components.text_cache import get_font, render_text
 
 class Slider:
     def __init__(self, x, y, width, height, min_val, max_val, label):
@@ -17,7 +18,7 @@ class Slider:
         self.thumb_x = self.slider_min_x
 
         self.dragging = False
-        self.font = pygame.font.Font(None, 24)
+        self.font = get_font(24)
 
     def handle_event(self, event):
         """Handle events that move the slider thumb"""
@@ -74,5 +75,15 @@ class Slider:
             current_color = DARKER_BLUE
         pygame.draw.circle(screen, current_color, (self.thumb_x, self.bar_rect.centery), self.thumb_radius)
         # draw label
-        text = self.font.render(f"{self.label}: {self.value}", True, WHITE)
+        text = render_text(self.font, f"{self.label}: {self.value}", WHITE)
         screen.blit(text, (self.rect.x, self.rect.y))
+
+    def get_bounds(self):
+        """Screen area covered by draw(), used for dirty-rect updates"""
+        label_size = self.font.size(f"{self.label}: {self.value}")
+        label_rect = pygame.Rect((self.rect.x, self.rect.y), label_size)
+        # thumb can stick out past both ends of the bar
+        track_rect = pygame.Rect(self.slider_min_x - self.thumb_radius, self.bar_rect.centery - self.thumb_radius,
+                                 self.slider_max_x - self.slider_min_x + 2 * self.thumb_radius, 2 * self.thumb_radius)
+        # pad for anti-aliased edges
+        return label_rect.union(track_rect).inflate(4, 4)
@@ -0,0 +1,53 @@
+import math
+import pygame
+from config import *
+from components.text_cache import get_font, render_text
+
+LABEL_HEIGHT = 12
+
+class Sparkline:
+    """Small line chart of one or more telemetry.RingSeries, scaled to the largest value shown"""
+    def __init__(self, x, y, width, height, label, unit):
+        self.rect = pygame.Rect(x, y, width, height)
+        self.label = label
+        self.unit = unit
+        self.font = get_font(16)
+        # chart as last drawn, repainted in place, and the series versions it shows
+        self._surface = pygame.Surface(self.rect.size).convert()
+        self._drawn_key = None
+
+    def get_bounds(self):
+        return self.rect.copy()
+
+    def draw(self, screen, series_colors):
+        """series_colors: (RingSeries, color) pairs, drawn in order. Gaps (nan) break the line"""
+        # only re-plotted when a series got a new sample
+        key = tuple(series.appended for series, color in series_colors)
+        if key != self._drawn_key:
+            self._drawn_key = key
+            self._plot(series_colors)
+        screen.blit(self._surface, self.rect)
+
+    def _plot(self, series_colors):
+        surface = self._surface
+        surface.fill(CONTROL_CENTER_BLUE)
+        bounds = surface.get_rect()
+        pygame.draw.rect(surface, DARK_GRAY, bounds, 1)
+        lines = [(series.values(), color) for series, color in series_colors]
+        top = max([value for values, color in lines for value in values if not math.isnan(value)], default=0)
+        top = max(top, 1)
+
+        # label strip on top, chart below it
+        label = render_text(self.font, f"{self.label} {top:.0f}{self.unit}", GRAY)
+        surface.blit(label, (3, 1))
+        inner = pygame.Rect(2, LABEL_HEIGHT, bounds.width - 4, bounds.height - LABEL_HEIGHT - 2)
+        for values, color in lines:
+            x_step = (inner.width - 1) / max(1, len(values) - 1)
+            segment = []
+            for i, value in enumerate(values + [math.nan]):
+                if math.isnan(value):
+                    if len(segment) > 1:
+                        pygame.draw.lines(surface, color, False, segment)
+                    segment = []
+                    continue
+                segment.append((inner.x + i * x_step, inner.bottom - 1 - value / top * (inner.height - 1)))
@@ -0,0 +1,41 @@
+import pygame
+from collections import OrderedDict
+from config import TEXT_CACHE_SIZE
+
+# (name, size) -> shared pygame.font.Font
+_fonts = {}
+# (font, text, color) -> rendered surface, least recently used first
+_text_surfaces = OrderedDict()
+
+cache_hits = 0
+cache_misses = 0
+
+def get_font(size, name=None):
+    """Shared font instance, loaded once per (name, size)"""
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = pygame.font.Font(name, size)
+        _fonts[key] = font
+    return font
+
+def render_text(font, text, color):
+    """
+    Anti-aliased font.render(text) reused from a bounded LRU cache.
+    Returned surfaces are shared, blit them but don't draw on them.
+    """
+    global cache_hits, cache_misses
+
+    key = (font, text, color)
+    surface = _text_surfaces.get(key)
+    if surface is not None:
+        cache_hits += 1
+        _text_surfaces.move_to_end(key)
+        return surface
+
+    cache_misses += 1
+    surface = font.render(text, True, color)
+    _text_surfaces[key] = surface
+    if len(_text_surfaces) > TEXT_CACHE_SIZE:
+        _text_surfaces.popitem(last=False)
+    return surface
@@ -23,13 +23,34 @@ JITTER_MAP = {
 
 # preset options to mimic real scenarios
 # scaled down from real-world avergages 
+# optional 'loss_model' / 'jitter_model': (name, params) from impairment.py,
+# default is independent (bernoulli) loss & uniform jitter
 PRESET_MAP = {
     'LAN' : {'latency' : 1, 'loss' : 0.0},
     'Wi-Fi' : {'latency' : 15, 'loss' : 0.1},
     '4G LTE' : {'latency' : 80, 'loss' : 1.0},
     # Geo-satellite
     'Sat' : {'latency' : 400, 'loss' : 3.0},
+    # same networks with the other impairment models
+    # interference drops packets in short bursts
+    'Wi-Fi bursty' : {'latency' : 15, 'loss' : 0.1,
+                      'loss_model' : ('gilbert_elliott', {'mean_burst' : 3})},
+    # scheduler & handovers make consecutive packets see similar delay
+    '4G drifting' : {'latency' : 80, 'loss' : 1.0,
+                     'jitter_model' : ('correlated', {'correlation' : 0.9})},
+    'Sat spiky' : {'latency' : 400, 'loss' : 3.0,
+                   'loss_model' : ('gilbert_elliott', {'mean_burst' : 5}),
+                   'jitter_model' : ('pareto', {'alpha' : 2.5})},
 }
+# presets with a button in the control panel, the others are for the command line tools
+PRESET_BUTTONS = ['LAN', 'Wi-Fi', '4G LTE', 'Sat']
+
+# quantiles precomputed per jitter distribution (inverse-CDF lookup table)
+JITTER_TABLE_SIZE = 1024
+
+# client send rates (Hz), inputs between sends are merged into one packet
+SEND_RATES = [10, 20, 30, 60]
+DEFAULT_SEND_RATE = 60
 
 # preset buttons
 PRESET_Y = 80
@@ -42,6 +63,12 @@ MUTE_BTN_W = 100
 MUTE_BTN_X = WIDTH - MUTE_BTN_W - 20
 MUTE_BTN_Y = 100
 
+# send rate button (cycles through SEND_RATES)
+SEND_RATE_BTN_X = 210
+SEND_RATE_BTN_Y = 116
+SEND_RATE_BTN_W = 170
+SEND_RATE_BTN_H = 28
+
 # slider
 SLIDER_Y = 30
 SLIDER_X_START = 50
@@ -67,8 +94,114 @@ DARK_GRAY = (55, 55, 60)
 CONTROL_CENTER_BLUE = (28, 32, 42)
 
 # component constants
+# speeds are px per tick of SPEED_REFERENCE_RATE, whatever the simulation rate
+SPEED_REFERENCE_RATE = 60
 PADDLE_WIDTH, PADDLE_HEIGHT = 15, 100
 PADDLE_SPEED = 8
 BALL_SIZE = 15
 BALL_SPEED = 4
-BALL_SPEED_INCREMENT = 0.2
\ No newline at end of file
+BALL_SPEED_INCREMENT = 0.2
+
+# random draws pre-generated per stream at a time (see sampling.py)
+RNG_BLOCK_SIZE = 4096
+
+# only repaint changed screen areas (falls back to full redraws on flashes & overlays)
+DIRTY_RECT_RENDERING = True
+
+# rendered text surfaces kept by components/text_cache.py
+TEXT_CACHE_SIZE = 256
+
+# packet records preallocated by each DegradationEngine (grows on demand)
+PACKET_POOL_SIZE = 1024
+
+# network traces (see network_trace.py)
+TRACE_CSV_INDEX_STRIDE = 1024  # csv rows between sparse index entries
+TRACE_SEEK_THRESHOLD = 5000    # ms, forward jumps further than this seek instead of reading through
+TRACE_SCRUB_STEP = 60 * 1000   # ms moved per left/right key press in the game
+
+# match recordings (see recording.py): bytes buffered before handing a chunk to the writer thread
+RECORD_CHUNK_SIZE = 64 * 1024
+
+# frame profiler (see profiler.py)
+FRAME_BUDGET_MS = 1000 / FPS
+PROFILER_WINDOW = 600           # frames kept per stage for rolling p50/p99
+PROFILER_OVERLAY_INTERVAL = 500 # ms between overlay text updates
+# session histogram bucket upper edges in microseconds
+PROFILER_BUCKETS_US = [50, 100, 250, 500, 1000, 2000, 4000, 8000, 16667, 33333, 100000]
+
+# client-side prediction of the player paddle (see prediction.py)
+PREDICTION_SMOOTHING = 0.25                # share of the prediction error corrected per frame
+PREDICTION_SNAP_DISTANCE = PADDLE_HEIGHT   # px, errors larger than this are corrected at once
+PREDICTION_TOLERANCE = 1                   # px, smaller errors don't count as mispredictions
+
+# two player mode over loopback udp (see net_server.py / net_client.py)
+NET_HOST = '127.0.0.1'
+NET_PORT = 50007
+NET_HELLO_INTERVAL = 500   # ms between join attempts until the server answers
+NET_PING_INTERVAL = 1000   # ms between round trip measurements
+NET_STATS_INTERVAL = 1000  # ms between stats updates (server log, client panel)
+
+# udp impairment proxy (see udp_proxy.py)
+PROXY_PORT = 50100
+PROXY_TIMER_SLACK = 0.5          # ms, packets due this close together go out in one timer callback
+PROXY_SOCKET_BUFFER = 4 * 1024 * 1024  # bytes of kernel send/receive buffer asked for per socket
+PROXY_STATS_INTERVAL = 1000      # ms between live stats lines
+PROXY_SESSION_TIMEOUT = 60 * 1000  # ms without traffic before a client's upstream socket is closed
+PROXY_READ_BATCH = 256           # datagrams read from a socket per wakeup
+PROXY_MAX_DATAGRAM = 65535
+
+# fixed timestep: the match always advances in ticks of 1 / SIMULATION_RATE s,
+# however fast frames are rendered (RENDER_FPS 0 = uncapped)
+SIMULATION_RATE = 60
+RENDER_FPS = FPS
+MAX_SUBSTEPS = 8  # ticks run per rendered frame at most, beyond that the match falls behind real time
+
+# ai paddle: 'track' follows the ball every tick, 'intercept' predicts where the
+# ball meets the paddle once per trajectory and sends a packet only when that changes
+AI_MODES = ['track', 'intercept']
+DEFAULT_AI_MODE = 'track'
+# reaction: multiple of AI_REACTION_TIME, speed: share of PADDLE_SPEED,
+# aim_error: px, the intercept aims at most this far off the predicted ball center
+AI_DIFFICULTY = {
+    'easy' : {'reaction' : 1.5, 'speed' : 0.6, 'aim_error' : PADDLE_HEIGHT * 0.75},
+    'normal' : {'reaction' : 1.0, 'speed' : 1.0, 'aim_error' : PADDLE_HEIGHT * 0.25},
+    'hard' : {'reaction' : 0.5, 'speed' : 1.0, 'aim_error' : PADDLE_HEIGHT * 0.1},
+    'perfect' : {'reaction' : 0.0, 'speed' : 1.0, 'aim_error' : 0}
+}
+DEFAULT_AI_DIFFICULTY = 'normal'
+AI_PLAN_TOLERANCE = 2  # px, a new plan closer than this to the last one sent is not sent
+
+# audio, loaded in the background (see audio.py)
+AUDIO_FILES = {
+    'ai_scored' : "audio_files/ai_scored.wav",
+    'paddle_hit' : "audio_files/paddle_hit.wav",
+    'player_scored' : "audio_files/player_scored.wav"
+}
+MUSIC_FILE = "audio_files/background_music.wav"  # streamed, never decoded whole
+MUSIC_VOLUME = 0.3
+UNMUTED_MUSIC_VOLUME = 0.5  # music comes back a little louder after MUTE / UNMUTE
+
+# delivered-delay telemetry per flow (see telemetry.py)
+TELEMETRY_PRECISION_BITS = 5   # 32 buckets per power of two, percentiles within ~3%
+TELEMETRY_MAX_DELAY = 60_000   # ms, longer delays count as this
+TELEMETRY_INTERVAL = 250       # ms of simulated time per sparkline sample
+TELEMETRY_HISTORY = 120        # sparkline samples kept (30 s)
+TELEMETRY_PERCENTILES = (0.5, 0.95, 0.99)
+# sparklines in the control panel, right of the send rate button
+SPARKLINE_X = 392
+SPARKLINE_Y = 114
+SPARKLINE_W = 94
+SPARKLINE_H = 32
+SPARKLINE_GAP = 6
+
+# metrics export for unattended runs (see metrics_exporter.py)
+METRICS_HOST = '127.0.0.1'     # never served beyond localhost
+METRICS_INTERVAL = 1000        # ms between snapshots published by the game loop / json lines written
+METRICS_DELAY_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 200, 400, 800, 1600, 3200]
+
+# optional bottleneck link per flow (see link_model.py), off unless a rate is given
+# an input packet on the wire: input message (7) + udp (8) + ipv4 (20) headers
+LINK_PACKET_BYTES = 35
+LINK_BUFFER_PACKETS = 50       # packets the link buffer holds before dropping
+QUEUE_DISCIPLINES = ['drop_tail', 'red', 'codel']
+DEFAULT_QUEUE_DISCIPLINE = 'drop_tail'
@@ -1,116 +1,297 @@
-import time
-import random
-from collections import deque
+import heapq
+from itertools import count
 from config import *
+from clock import MonotonicClock, NS_PER_MS
+from sampling import RandomStreams
+from packet_store import PacketPool
+from impairment import ImpairedFlow, max_jitter_for
+from telemetry import FlowTelemetry
+from link_model import make_link
 
 class DegradationEngine:
-    def __init__(self, player_paddle, ai_paddle):
-        # queue to hold inputs
-        self.action_queue = deque()
+    def __init__(self, player_paddle, ai_paddle, clock=None, allow_reordering=True, streams=None):
+        # min-heap of (time_due, sequence, Packet) so packets release strictly by due time
+        # time_due is integer ns on self.clock, ties release in send order
+        self.action_queue = []
         self.immediate_queue = []
+        # recycled packet records, no per-packet garbage in steady state
+        self.pool = PacketPool()
         self.latency = 0
         self.loss_percent = 0.0
+        # None: max jitter comes from JITTER_MAP for the latency
+        self.max_jitter = None
+        # optional recording.MatchRecorder, told about every param change
+        self.recorder = None
+        # extra delay (ms) on the ai paddle's packets to make it beatable,
+        # 0 when a second human plays that paddle
+        self.ai_reaction_time = AI_REACTION_TIME
+        # player's packets skip latency & jitter at latency <= 5 ms,
+        # False when a second human plays the ai paddle so both flows are impaired alike
+        self.player_bypass = True
 
         self.player_paddle = player_paddle
         self.ai_paddle = ai_paddle
 
+        # monotonic real time unless a simulated clock is injected
+        self.clock = clock if clock is not None else MonotonicClock()
+        # independent loss & jitter draws per flow (player / ai)
+        self.streams = streams if streams is not None else RandomStreams()
+        self.player_flow = ImpairedFlow(self.streams.stream('player_loss'), self.streams.stream('player_jitter'))
+        self.ai_flow = ImpairedFlow(self.streams.stream('ai_loss'), self.streams.stream('ai_jitter'))
+        self.player_queue_stream = self.streams.stream('player_queue')
+        self.ai_queue_stream = self.streams.stream('ai_queue')
+
+        # loss & jitter models, one instance per flow (ImpairedFlow) since models keep state
+        self.loss_model_spec = None
+        self.jitter_model_spec = None
+        self.set_models()
+
+        # optional bandwidth-limited link per flow (link_model.py), None: unlimited bandwidth
+        self.link_spec = None
+        self.player_link = None
+        self.ai_link = None
+
+        # if False, packets of one paddle never overtake each other (in-order delivery)
+        self.allow_reordering = allow_reordering
+        self._sequence = count()
+        self._last_time_due = {}
+
         self.packets_sent = 0
         self.packets_lost = 0
+        # dropped by a link buffer, apart from the loss model's losses
+        self.packets_queue_dropped = 0
+        # delivered delay & loss per flow, session history survives reset_stats
+        self.player_telemetry = FlowTelemetry()
+        self.ai_telemetry = FlowTelemetry()
 
-    def set_parameters(self, latency, loss_percent):
-        """Update degradation params from slider values"""
+    def set_parameters(self, latency, loss_percent, max_jitter=None):
+        """
+        Update degradation params from slider values.
+        max_jitter (ms) overrides JITTER_MAP, e.g. with a measured value from a trace
+        """
+        # called every frame, only reconfigure models on change
+        if latency == self.latency and loss_percent == self.loss_percent and max_jitter == self.max_jitter:
+            return
         self.latency = latency
         self.loss_percent = loss_percent
+        self.max_jitter = max_jitter
+        self._configure_models()
+        if self.recorder is not None:
+            self.recorder.record_parameters(latency, loss_percent, max_jitter)
+
+    def set_models(self, loss_model=None, jitter_model=None):
+        """
+        Pick impairment models as (name, params) specs from impairment.py,
+        None for the default (independent loss, uniform jitter)
+        """
+        self.loss_model_spec = loss_model
+        self.jitter_model_spec = jitter_model
+        self.player_flow.set_models(loss_model, jitter_model)
+        self.ai_flow.set_models(loss_model, jitter_model)
+        self._configure_models()
+        if self.recorder is not None:
+            self.recorder.record_models(loss_model, jitter_model)
+
+    def set_link(self, link=None):
+        """
+        Put each flow behind a BottleneckLink built from a dict of its arguments
+        (rate kbit/s, buffer, burst, queue), None for unlimited bandwidth
+        """
+        self.link_spec = link
+        self.player_link = make_link(link)
+        self.ai_link = make_link(link)
+        if self.recorder is not None:
+            self.recorder.record_link(link)
+
+    def _configure_models(self):
+        """Precompute model tables for the current latency & loss"""
+        max_jitter = self.get_max_jitter()
+        for flow in (self.player_flow, self.ai_flow):
+            flow.configure(self.latency, self.loss_percent, max_jitter)
 
     def get_max_jitter(self):
         """Calculate max jitter based off latency slider & config JITTER_MAP"""
-        max_jitter = 0
-        for threshold, jitter_val in sorted(JITTER_MAP.items()):
-            if self.latency >= threshold:
-                max_jitter = jitter_val
-        return max_jitter
+        if self.max_jitter is not None:
+            return self.max_jitter
+        return max_jitter_for(self.latency)
 
     def queue_input(self, target_paddle, data):
         """
         Receive input and queue it if it passes loss check.
         Handle packet loss.
         Handle latency and jitter.
+        Returns the packet's sequence number, lost packets use one up too
         """
         self.packets_sent += 1
+        sequence = next(self._sequence)
+
+        if target_paddle is self.player_paddle:
+            flow = self.player_flow
+            link = self.player_link
+            queue_stream = self.player_queue_stream
+            telemetry = self.player_telemetry
+        else:
+            flow = self.ai_flow
+            link = self.ai_link
+            queue_stream = self.ai_queue_stream
+            telemetry = self.ai_telemetry
 
         # check for packet loss
-        if random.random() * 100 < self.loss_percent:
+        if flow.is_lost():
             self.packets_lost += 1
-            return None  # drop packet
-
-        # no delay for user at latency = 0
-        if target_paddle is self.player_paddle and self.latency <= 5:
-            action = {
-                'target' : target_paddle,
-                'data' : data,
-                'time_due' : 0
-            }
-            self.immediate_queue.append(action)
-            return
+            telemetry.on_sent(True)
+            return sequence  # drop packet
+
+        time_sent = self.clock.now_ns()
+
+        # through the link first: latency & jitter start once the packet has left its buffer
+        time_left = time_sent
+        if link is not None:
+            time_left = link.enqueue(time_sent, queue_stream)
+            if time_left is None:
+                self.packets_queue_dropped += 1
+                telemetry.on_sent(True)
+                return sequence
+        telemetry.on_sent(False)
+
+        # no delay for user at latency = 0 (unless the link queued it)
+        if (self.player_bypass and target_paddle is self.player_paddle and self.latency <= 5
+                and time_left == time_sent):
+            packet = self.pool.acquire(target_paddle, data, time_sent, 0, sequence)
+            self.immediate_queue.append(packet)
+            return sequence
 
         else:
             # add ai imperfection
             if target_paddle == self.ai_paddle:
-                ai_delay_seconds = AI_REACTION_TIME / 1000.0
+                ai_delay_ms = self.ai_reaction_time
             else:
-                ai_delay_seconds = 0
+                ai_delay_ms = 0
 
             # apply latency with random jitter
-            base_delay_seconds = self.latency / 1000.0
-            # don't have jitter for no latency
-            if self.latency > 0:
-                jitter_delay_seconds = (random.uniform(0, self.get_max_jitter()) / 1000.0)
-            else:
-                jitter_delay_seconds = 0
-
-            total_delay_seconds = (base_delay_seconds + jitter_delay_seconds + ai_delay_seconds)
-            time_due = time.time() + total_delay_seconds
-        
-        # queue action
-        action = {
-            'target' : target_paddle,
-            'data' : data,  # direction (-1 or 1)
-            'time_due' : time_due
-        }
-        self.action_queue.append(action)
+            time_due = flow.due_time(time_left, ai_delay_ms)
 
-    def get_due_actions(self):
-        """Return list of all past due actions. Remove them from queue"""
-        released_actions = []
+        # in-order delivery: hold packet until the previous one of its flow is due
+        if not self.allow_reordering:
+            time_due = max(time_due, self._last_time_due.get(id(target_paddle), 0))
+            self._last_time_due[id(target_paddle)] = time_due
+
+        # queue action, data is the move amount
+        self.pool.push(self.action_queue, target_paddle, data, time_sent, time_due, sequence)
+        return sequence
+
+    def release_due_actions(self, callback):
+        """
+        Call callback(packet) for every past due packet and remove it from queue.
+        Packets go back to the pool right after the callback, don't keep them.
+        Returns number of packets released
+        """
+        pool = self.pool
+        released = 0
+        current_time = self.clock.now_ns()
+        player_paddle = self.player_paddle
+        player_telemetry = self.player_telemetry
+        ai_telemetry = self.ai_telemetry
+        player_telemetry.sample(current_time)
+        ai_telemetry.sample(current_time)
+        player_delays = player_telemetry.session
+        ai_delays = ai_telemetry.session
 
         # first get immediate
         if self.immediate_queue:
-            released_actions.extend(self.immediate_queue)
+            for packet in self.immediate_queue:
+                player_delays.add(current_time - packet.time_sent)
+                callback(packet)
+                pool.release(packet)
+            released += len(self.immediate_queue)
             self.immediate_queue.clear()
 
-        # pop oldest action if its due
-        current_time = time.time()
-        while self.action_queue and self.action_queue[0]['time_due'] <= current_time:
-            released_actions.append(self.action_queue.popleft())
+        # pop earliest due packets, regardless of the order they were sent
+        queue = self.action_queue
+        while queue and queue[0][0] <= current_time:
+            packet = heapq.heappop(queue)[2]
+            # delay actually seen, from send until this release (frame quantization included)
+            (player_delays if packet.target is player_paddle else ai_delays).add(current_time - packet.time_sent)
+            callback(packet)
+            pool.release(packet)
+            released += 1
+        return released
+
+    def get_due_actions(self):
+        """Return list of all past due actions as dicts. Remove them from queue"""
+        released_actions = []
+        self.release_due_actions(lambda packet: released_actions.append({
+            'target' : packet.target,
+            'data' : packet.data,
+            'time_sent' : packet.time_sent,
+            'time_due' : packet.time_due
+        }))
         return released_actions
 
     def get_stats(self):
-        """Return current stats for display"""
+        """Return current stats for display, counters only so it is cheap every frame"""
         # calculate loss rate
         total = self.packets_sent
         lost = self.packets_lost
         loss_rate = (lost / total) * 100 if total > 0 else 0.0
+        queue_dropped = self.packets_queue_dropped
 
         return {
             'sent' : total,
-            'received' : total - lost,
+            'received' : total - lost - queue_dropped,
+            # loss model losses only, link buffer drops are counted apart
             'lost' : lost,
-            'loss rate' : loss_rate
+            'loss rate' : loss_rate,
+            'queue drops' : queue_dropped,
+            'queue drop rate' : (queue_dropped / total) * 100 if total > 0 else 0.0,
+            # packets waiting in the link buffers now, 0 without a link
+            'queue depth' : self.get_queue_depth()
+        }
+
+    def get_point_delay_stats(self):
+        """
+        Delivered delay percentiles (ms, TELEMETRY_PERCENTILES) of each flow in
+        this point. Walks both histograms, don't call it every frame
+        """
+        return {
+            'player delay' : self.player_telemetry.point_percentiles_ms(*TELEMETRY_PERCENTILES),
+            'ai delay' : self.ai_telemetry.point_percentiles_ms(*TELEMETRY_PERCENTILES)
         }
 
+    def get_queue_depth(self):
+        """Packets in both flows' link buffers"""
+        time_now = self.clock.now_ns()
+        return sum(link.backlog(time_now) for link in (self.player_link, self.ai_link) if link is not None)
+
+    def get_session_stats(self):
+        """Delivered delay of each flow since the engine was created, not cleared by reset_stats"""
+        stats = {}
+        for flow, telemetry in (('player', self.player_telemetry), ('ai', self.ai_telemetry)):
+            histogram = telemetry.session
+            stats[flow] = {
+                'delivered' : histogram.count,
+                'mean delay' : histogram.mean_ms(),
+                'max delay' : histogram.max_ns / NS_PER_MS,
+                'delay percentiles' : histogram.percentiles_ms(*TELEMETRY_PERCENTILES)
+            }
+        return stats
+
     def reset_stats(self):
         """Reset packet counters and clear action queue"""
         self.packets_sent = 0
         self.packets_lost = 0
+        self.packets_queue_dropped = 0
+        self.player_telemetry.start_point()
+        self.ai_telemetry.start_point()
+        # hand in-flight packets back to the pool
+        for time_due, sequence, packet in self.action_queue:
+            self.pool.release(packet)
+        for packet in self.immediate_queue:
+            self.pool.release(packet)
         self.action_queue.clear()
         self.immediate_queue.clear()
+        self._last_time_due.clear()
+        # packets in the link buffers went with them
+        for link in (self.player_link, self.ai_link):
+            if link is not None:
+                link.reset()
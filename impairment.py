@@ -0,0 +1,223 @@
+"""
+Loss and jitter models used by DegradationEngine.
+
+Every model is configured once per latency/loss/max jitter change, and
+then costs a fixed number of random draws and table lookups per packet,
+however complex the distribution behind it. Models keep per-flow state,
+so each flow (player / ai) gets its own instances.
+
+ImpairedFlow is the per-packet step (loss draw, then latency + jitter)
+shared by DegradationEngine and udp_proxy, so both impair packets alike.
+"""
+from bisect import bisect_right
+from statistics import NormalDist
+from config import JITTER_MAP, JITTER_TABLE_SIZE
+from clock import NS_PER_MS
+
+# JITTER_MAP sorted once, looked up with bisect
+JITTER_THRESHOLDS = sorted(JITTER_MAP)
+JITTER_VALUES = [JITTER_MAP[threshold] for threshold in JITTER_THRESHOLDS]
+
+def max_jitter_for(latency):
+    """Max jitter (ms) for a latency from config JITTER_MAP"""
+    index = bisect_right(JITTER_THRESHOLDS, latency) - 1
+    return JITTER_VALUES[index] if index >= 0 else 0
+
+class InverseCdfTable:
+    """
+    Quantiles of a distribution at the midpoints of equal-probability bins.
+    Sampling is one lookup with a uniform draw.
+    """
+    def __init__(self, inverse_cdf, size=JITTER_TABLE_SIZE):
+        self.size = size
+        self.values = [inverse_cdf((i + 0.5) / size) for i in range(size)]
+
+    def sample(self, uniform):
+        return self.values[int(uniform * self.size)]
+
+    def mean(self):
+        return sum(self.values) / self.size
+
+
+# loss models
+# is_lost(stream) draws from the flow's loss stream
+
+class BernoulliLoss:
+    """Every packet is lost independently with the slider loss percent"""
+    def configure(self, latency, loss_percent, max_jitter):
+        self.loss_percent = loss_percent
+
+    def is_lost(self, stream):
+        return stream.random() * 100 < self.loss_percent
+
+class GilbertElliottLoss:
+    """
+    Bursty loss: a two-state Markov chain (good / bad) with its own loss
+    rate per state. Transition probabilities are solved so the long-run
+    loss matches the slider, with bursts of mean_burst packets on average.
+    """
+    def __init__(self, mean_burst=4.0, bad_loss=1.0, good_loss=0.0):
+        if mean_burst < 1:
+            raise ValueError("mean_burst must be at least 1 packet")
+        if not 0 <= good_loss < bad_loss <= 1:
+            raise ValueError("need 0 <= good_loss < bad_loss <= 1")
+        self.mean_burst = mean_burst
+        self.bad_loss = bad_loss
+        self.good_loss = good_loss
+        self.in_bad_state = False
+
+    def configure(self, latency, loss_percent, max_jitter):
+        # share of time in the bad state that gives the target average loss
+        target = loss_percent / 100
+        bad_share = (target - self.good_loss) / (self.bad_loss - self.good_loss)
+        bad_share = max(0.0, min(1.0, bad_share))
+
+        # leave bad state after mean_burst packets on average
+        self.bad_to_good = 1.0 / self.mean_burst
+        if bad_share >= 1.0:
+            self.good_to_bad = 1.0
+            self.bad_to_good = 0.0
+        else:
+            self.good_to_bad = min(1.0, self.bad_to_good * bad_share / (1.0 - bad_share))
+        if bad_share == 0.0:
+            self.in_bad_state = False
+
+    def is_lost(self, stream):
+        # state transition, then loss draw for the new state
+        if self.in_bad_state:
+            if stream.random() < self.bad_to_good:
+                self.in_bad_state = False
+        elif stream.random() < self.good_to_bad:
+            self.in_bad_state = True
+
+        loss_rate = self.bad_loss if self.in_bad_state else self.good_loss
+        return stream.random() < loss_rate
+
+
+# jitter models
+# sample(stream) returns extra delay in ms, scaled to max_jitter
+# (max_jitter_for(latency) unless the engine overrides it, e.g. from a trace)
+
+class UniformJitter:
+    """Jitter spread evenly between 0 and max jitter"""
+    def configure(self, latency, loss_percent, max_jitter):
+        self.max_jitter = max_jitter
+
+    def sample(self, stream):
+        return stream.uniform(0, self.max_jitter)
+
+class TableJitter:
+    """
+    Jitter from a precomputed unit distribution, scaled so its mean
+    equals the uniform model's (max jitter / 2)
+    """
+    def __init__(self, inverse_cdf):
+        table = InverseCdfTable(inverse_cdf)
+        unit_mean = table.mean()
+        self.table = InverseCdfTable(lambda q: max(0.0, inverse_cdf(q)) * 0.5 / unit_mean)
+
+    def configure(self, latency, loss_percent, max_jitter):
+        self.max_jitter = max_jitter
+
+    def sample(self, stream):
+        return self.table.sample(stream.random()) * self.max_jitter
+
+class ParetoJitter(TableJitter):
+    """Heavy-tailed jitter (Pareto type II), occasional large spikes"""
+    def __init__(self, alpha=2.5):
+        if alpha <= 1:
+            raise ValueError("alpha must be > 1 for a finite mean")
+        super().__init__(lambda q: (1 - q) ** (-1 / alpha) - 1)
+
+class NormalJitter(TableJitter):
+    """Jitter clustered around max jitter / 2, std given as a fraction of max jitter"""
+    def __init__(self, std=0.2):
+        distribution = NormalDist(0.5, std)
+        super().__init__(distribution.inv_cdf)
+
+class CorrelatedJitter:
+    """
+    Jitter that drifts instead of jumping: each packet keeps `correlation`
+    of the previous packet's jitter (AR(1) over uniform jitter). The drift
+    carries over parameter changes, rescaled to the new max jitter
+    """
+    def __init__(self, correlation=0.8):
+        if not 0 <= correlation < 1:
+            raise ValueError("correlation must be in [0, 1)")
+        self.correlation = correlation
+        self.max_jitter = 0
+        self.previous = None
+
+    def configure(self, latency, loss_percent, max_jitter):
+        if self.previous is not None:
+            # same share of the new max jitter, from a max jitter of 0 the drift starts at 0
+            self.previous = self.previous * max_jitter / self.max_jitter if self.max_jitter else 0.0
+        self.max_jitter = max_jitter
+
+    def sample(self, stream):
+        fresh = stream.uniform(0, self.max_jitter)
+        if self.previous is None:
+            self.previous = fresh
+        else:
+            self.previous = self.correlation * self.previous + (1 - self.correlation) * fresh
+        return self.previous
+
+
+LOSS_MODELS = {
+    'bernoulli' : BernoulliLoss,
+    'gilbert_elliott' : GilbertElliottLoss,
+}
+
+JITTER_MODELS = {
+    'uniform' : UniformJitter,
+    'pareto' : ParetoJitter,
+    'normal' : NormalJitter,
+    'correlated' : CorrelatedJitter,
+}
+
+DEFAULT_LOSS_MODEL = ('bernoulli', {})
+DEFAULT_JITTER_MODEL = ('uniform', {})
+
+def make_model(models, spec):
+    """Build a model from a (name, params) spec"""
+    name, params = spec
+    if name not in models:
+        raise ValueError(f"unknown impairment model '{name}', expected one of {sorted(models)}")
+    return models[name](**params)
+
+def make_loss_model(spec=None):
+    return make_model(LOSS_MODELS, spec or DEFAULT_LOSS_MODEL)
+
+def make_jitter_model(spec=None):
+    return make_model(JITTER_MODELS, spec or DEFAULT_JITTER_MODEL)
+
+
+class ImpairedFlow:
+    """
+    One flow's loss & jitter: its models and random streams. Rebuilding
+    the models (set_models) starts their state over, configure keeps it
+    """
+    def __init__(self, loss_stream, jitter_stream):
+        self.loss_stream = loss_stream
+        self.jitter_stream = jitter_stream
+        self.latency = 0
+        self.set_models()
+
+    def set_models(self, loss_model=None, jitter_model=None):
+        """(name, params) specs, None for the default models"""
+        self.loss_model = make_loss_model(loss_model)
+        self.jitter_model = make_jitter_model(jitter_model)
+
+    def configure(self, latency, loss_percent, max_jitter):
+        self.latency = latency
+        self.loss_model.configure(latency, loss_percent, max_jitter)
+        self.jitter_model.configure(latency, loss_percent, max_jitter)
+
+    def is_lost(self):
+        return self.loss_model.is_lost(self.loss_stream)
+
+    def due_time(self, time_start, extra_ms=0):
+        """When (ns) a packet leaving at time_start arrives: latency + jitter + extra_ms later"""
+        # don't have jitter for no latency
+        jitter_ms = self.jitter_model.sample(self.jitter_stream) if self.latency > 0 else 0
+        return time_start + int((self.latency + jitter_ms + extra_ms) * NS_PER_MS)
@@ -0,0 +1,47 @@
+from config import DEFAULT_SEND_RATE
+from clock import NS_PER_SECOND
+
+class InputCoalescer:
+    """
+    Client-side send buffer for one paddle.
+    Moves are summed between sends and go out as a single packet
+    at most once per send interval. Empty updates are never sent.
+    """
+    def __init__(self, engine, paddle, clock, send_rate=DEFAULT_SEND_RATE):
+        self.engine = engine
+        self.paddle = paddle
+        self.clock = clock
+        self.pending_move = 0
+        self.next_send_ns = 0
+        self.set_send_rate(send_rate)
+
+    def set_send_rate(self, send_rate):
+        """Change tick rate (Hz), takes effect from the next send"""
+        self.send_rate = send_rate
+        self.send_interval_ns = NS_PER_SECOND // send_rate
+
+    def add(self, move_amount):
+        """Merge a move into the next packet"""
+        self.pending_move += move_amount
+
+    def flush(self):
+        """Send merged moves if a send tick has come. Returns the packet's sequence number, None if nothing was sent"""
+        time_now = self.clock.now_ns()
+        if time_now < self.next_send_ns:
+            return None
+
+        # stay on a fixed tick grid, skipping ticks missed by slow frames
+        self.next_send_ns += self.send_interval_ns
+        if self.next_send_ns <= time_now:
+            missed_ticks = (time_now - self.next_send_ns) // self.send_interval_ns + 1
+            self.next_send_ns += missed_ticks * self.send_interval_ns
+
+        if self.pending_move == 0:
+            return None
+        sequence = self.engine.queue_input(self.paddle, self.pending_move)
+        self.pending_move = 0
+        return sequence
+
+    def reset(self):
+        """Drop unsent moves"""
+        self.pending_move = 0
@@ -0,0 +1,237 @@
+"""
+Bandwidth-limited link in front of DegradationEngine's delay, per flow.
+
+A token bucket lets a flow through at `rate` kbit/s (an idle link saves
+up credit for a burst of `burst` bytes), packets waiting for tokens sit
+in a FIFO buffer of `buffer` packets. A flow sending faster than the link
+builds a standing queue, every queued packet adding to the delay of the
+ones behind it: bufferbloat.
+
+The link is FIFO with a fixed cost per packet, so when a packet arrives
+the time it reaches the head of the buffer and the time it leaves are
+already decided by the packets ahead of it. Each packet is therefore
+handled once, on arrival, in O(1) amortized: no timers, no per-tick work,
+and the queue discipline sees the same queue it would packet by packet.
+
+Queue disciplines (name, params) decide what the buffer drops:
+drop_tail  arrivals while the buffer is full
+red        arrivals, early and at random, more the longer the average queue
+codel      packets at the head once they've waited longer than target for an interval
+"""
+import math
+from collections import deque
+from config import LINK_PACKET_BYTES, LINK_BUFFER_PACKETS, DEFAULT_QUEUE_DISCIPLINE
+from clock import NS_PER_MS, NS_PER_SECOND
+
+# queue disciplines
+# drop_on_arrival(queue_length, idle_ns, stream): drop a packet arriving to queue_length packets
+# drop_on_dequeue(sojourn_ns, time_ns, queue_ahead): drop a packet leaving the buffer at time_ns
+# a full buffer always drops the arrival, whatever the discipline
+
+class DropTail:
+    """Only the full buffer drops"""
+    def configure(self, packet_ns):
+        pass
+
+    def drop_on_arrival(self, queue_length, idle_ns, stream):
+        return False
+
+    def drop_on_dequeue(self, sojourn_ns, time_ns, queue_ahead):
+        return False
+
+class RedQueue:
+    """
+    Random early detection (Floyd & Jacobson 1993): drop arrivals with a
+    probability rising from 0 at min_threshold to max_probability at
+    max_threshold of the average queue (packets, EWMA with weight), and all
+    of them above. Drops are spread out by counting arrivals since the last one.
+    """
+    def __init__(self, min_threshold=5, max_threshold=15, max_probability=0.1, weight=0.02):
+        if not 0 <= min_threshold < max_threshold:
+            raise ValueError("need 0 <= min_threshold < max_threshold")
+        if not 0 < max_probability <= 1 or not 0 < weight <= 1:
+            raise ValueError("max_probability and weight must be in (0, 1]")
+        self.min_threshold = min_threshold
+        self.max_threshold = max_threshold
+        self.max_probability = max_probability
+        self.weight = weight
+
+    def configure(self, packet_ns):
+        self.packet_ns = packet_ns
+        self.average = 0.0
+        # arrivals since the last drop, -1 while below min_threshold
+        self.count = -1
+
+    def drop_on_arrival(self, queue_length, idle_ns, stream):
+        if queue_length:
+            self.average += self.weight * (queue_length - self.average)
+        else:
+            # an idle link decays the average as if small packets had kept arriving to an empty queue
+            self.average *= (1 - self.weight) ** (idle_ns / self.packet_ns)
+
+        if self.average < self.min_threshold:
+            self.count = -1
+            return False
+        if self.average >= self.max_threshold:
+            self.count = 0
+            return True
+        self.count += 1
+        probability = self.max_probability * (self.average - self.min_threshold) / (self.max_threshold - self.min_threshold)
+        if self.count * probability < 1:
+            probability /= 1 - self.count * probability
+        else:
+            probability = 1.0
+        if stream.random() < probability:
+            self.count = 0
+            return True
+        return False
+
+    def drop_on_dequeue(self, sojourn_ns, time_ns, queue_ahead):
+        return False
+
+class CoDelQueue:
+    """
+    Controlled delay (RFC 8289): once packets have waited longer than
+    target (ms) at the head for a whole interval (ms), drop one and keep
+    dropping at interval / sqrt(drops) until the wait is back under target.
+    A packet that found the buffer empty only waited for tokens and never
+    counts as a standing queue (the RFC's "less than an MTU queued").
+    """
+    def __init__(self, target=5, interval=100):
+        if not 0 < target < interval:
+            raise ValueError("need 0 < target < interval")
+        self.target_ns = int(target * NS_PER_MS)
+        self.interval_ns = int(interval * NS_PER_MS)
+
+    def configure(self, packet_ns):
+        self.first_above_time = 0
+        self.drop_next = 0
+        self.drop_count = 0
+        self.last_count = 0
+        self.dropping = False
+
+    def drop_on_arrival(self, queue_length, idle_ns, stream):
+        return False
+
+    def _control_law(self, time_ns):
+        return time_ns + int(self.interval_ns / math.sqrt(self.drop_count))
+
+    def drop_on_dequeue(self, sojourn_ns, time_ns, queue_ahead):
+        ok_to_drop = False
+        if sojourn_ns < self.target_ns or queue_ahead == 0:
+            self.first_above_time = 0
+        elif self.first_above_time == 0:
+            self.first_above_time = time_ns + self.interval_ns
+        elif time_ns >= self.first_above_time:
+            ok_to_drop = True
+
+        if self.dropping:
+            if not ok_to_drop:
+                self.dropping = False
+            elif time_ns >= self.drop_next:
+                self.drop_count += 1
+                self.drop_next = self._control_law(self.drop_next)
+                return True
+            return False
+
+        if ok_to_drop:
+            self.dropping = True
+            # dropped recently: start near the drop rate that was needed then
+            delta = self.drop_count - self.last_count
+            if delta > 1 and time_ns - self.drop_next < 16 * self.interval_ns:
+                self.drop_count = delta
+            else:
+                self.drop_count = 1
+            self.drop_next = self._control_law(time_ns)
+            self.last_count = self.drop_count
+            return True
+        return False
+
+
+QUEUE_DISCIPLINE_CLASSES = {
+    'drop_tail' : DropTail,
+    'red' : RedQueue,
+    'codel' : CoDelQueue,
+}
+
+def make_queue_discipline(spec=None):
+    """Build a queue discipline from a (name, params) spec, None for drop tail"""
+    name, params = spec or (DEFAULT_QUEUE_DISCIPLINE, {})
+    if name not in QUEUE_DISCIPLINE_CLASSES:
+        raise ValueError(f"unknown queue discipline '{name}', expected one of {sorted(QUEUE_DISCIPLINE_CLASSES)}")
+    return QUEUE_DISCIPLINE_CLASSES[name](**params)
+
+class BottleneckLink:
+    """
+    One flow's link: rate (kbit/s), buffer (packets), burst (bytes, default
+    one packet) and queue, a (name, params) queue discipline spec.
+    """
+    def __init__(self, rate, buffer=LINK_BUFFER_PACKETS, burst=None, queue=None, packet_bytes=LINK_PACKET_BYTES):
+        if rate <= 0:
+            raise ValueError("rate must be positive (kbit/s)")
+        if buffer < 1:
+            raise ValueError("buffer must hold at least 1 packet")
+        burst = packet_bytes if burst is None else burst
+        if burst < packet_bytes:
+            raise ValueError(f"burst must fit at least one packet ({packet_bytes} bytes)")
+        self.rate = rate
+        self.buffer = buffer
+        # tokens are kept as ns of link time: what a packet costs, what an idle link saves up
+        self.packet_ns = max(1, int(packet_bytes * 8 * NS_PER_SECOND / (rate * 1000)))
+        self.burst_ns = max(self.packet_ns, int(burst * 8 * NS_PER_SECOND / (rate * 1000)))
+        self.discipline = make_queue_discipline(queue)
+        # since the link was created, never reset
+        self.arrived = 0
+        self.dropped = 0
+        self.reset()
+
+    def reset(self):
+        """Empty buffer, full bucket"""
+        # time every buffered packet leaves the buffer (sent or dropped at the head), in order
+        self.departures = deque()
+        # when the head of the buffer was last served, and the credit left then
+        self.served_ns = 0
+        self.credit_ns = self.burst_ns
+        self.discipline.configure(self.packet_ns)
+
+    def backlog(self, time_ns):
+        """Packets in the buffer at time_ns"""
+        departures = self.departures
+        while departures and departures[0] <= time_ns:
+            departures.popleft()
+        return len(departures)
+
+    def enqueue(self, time_ns, stream):
+        """
+        A packet arrives at time_ns. Returns the time (ns) it leaves the link,
+        or None if the buffer drops it. stream is the flow's queue random stream
+        """
+        self.arrived += 1
+        queue_length = self.backlog(time_ns)
+        idle_ns = time_ns - self.served_ns if queue_length == 0 else 0
+        if self.discipline.drop_on_arrival(queue_length, idle_ns, stream) or queue_length >= self.buffer:
+            self.dropped += 1
+            return None
+
+        # at the head once everything ahead has left, then waits for tokens if the bucket is short
+        head_ns = max(time_ns, self.served_ns)
+        credit_ns = min(self.burst_ns, self.credit_ns + head_ns - self.served_ns)
+        departure_ns = head_ns + max(0, self.packet_ns - credit_ns)
+        credit_ns = max(credit_ns, self.packet_ns)
+        # it holds its buffer slot until it leaves, dropped at the head or not
+        self.departures.append(departure_ns)
+        self.served_ns = departure_ns
+
+        if self.discipline.drop_on_dequeue(departure_ns - time_ns, departure_ns, queue_length):
+            # dropped at the head: no tokens spent, the next packet goes at once
+            self.credit_ns = credit_ns
+            self.dropped += 1
+            return None
+        self.credit_ns = credit_ns - self.packet_ns
+        return departure_ns
+
+def make_link(spec=None):
+    """BottleneckLink from a dict of its arguments, None (no spec) for unlimited bandwidth"""
+    if spec is None:
+        return None
+    return BottleneckLink(**spec)
@@ -0,0 +1,275 @@
+"""
+Metrics export for unattended runs (kiosks, sweep jobs).
+
+Every METRICS_INTERVAL the game loop (or the sweep) publishes a snapshot:
+plain numbers and copies of the histogram arrays, taken without locks and
+handed over as a single reference. Everything else happens on the
+exporter's daemon threads, which only ever read published snapshots and
+never live game state: reducing histograms to export buckets, percentiles,
+formatting, serving Prometheus text on http://127.0.0.1:<port>/metrics
+and appending one JSON object per snapshot to a file. A scrape therefore
+can't block the loop; each snapshot is formatted once however often it
+is scraped, so its share of the GIL stays small.
+
+usage: python pong_game.py --metrics-port 9464
+       python sweep.py ... --metrics-file sweep_metrics.jsonl
+"""
+import json
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import METRICS_HOST, METRICS_INTERVAL, METRICS_DELAY_BUCKETS_MS, PROFILER_BUCKETS_US, TELEMETRY_PERCENTILES
+from clock import NS_PER_SECOND
+from telemetry import BUCKET_COUNT, bucket_bounds
+
+# a metric family is (name, type, help, samples), a sample (name suffix, ((label, value), ...), value)
+
+# telemetry histogram bucket -> METRICS_DELAY_BUCKETS_MS index it counts towards (len() for +Inf)
+DELAY_EDGES_US = [edge * 1000 for edge in METRICS_DELAY_BUCKETS_MS]
+DELAY_BUCKET_OF = [bisect_left(DELAY_EDGES_US, low + width - 1)
+                   for low, width in (bucket_bounds(index) for index in range(BUCKET_COUNT))]
+
+def histogram_samples(labels, edge_counts, edges_seconds, count, total_seconds):
+    """_bucket / _sum / _count samples from per-edge counts (last one above every edge)"""
+    samples = []
+    cumulative = 0
+    for edge, edge_count in zip(edges_seconds, edge_counts):
+        cumulative += edge_count
+        samples.append(('_bucket', labels + (('le', f"{edge:g}"),), cumulative))
+    samples.append(('_bucket', labels + (('le', '+Inf'),), count))
+    samples.append(('_sum', labels, total_seconds))
+    samples.append(('_count', labels, count))
+    return samples
+
+class GameSnapshot:
+    """One moment of a running game, copied on the game loop, formatted later on exporter threads"""
+    def __init__(self, sim, profiler=None, fps=None):
+        engine = sim.engine
+        self.time = time.time()
+        # (flow, sent, lost, session delay histogram copy)
+        self.flows = [(flow, telemetry.sent, telemetry.lost, telemetry.session.copy())
+                      for flow, telemetry in (('player', engine.player_telemetry), ('ai', engine.ai_telemetry))]
+        # (flow, link buffer drops) while a link is set
+        self.link_drops = [(flow, link.dropped) for flow, link in (('player', engine.player_link), ('ai', engine.ai_link))
+                           if link is not None]
+        self.queue_depth = len(engine.action_queue) + len(engine.immediate_queue)
+        self.link_queue_depth = engine.get_queue_depth()
+        self.pool_records = engine.pool.allocated
+        self.latency = engine.latency
+        self.loss_percent = engine.loss_percent
+        self.ticks = sim.frame
+        self.player_score = sim.player_score
+        self.ai_score = sim.ai_score
+        self.points_played = sim.points_played
+        self.rally_hits = sim.rally_hits
+        self.matches_finished = sim.matches_finished
+        self.player_wins = sim.player_wins
+        self.fps = fps
+        # frame profiler session histogram, only while profiling
+        self.frame_times = None
+        frame = profiler.stages.get('frame') if profiler is not None else None
+        if frame is not None:
+            self.frame_times = (frame.bucket_counts[:], frame.total_count, frame.total_ns)
+
+    def families(self):
+        flow_samples = lambda attribute: [('', (('flow', flow),), attribute(sent, lost, delays))
+                                          for flow, sent, lost, delays in self.flows]
+        families = [
+            ('netpong_packets_sent', 'counter', "Packets queued into the engine",
+             flow_samples(lambda sent, lost, delays: sent)),
+            ('netpong_packets_lost', 'counter', "Packets dropped by the loss model or a link buffer",
+             flow_samples(lambda sent, lost, delays: lost)),
+            ('netpong_packets_delivered', 'counter', "Packets released to their paddle",
+             flow_samples(lambda sent, lost, delays: delays.count)),
+            ('netpong_queue_depth', 'gauge', "Packets in flight", [('', (), self.queue_depth)]),
+            ('netpong_link_queue_depth', 'gauge', "Packets waiting in the link buffers", [('', (), self.link_queue_depth)]),
+            ('netpong_packet_pool_records', 'gauge', "Packet records allocated", [('', (), self.pool_records)]),
+            ('netpong_latency_setting_ms', 'gauge', "Latency setting", [('', (), self.latency)]),
+            ('netpong_loss_setting_percent', 'gauge', "Loss setting", [('', (), self.loss_percent)]),
+        ]
+
+        if self.link_drops:
+            families.append(('netpong_packets_queue_dropped', 'counter', "Packets dropped by a link buffer",
+                             [('', (('flow', flow),), dropped) for flow, dropped in self.link_drops]))
+
+        delay_samples = []
+        percentile_samples = []
+        edges_seconds = [edge / 1000 for edge in METRICS_DELAY_BUCKETS_MS]
+        for flow, sent, lost, delays in self.flows:
+            edge_counts = [0] * (len(edges_seconds) + 1)
+            for index, bucket_count in enumerate(delays.counts):
+                if bucket_count:
+                    edge_counts[DELAY_BUCKET_OF[index]] += bucket_count
+            delay_samples += histogram_samples((('flow', flow),), edge_counts, edges_seconds,
+                                               delays.count, delays.total_ns / NS_PER_SECOND)
+            for fraction, value in zip(TELEMETRY_PERCENTILES, delays.percentiles_ms(*TELEMETRY_PERCENTILES)):
+                percentile_samples.append(('', (('flow', flow), ('quantile', f"{fraction:g}")), value / 1000))
+        families.append(('netpong_delivered_delay_seconds', 'histogram',
+                         "Delay from send to release of delivered packets", delay_samples))
+        families.append(('netpong_delivered_delay_quantile_seconds', 'gauge',
+                         "Delivered delay percentiles of the session", percentile_samples))
+
+        if self.frame_times is not None:
+            bucket_counts, count, total_ns = self.frame_times
+            families.append(('netpong_frame_seconds', 'histogram', "Game loop frame time",
+                             histogram_samples((), bucket_counts, [edge / 1e6 for edge in PROFILER_BUCKETS_US],
+                                               count, total_ns / NS_PER_SECOND)))
+        if self.fps is not None:
+            families.append(('netpong_fps', 'gauge', "Rendered frames per second", [('', (), self.fps)]))
+
+        families += [
+            ('netpong_ticks', 'counter', "Simulation ticks run", [('', (), self.ticks)]),
+            ('netpong_score', 'gauge', "Score of the current match",
+             [('', (('side', 'player'),), self.player_score), ('', (('side', 'ai'),), self.ai_score)]),
+            ('netpong_match_points', 'gauge', "Points played in the current match", [('', (), self.points_played)]),
+            ('netpong_match_rally_hits', 'gauge', "Paddle hits in the current match", [('', (), self.rally_hits)]),
+            ('netpong_matches_finished', 'counter', "Matches played to the end", [('', (), self.matches_finished)]),
+            ('netpong_player_wins', 'counter', "Matches the player won", [('', (), self.player_wins)]),
+        ]
+        return families
+
+class SweepSnapshot:
+    """Progress of sweep.py, published by its main process after every finished cell"""
+    def __init__(self, cells_total, cells_cached, rows):
+        self.time = time.time()
+        self.cells_total = cells_total
+        self.cells_cached = cells_cached
+        self.cells_done = len(rows)
+        self.matches = sum(row['matches'] for row in rows)
+        self.unfinished = sum(row['unfinished'] for row in rows)
+        self.player_wins = sum(round(row['player_win_rate'] * row['matches']) for row in rows)
+
+    def families(self):
+        return [
+            ('netpong_sweep_cells', 'gauge', "Cells in the sweep", [('', (), self.cells_total)]),
+            ('netpong_sweep_cells_cached', 'gauge', "Cells already in the results file", [('', (), self.cells_cached)]),
+            ('netpong_sweep_cells_done', 'counter', "Cells computed by this run", [('', (), self.cells_done)]),
+            ('netpong_matches_finished', 'counter', "Matches played by this run", [('', (), self.matches)]),
+            ('netpong_matches_unfinished', 'counter', "Matches cut off at MAX_MATCH_TIME_MS", [('', (), self.unfinished)]),
+            ('netpong_player_wins', 'counter', "Matches the player won", [('', (), self.player_wins)]),
+        ]
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+def format_prometheus(snapshot):
+    """Prometheus text exposition format (0.0.4)"""
+    lines = []
+    for name, kind, help_text, samples in snapshot.families():
+        # counters are exposed with the conventional _total suffix
+        sample_name = name + '_total' if kind == 'counter' else name
+        lines.append(f"# HELP {sample_name} {help_text}")
+        lines.append(f"# TYPE {sample_name} {kind}")
+        for suffix, labels, value in samples:
+            lines.append(f"{sample_name}{suffix}{format_labels(labels)} {value}")
+    return '\n'.join(lines) + '\n'
+
+def format_json(snapshot):
+    """One JSON object: time and every sample as 'name{label=value,...}': value"""
+    metrics = {}
+    for name, kind, help_text, samples in snapshot.families():
+        sample_name = name + '_total' if kind == 'counter' else name
+        for suffix, labels, value in samples:
+            label_text = '{' + ','.join(f'{key}={value}' for key, value in labels) + '}' if labels else ''
+            metrics[sample_name + suffix + label_text] = value
+    return json.dumps({'time' : snapshot.time, 'metrics' : metrics})
+
+class MetricsExporter:
+    """
+    Serves the latest published snapshot over HTTP on localhost (port) and/or
+    appends it to a JSON lines file (jsonl_path) every interval. Port 0 picks a free port.
+    """
+    def __init__(self, port=None, jsonl_path=None, interval_ms=METRICS_INTERVAL):
+        self.port = port
+        self.jsonl_path = jsonl_path
+        self.interval_ms = interval_ms
+        # latest snapshot, only ever replaced whole
+        self.snapshot = None
+        # (snapshot, text) of the last scrape, so a snapshot is formatted once
+        self._prometheus = (None, '')
+        self.next_publish_ms = 0
+        self.scrapes = 0
+        self.lines_written = 0
+        self._server = None
+        self._file = None
+        self._writer = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Start the http server and/or json lines writer threads, returns at once"""
+        if self.port is not None:
+            exporter = self
+            class MetricsHandler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split('?')[0] != '/metrics':
+                        self.send_error(404)
+                        return
+                    body = exporter.prometheus_text().encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((METRICS_HOST, self.port), MetricsHandler)
+            self._server.daemon_threads = True
+            self.port = self._server.server_address[1]
+            threading.Thread(target=self._server.serve_forever, name="metrics http", daemon=True).start()
+            print(f"metrics on http://{METRICS_HOST}:{self.port}/metrics")
+
+        if self.jsonl_path is not None:
+            self._file = open(self.jsonl_path, 'a')
+            self._writer = threading.Thread(target=self._write_json_lines, name="metrics json lines", daemon=True)
+            self._writer.start()
+
+    def due(self, time_ms):
+        """True once per interval, for loops that publish on their own clock"""
+        if time_ms < self.next_publish_ms:
+            return False
+        self.next_publish_ms = time_ms + self.interval_ms
+        return True
+
+    def publish(self, snapshot):
+        """Hand over a new snapshot, never blocks"""
+        self.snapshot = snapshot
+
+    def prometheus_text(self):
+        snapshot = self.snapshot
+        self.scrapes += 1
+        if snapshot is None:
+            return "# no snapshot published yet\n"
+        formatted_for, text = self._prometheus
+        if formatted_for is not snapshot:
+            text = format_prometheus(snapshot)
+            self._prometheus = (snapshot, text)
+        return text
+
+    def _write_json_lines(self):
+        written = None
+        while True:
+            stopping = self._stop.wait(self.interval_ms / 1000)
+            snapshot = self.snapshot
+            if snapshot is not None and snapshot is not written:
+                self._file.write(format_json(snapshot) + '\n')
+                self._file.flush()
+                self.lines_written += 1
+                written = snapshot
+            if stopping:
+                return
+
+    def close(self):
+        """Stop serving, write the last snapshot if it wasn't yet and close the file"""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        if self._writer is not None:
+            self._writer.join()
+            self._file.close()
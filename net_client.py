@@ -0,0 +1,255 @@
+"""
+Client for two player mode over loopback UDP (start net_server.py first).
+
+The asyncio network loop runs on its own thread, so the 60 FPS render
+loop never waits on a socket: it reads the latest snapshot and only
+sets the held direction, which the network thread sends on a fixed grid
+of DEFAULT_SEND_RATE per second. The control panel shows the real
+serialization, send and receive costs and round trip time next to the
+simulated input delay the server's DegradationEngine added.
+
+UP/DOWN move your paddle, SPACE starts/pauses (restarts after game over).
+"""
+import argparse
+import asyncio
+import struct
+import threading
+import time
+
+import pygame
+
+from config import *
+from clock import MonotonicClock, NS_PER_MS
+from components.text_cache import get_font, render_text
+import net_protocol as protocol
+
+class ClientProtocol(asyncio.DatagramProtocol):
+    """Runs on the network thread, only swaps in plain values the render loop reads"""
+    def __init__(self, network):
+        self.network = network
+
+    def connection_made(self, transport):
+        self.network.transport = transport
+
+    def datagram_received(self, data, address):
+        network = self.network
+        try:
+            kind = protocol.message_type(data)
+            if kind == protocol.SNAPSHOT:
+                start = time.perf_counter_ns()
+                snapshot = protocol.unpack_snapshot(data)
+                network.unpack_ns += time.perf_counter_ns() - start
+                network.snapshots += 1
+                # only ever replaced whole, the render loop reads it without a lock
+                network.snapshot = snapshot
+            elif kind == protocol.PONG:
+                network.rtt_ns = network.clock.now_ns() - protocol.unpack_time(data)
+            elif kind == protocol.WELCOME:
+                network.slot = protocol.unpack_welcome(data)
+        except (IndexError, struct.error):
+            pass
+
+class NetworkThread(threading.Thread):
+    """asyncio event loop for the client socket"""
+    def __init__(self, port):
+        super().__init__(daemon=True)
+        self.port = port
+        self.clock = MonotonicClock()
+        self.loop = None
+        self.transport = None
+        self.ready = threading.Event()
+
+        # written by the network thread, read by the render loop
+        self.slot = None
+        self.snapshot = None
+        self.snapshots = 0
+        self.unpack_ns = 0
+        self.rtt_ns = 0
+        # held paddle direction (-1, 0, 1), written by the render loop
+        self.direction = 0
+        # written by the network thread
+        self.sends = 0
+        self.send_ns = 0
+        self.input_sequence = 0
+        self.pack_ns = 0
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.loop.create_datagram_endpoint(
+            lambda: ClientProtocol(self), remote_addr=(NET_HOST, self.port)))
+        self.loop.create_task(self.keepalive())
+        self.loop.create_task(self.send_inputs())
+        self.ready.set()
+        self.loop.run_forever()
+
+    async def keepalive(self):
+        """Join until the server answers, then measure the round trip now and then"""
+        while True:
+            if self.slot is None:
+                self._send(protocol.pack_hello())
+                await asyncio.sleep(NET_HELLO_INTERVAL / 1000)
+            else:
+                self._send(protocol.pack_ping(self.clock.now_ns()))
+                await asyncio.sleep(NET_PING_INTERVAL / 1000)
+
+    async def send_inputs(self, send_rate=DEFAULT_SEND_RATE):
+        """
+        Send the held direction on a fixed grid, each input worth FPS / send_rate
+        server ticks of movement, so paddle speed never depends on the render frame rate
+        """
+        move_per_send = PADDLE_SPEED * FPS // send_rate
+        interval = 1 / send_rate
+        next_send = self.loop.time()
+        while True:
+            # never empty inputs
+            if self.direction and self.slot in (protocol.LEFT, protocol.RIGHT):
+                start = time.perf_counter_ns()
+                data = protocol.pack_input(self.input_sequence, self.direction * move_per_send)
+                self.pack_ns += time.perf_counter_ns() - start
+                self._send(data)
+                self.input_sequence += 1
+            next_send += interval
+            delay = next_send - self.loop.time()
+            if delay < 0:
+                # fell behind: skip sends like the server skips ticks
+                next_send = self.loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    def _send(self, data):
+        start = time.perf_counter_ns()
+        self.transport.sendto(data)
+        self.send_ns += time.perf_counter_ns() - start
+        self.sends += 1
+
+    def send(self, data):
+        """Queue a datagram from any thread, returns at once"""
+        self.loop.call_soon_threadsafe(self._send, data)
+
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class GameClient:
+    def __init__(self, network):
+        self.network = network
+        self.screen = pygame.display.set_mode((WIDTH, TOTAL_HEIGHT))
+        pygame.display.set_caption("Network Degradation Pong - two players")
+        self.clock = pygame.time.Clock()
+        self.font = get_font(74)
+        self.small_font = get_font(24)
+        self.real_clock = MonotonicClock()
+
+        # stats panel, refreshed every NET_STATS_INTERVAL
+        self.stats_lines = []
+        self.last_stats = 0
+        self.last_snapshots = 0
+        self.last_sends = 0
+
+    def handle_input(self):
+        """Returns False once the window is closed"""
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return False
+            if event.type == pygame.KEYDOWN and event.key in (pygame.K_SPACE, pygame.K_RETURN):
+                self.network.send(protocol.pack_start())
+
+        # the network thread sends it on its own grid
+        keys = pygame.key.get_pressed()
+        self.network.direction = keys[pygame.K_DOWN] - keys[pygame.K_UP]
+        return True
+
+    def update_stats(self):
+        time_now = self.real_clock.now_ms()
+        if time_now - self.last_stats < NET_STATS_INTERVAL:
+            return
+        interval = (time_now - self.last_stats) / 1000
+        self.last_stats = time_now
+
+        network = self.network
+        snapshots = network.snapshots - self.last_snapshots
+        sends = network.sends - self.last_sends
+        self.last_snapshots = network.snapshots
+        self.last_sends = network.sends
+        snapshot = network.snapshot
+        delay_ms = 0.0
+        if snapshot is not None and network.slot in (protocol.LEFT, protocol.RIGHT):
+            delay_ms = snapshot[8 + network.slot]
+
+        self.stats_lines = [
+            (f"Real rtt: {network.rtt_ns / NS_PER_MS:.2f} ms", GREEN, (20, 20)),
+            (f"Simulated input delay: {delay_ms:.1f} ms", RED, (20, 45)),
+            (f"Snapshots in: {snapshots / interval:.0f}/s, unpack "
+             f"{network.unpack_ns / max(1, network.snapshots) / 1000:.2f} us", WHITE, (20, 70)),
+            (f"Datagrams out: {sends / interval:.0f}/s, pack "
+             f"{network.pack_ns / max(1, network.input_sequence) / 1000:.2f} us, "
+             f"send {network.send_ns / max(1, network.sends) / 1000:.2f} us", WHITE, (20, 95)),
+        ]
+
+    def status_text(self):
+        network = self.network
+        snapshot = network.snapshot
+        if network.slot is None:
+            return "connecting..."
+        if network.slot == protocol.FULL:
+            return "server full"
+        side = "left" if network.slot == protocol.LEFT else "right"
+        if snapshot is None or not snapshot[7] & (protocol.RUNNING | protocol.GAME_OVER):
+            return f"you are {side}, SPACE to start"
+        if snapshot[7] & protocol.GAME_OVER:
+            return "game over, SPACE to play again"
+        return f"you are {side}"
+
+    def draw(self):
+        screen = self.screen
+        screen.fill(BLACK)
+        pygame.draw.rect(screen, CONTROL_CENTER_BLUE, (0, 0, WIDTH, CONTROL_PANEL_HEIGHT))
+        pygame.draw.line(screen, WHITE, (0, CONTROL_PANEL_HEIGHT), (WIDTH, CONTROL_PANEL_HEIGHT))
+        pygame.draw.aaline(screen, WHITE, (WIDTH // 2, CONTROL_PANEL_HEIGHT), (WIDTH // 2, TOTAL_HEIGHT))
+
+        for text, color, position in self.stats_lines:
+            screen.blit(render_text(self.small_font, text, color), position)
+        status = render_text(self.small_font, self.status_text(), GRAY)
+        screen.blit(status, status.get_rect(topright=(WIDTH - 20, 20)))
+
+        snapshot = self.network.snapshot
+        if snapshot is not None:
+            tick, ball_x, ball_y, left_y, right_y, left_score, right_score, flags = snapshot[:8]
+            pygame.draw.rect(screen, WHITE, (50, left_y, PADDLE_WIDTH, PADDLE_HEIGHT))
+            pygame.draw.rect(screen, WHITE, (WIDTH - PADDLE_WIDTH - 50, right_y, PADDLE_WIDTH, PADDLE_HEIGHT))
+            pygame.draw.ellipse(screen, WHITE, (ball_x, ball_y, BALL_SIZE, BALL_SIZE))
+            screen.blit(render_text(self.font, str(left_score), WHITE), (WIDTH // 2 - 60, CONTROL_PANEL_HEIGHT + 20))
+            screen.blit(render_text(self.font, str(right_score), WHITE), (WIDTH // 2 + 30, CONTROL_PANEL_HEIGHT + 20))
+
+        pygame.display.flip()
+
+    def run(self):
+        running = True
+        while running:
+            running = self.handle_input()
+            self.update_stats()
+            self.draw()
+            self.clock.tick(FPS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Two player pong client, connects to net_server.py on localhost")
+    parser.add_argument('--port', type=int, default=NET_PORT)
+    args = parser.parse_args()
+
+    network = NetworkThread(args.port)
+    network.start()
+    network.ready.wait()
+
+    pygame.init()
+    try:
+        GameClient(network).run()
+    finally:
+        network.stop()
+        pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Datagram formats shared by net_server.py and net_client.py.
+Every datagram starts with a one byte message type, all little-endian.
+"""
+import struct
+
+# message types
+HELLO = 0      # client -> server: join, sent until WELCOME arrives
+WELCOME = 1    # server -> client: assigned slot (LEFT / RIGHT, FULL if both taken)
+INPUT = 2      # client -> server: sequence, paddle move
+START = 3      # client -> server: start / restart the match
+PING = 4       # client -> server: client time, echoed straight back as PONG
+PONG = 5
+SNAPSHOT = 6   # server -> clients: authoritative state every tick
+
+LEFT, RIGHT, FULL = 0, 1, 255
+
+# snapshot flags
+RUNNING = 1
+PAUSED = 2
+GAME_OVER = 4
+
+TYPE = struct.Struct('<B')
+SLOT = struct.Struct('<BB')
+INPUT_MESSAGE = struct.Struct('<BIh')
+TIME_MESSAGE = struct.Struct('<Bq')
+# type, tick, ball x/y, left/right paddle y, left/right score, flags,
+# mean simulated input delay (ms) per slot
+SNAPSHOT_MESSAGE = struct.Struct('<BIhhhhBBBff')
+
+def message_type(data):
+    return data[0]
+
+def pack_hello():
+    return TYPE.pack(HELLO)
+
+def pack_start():
+    return TYPE.pack(START)
+
+def pack_welcome(slot):
+    return SLOT.pack(WELCOME, slot)
+
+def unpack_welcome(data):
+    return SLOT.unpack(data)[1]
+
+def pack_input(sequence, move_amount):
+    return INPUT_MESSAGE.pack(INPUT, sequence, move_amount)
+
+def unpack_input(data):
+    """(sequence, move amount)"""
+    return INPUT_MESSAGE.unpack(data)[1:]
+
+def pack_ping(time_ns):
+    return TIME_MESSAGE.pack(PING, time_ns)
+
+def pack_pong(data):
+    """PONG echoing the time of a PING"""
+    return TIME_MESSAGE.pack(PONG, TIME_MESSAGE.unpack(data)[1])
+
+def unpack_time(data):
+    return TIME_MESSAGE.unpack(data)[1]
+
+def pack_snapshot(tick, ball, left_paddle, right_paddle, left_score, right_score, flags, delays_ms):
+    return SNAPSHOT_MESSAGE.pack(SNAPSHOT, tick, ball.x, ball.y, left_paddle.y, right_paddle.y,
+                                 left_score, right_score, flags, delays_ms[LEFT], delays_ms[RIGHT])
+
+def unpack_snapshot(data):
+    """(tick, ball x, ball y, left y, right y, left score, right score, flags, left delay, right delay)"""
+    return SNAPSHOT_MESSAGE.unpack(data)[1:]
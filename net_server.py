@@ -0,0 +1,195 @@
+"""
+Authoritative server for two player mode over loopback UDP.
+
+Runs the match at FPS on one asyncio event loop. Client inputs go through
+the server's DegradationEngine (latency, jitter, loss) before they move a
+paddle, snapshots of the authoritative state go back to both clients every
+tick. The first client to join plays the left paddle, the second the right.
+
+run: python net_server.py --preset Wi-Fi
+then twice: python net_client.py
+"""
+import argparse
+import asyncio
+import struct
+import time
+
+from config import *
+from clock import MonotonicClock, NS_PER_MS
+from simulation import Simulation
+import net_protocol as protocol
+
+class GameServer(asyncio.DatagramProtocol):
+    def __init__(self, sim):
+        self.sim = sim
+        self.real_clock = MonotonicClock()
+        self.transport = None
+        # client address per slot
+        self.addresses = {}
+        # highest input sequence seen per slot, older or repeated ones are dropped
+        self.last_input = {}
+        self.tick = 0
+
+        # per-second counters for the log
+        self.datagrams_in = 0
+        self.datagrams_out = 0
+        self.stale_inputs = 0
+        self.step_ns = 0
+        self.send_ns = 0
+        self.last_stats = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def slot_of(self, address):
+        for slot, slot_address in self.addresses.items():
+            if slot_address == address:
+                return slot
+        return None
+
+    def paddle_of(self, slot):
+        return self.sim.player_paddle if slot == protocol.LEFT else self.sim.ai_paddle
+
+    def datagram_received(self, data, address):
+        self.datagrams_in += 1
+        try:
+            self.handle_message(data, address)
+        except (IndexError, struct.error):
+            # truncated or foreign datagram
+            pass
+
+    def handle_message(self, data, address):
+        kind = protocol.message_type(data)
+        slot = self.slot_of(address)
+
+        if kind == protocol.INPUT:
+            # the impairment stage: inputs reach the paddle when the engine releases them
+            if slot is None:
+                return
+            sequence, move_amount = protocol.unpack_input(data)
+            if sequence <= self.last_input.get(slot, -1):
+                self.stale_inputs += 1
+                return
+            self.last_input[slot] = sequence
+            if self.sim.is_active():
+                self.sim.engine.queue_input(self.paddle_of(slot), move_amount)
+        elif kind == protocol.PING:
+            self.transport.sendto(protocol.pack_pong(data), address)
+        elif kind == protocol.HELLO:
+            if slot is None:
+                for free_slot in (protocol.LEFT, protocol.RIGHT):
+                    if free_slot not in self.addresses:
+                        slot = free_slot
+                        self.addresses[slot] = address
+                        print(f"client {address} joined as {'left' if slot == protocol.LEFT else 'right'}")
+                        break
+                else:
+                    slot = protocol.FULL
+            self.transport.sendto(protocol.pack_welcome(slot), address)
+        elif kind == protocol.START:
+            # starting needs both players, afterwards either one can pause or restart
+            if slot is not None and len(self.addresses) == 2:
+                self.sim.toggle_game_state()
+
+    def snapshot(self):
+        sim = self.sim
+        flags = 0
+        if sim.is_game_running:
+            flags |= protocol.RUNNING
+        if sim.game_paused:
+            flags |= protocol.PAUSED
+        if sim.is_game_over:
+            flags |= protocol.GAME_OVER
+        delays_ms = (
+            sim.player_delay_ns / sim.player_delivered / NS_PER_MS if sim.player_delivered else 0.0,
+            sim.ai_delay_ns / sim.ai_delivered / NS_PER_MS if sim.ai_delivered else 0.0
+        )
+        return protocol.pack_snapshot(self.tick, sim.ball, sim.player_paddle, sim.ai_paddle,
+                                      sim.player_score, sim.ai_score, flags, delays_ms)
+
+    def run_tick(self):
+        """Step the match to real time and send the new state to every client"""
+        start = time.perf_counter_ns()
+        self.sim.advance(self.real_clock.now_ns())
+        self.tick += 1
+        self.step_ns += time.perf_counter_ns() - start
+
+        start = time.perf_counter_ns()
+        data = self.snapshot()
+        for address in self.addresses.values():
+            self.transport.sendto(data, address)
+            self.datagrams_out += 1
+        self.send_ns += time.perf_counter_ns() - start
+
+        time_now = self.real_clock.now_ms()
+        if time_now - self.last_stats >= NET_STATS_INTERVAL:
+            self.print_stats(time_now - self.last_stats)
+            self.last_stats = time_now
+
+    def print_stats(self, interval_ms):
+        stats = self.sim.engine.get_stats()
+        ticks = max(1, round(interval_ms * FPS / 1000))
+        print(f"tick {self.tick} | in {self.datagrams_in} out {self.datagrams_out} datagrams, "
+              f"{self.stale_inputs} stale inputs dropped | "
+              f"step {self.step_ns / ticks / 1000:.1f} us, pack+send {self.send_ns / ticks / 1000:.1f} us per tick | "
+              f"engine sent {stats['sent']} lost {stats['lost']} ({stats['loss rate']:.1f}%)")
+        self.datagrams_in = 0
+        self.datagrams_out = 0
+        self.stale_inputs = 0
+        self.step_ns = 0
+        self.send_ns = 0
+
+    async def run(self):
+        """Tick at FPS on a fixed grid, the loop serves datagrams in between"""
+        loop = asyncio.get_running_loop()
+        tick_seconds = 1 / FPS
+        next_tick = loop.time()
+        while True:
+            self.run_tick()
+            next_tick += tick_seconds
+            delay = next_tick - loop.time()
+            if delay < 0:
+                # fell behind: skip ticks rather than bursting to catch up
+                next_tick = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+
+async def serve(port, preset=None, latency=None, loss=None):
+    sim = Simulation()
+    # the right paddle is a second human, no ai and no ai reaction delay,
+    # and the left player's inputs don't skip the impairment at low latency
+    sim.ai_enabled = False
+    sim.engine.ai_reaction_time = 0
+    sim.engine.player_bypass = False
+    if preset is not None:
+        sim.set_scenario(preset)
+    if latency is not None or loss is not None:
+        sim.set_parameters(latency if latency is not None else sim.engine.latency,
+                           loss if loss is not None else sim.engine.loss_percent)
+
+    loop = asyncio.get_running_loop()
+    transport, server = await loop.create_datagram_endpoint(lambda: GameServer(sim), local_addr=(NET_HOST, port))
+    print(f"serving on {NET_HOST}:{port}, latency {sim.engine.latency} ms, loss {sim.engine.loss_percent}%")
+    try:
+        await server.run()
+    finally:
+        transport.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Authoritative server for two player pong over loopback UDP")
+    parser.add_argument('--port', type=int, default=NET_PORT)
+    parser.add_argument('--preset', choices=list(PRESET_MAP), help="network preset applied to client inputs")
+    parser.add_argument('--latency', type=int, help="ms, overrides the preset")
+    parser.add_argument('--loss', type=float, help="%%, overrides the preset")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.port, args.preset, args.latency, args.loss))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Recorded network traces that drive DegradationEngine over simulated time.
+
+A trace is a series of samples (timestamp_ms, rtt_ms, loss_percent, jitter_ms).
+Two formats are read without loading the whole file:
+  - csv with that header, streamed line by line with a sparse offset index
+  - compact binary (.ndtr), fixed-size records memory-mapped and binary searched
+
+usage: python network_trace.py convert trace.csv trace.ndtr
+"""
+import csv
+import mmap
+import struct
+import sys
+from bisect import bisect_right
+from collections import namedtuple
+
+from config import TRACE_CSV_INDEX_STRIDE, TRACE_SEEK_THRESHOLD
+
+TraceSample = namedtuple('TraceSample', ['timestamp_ms', 'rtt_ms', 'loss_percent', 'jitter_ms'])
+
+CSV_FIELDS = list(TraceSample._fields)
+
+# binary layout: header then fixed-size little-endian records
+BINARY_MAGIC = b'NDTR'
+BINARY_VERSION = 1
+HEADER = struct.Struct('<4sHxxQ')     # magic, version, record count
+RECORD = struct.Struct('<qfff')       # timestamp_ms, rtt_ms, loss_percent, jitter_ms
+TIMESTAMP = struct.Struct('<q')
+
+class BinaryTrace:
+    """Memory-mapped .ndtr trace, O(log n) seek by timestamp"""
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count = HEADER.unpack_from(self._map, 0)
+        if magic != BINARY_MAGIC:
+            raise ValueError(f"{path} is not a binary network trace")
+        if version != BINARY_VERSION:
+            raise ValueError(f"{path} has unsupported trace version {version}")
+        if count == 0:
+            raise ValueError(f"{path} has no samples")
+        self.count = count
+
+        self.start_ms = self._timestamp(0)
+        self.end_ms = self._timestamp(count - 1)
+
+    def _timestamp(self, index):
+        return TIMESTAMP.unpack_from(self._map, HEADER.size + index * RECORD.size)[0]
+
+    def _sample(self, index):
+        return TraceSample(*RECORD.unpack_from(self._map, HEADER.size + index * RECORD.size))
+
+    def _index_at(self, time_ms):
+        """Index of the last sample at or before time_ms (0 if before the start)"""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._timestamp(middle) <= time_ms:
+                low = middle + 1
+            else:
+                high = middle
+        return max(0, low - 1)
+
+    def iter_from(self, time_ms):
+        """Samples from the one in effect at time_ms onwards"""
+        for index in range(self._index_at(time_ms), self.count):
+            yield self._sample(index)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+class CsvTrace:
+    """
+    CSV trace read as a stream. One pass on open builds a sparse index
+    (timestamp, byte offset) every TRACE_CSV_INDEX_STRIDE rows for seeking.
+    """
+    def __init__(self, path, stride=TRACE_CSV_INDEX_STRIDE):
+        self.path = path
+        self._file = open(path, 'rb')
+
+        header = self._file.readline().decode().strip().split(',')
+        if header != CSV_FIELDS:
+            raise ValueError(f"{path} header must be {','.join(CSV_FIELDS)}")
+        self._data_offset = self._file.tell()
+
+        self._index_times = []
+        self._index_offsets = []
+        self.start_ms = None
+        self.end_ms = None
+        row_number = 0
+        while True:
+            offset = self._file.tell()
+            line = self._file.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            timestamp_ms = int(float(line.split(b',', 1)[0]))
+            # bisecting the index needs sorted timestamps, same rule as convert_csv_to_binary
+            if self.end_ms is not None and timestamp_ms < self.end_ms:
+                raise ValueError(f"{path}: timestamps must not go backwards (row {row_number + 1})")
+            if row_number % stride == 0:
+                self._index_times.append(timestamp_ms)
+                self._index_offsets.append(offset)
+            if self.start_ms is None:
+                self.start_ms = timestamp_ms
+            self.end_ms = timestamp_ms
+            row_number += 1
+
+        if row_number == 0:
+            raise ValueError(f"{path} has no samples")
+        self.count = row_number
+
+    def _parse(self, line):
+        timestamp_ms, rtt_ms, loss_percent, jitter_ms = line.decode().split(',')
+        return TraceSample(int(float(timestamp_ms)), float(rtt_ms), float(loss_percent), float(jitter_ms))
+
+    def iter_from(self, time_ms):
+        """Samples from the one in effect at time_ms onwards"""
+        block = max(0, bisect_right(self._index_times, time_ms) - 1)
+        self._file.seek(self._index_offsets[block])
+
+        previous = None
+        for line in self._file:
+            if not line.strip():
+                continue
+            sample = self._parse(line)
+            # skip forward through the block to the sample in effect
+            if sample.timestamp_ms <= time_ms:
+                previous = sample
+                continue
+            if previous is not None:
+                yield previous
+                previous = None
+            yield sample
+        if previous is not None:
+            yield previous
+
+    def close(self):
+        self._file.close()
+
+def open_trace(path):
+    """Open a binary trace or a csv trace, based on the file contents"""
+    with open(path, 'rb') as trace_file:
+        magic = trace_file.read(len(BINARY_MAGIC))
+    if magic == BINARY_MAGIC:
+        return BinaryTrace(path)
+    return CsvTrace(path)
+
+def convert_csv_to_binary(csv_path, binary_path):
+    """Stream a csv trace into the binary format. Returns number of samples"""
+    count = 0
+    with open(csv_path, newline='') as csv_file, open(binary_path, 'wb') as binary_file:
+        # count is patched in at the end
+        binary_file.write(HEADER.pack(BINARY_MAGIC, BINARY_VERSION, 0))
+        last_timestamp = None
+        for row in csv.DictReader(csv_file):
+            timestamp_ms = int(float(row['timestamp_ms']))
+            if last_timestamp is not None and timestamp_ms < last_timestamp:
+                raise ValueError(f"{csv_path}: timestamps must not go backwards (row {count + 1})")
+            last_timestamp = timestamp_ms
+            binary_file.write(RECORD.pack(timestamp_ms, float(row['rtt_ms']),
+                                          float(row['loss_percent']), float(row['jitter_ms'])))
+            count += 1
+        binary_file.seek(0)
+        binary_file.write(HEADER.pack(BINARY_MAGIC, BINARY_VERSION, count))
+    return count
+
+class TracePlayer:
+    """
+    Steps through a trace by simulated time and applies it to an engine.
+    Moving forward reads samples in order, scrubbing back or far ahead seeks.
+    Trace time 0 is the trace's first sample plus offset_ms. After the last
+    sample its values are held.
+    """
+    def __init__(self, trace, offset_ms=0):
+        self.trace = trace
+        self.offset_ms = offset_ms
+        self.position_ms = 0
+        self._seek(0)
+
+    def _seek(self, position_ms):
+        self.position_ms = position_ms
+        self._samples = self.trace.iter_from(self.trace.start_ms + self.offset_ms + position_ms)
+        self.current = next(self._samples)
+        self.upcoming = next(self._samples, None)
+
+    def scrub(self, delta_ms):
+        """Shift the trace forward or back against simulated time"""
+        # never before the first sample
+        self.offset_ms = max(-self.position_ms, self.offset_ms + delta_ms)
+        self._seek(self.position_ms)
+
+    def update(self, position_ms):
+        """Sample in effect at position_ms"""
+        if position_ms < self.position_ms or position_ms - self.position_ms > TRACE_SEEK_THRESHOLD:
+            self._seek(position_ms)
+            return self.current
+
+        self.position_ms = position_ms
+        trace_time = self.trace.start_ms + self.offset_ms + position_ms
+        while self.upcoming is not None and self.upcoming.timestamp_ms <= trace_time:
+            self.current = self.upcoming
+            self.upcoming = next(self._samples, None)
+        return self.current
+
+    def apply(self, engine):
+        """Set engine params from the current sample (one-way latency is half the rtt)"""
+        sample = self.current
+        engine.set_parameters(sample.rtt_ms / 2, sample.loss_percent, max_jitter=sample.jitter_ms)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != 'convert':
+        print("usage: python network_trace.py convert trace.csv trace.ndtr")
+        sys.exit(1)
+    count = convert_csv_to_binary(sys.argv[2], sys.argv[3])
+    print(f"wrote {count} samples to {sys.argv[3]}")
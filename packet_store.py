@@ -0,0 +1,67 @@
+import heapq
+from config import PACKET_POOL_SIZE
+
+class Packet:
+    """One in-flight input. Recycled through PacketPool instead of garbage collected"""
+    __slots__ = ('target', 'data', 'time_sent', 'time_due', 'sequence')
+
+    def __init__(self):
+        self.target = None
+        self.data = None
+        self.time_sent = 0
+        self.time_due = 0
+        self.sequence = 0
+
+class PacketPool:
+    """
+    Free list of preallocated Packet records.
+    New records are only created when every record is in flight,
+    so in steady state queueing and releasing packets allocates nothing.
+    """
+    def __init__(self, size=PACKET_POOL_SIZE):
+        self._free = [Packet() for _ in range(size)]
+        # records ever created, grows only when the pool runs dry
+        self.allocated = size
+        self.acquired = 0
+        self.released = 0
+
+    def acquire(self, target, data, time_sent, time_due, sequence):
+        """Take a record from the free list (or create one) and fill it"""
+        if self._free:
+            packet = self._free.pop()
+        else:
+            packet = Packet()
+            self.allocated += 1
+        packet.target = target
+        packet.data = data
+        packet.time_sent = time_sent
+        packet.time_due = time_due
+        packet.sequence = sequence
+        self.acquired += 1
+        return packet
+
+    def push(self, queue, target, data, time_sent, time_due, sequence):
+        """
+        Fill a record and push it on queue, a min-heap of (time_due, sequence, packet)
+        entries: heapq compares the int keys in C, ties release in send order.
+        sequence must be unique per queue so packets are never compared
+        """
+        heapq.heappush(queue, (time_due, sequence, self.acquire(target, data, time_sent, time_due, sequence)))
+
+    def release(self, packet):
+        """Return a record to the free list"""
+        # drop references so released packets don't keep paddles alive
+        packet.target = None
+        packet.data = None
+        self._free.append(packet)
+        self.released += 1
+
+    def get_stats(self):
+        """Return allocation counts"""
+        return {
+            'allocated' : self.allocated,
+            'free' : len(self._free),
+            'in flight' : self.acquired - self.released,
+            'acquired' : self.acquired,
+            'released' : self.released
+        }
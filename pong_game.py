@@ -1,83 +1,71 @@
+import time
+# taken before the heavy imports so time to first frame covers them
+STARTUP_NS = time.perf_counter_ns()
+
+import argparse
 import pygame
-import random
 import sys
 
 from config import *
-from components.paddle import Paddle
-from components.ball import Ball
 from components.slider import Slider
-from degradation_engine import DegradationEngine
 from components.button import Button
-
-# game set up
-pygame.mixer.pre_init(44100, -16, 2, 512)
-pygame.init()
-pygame.mixer.init()
-screen = pygame.display.set_mode((WIDTH, TOTAL_HEIGHT))
-pygame.display.set_caption("Network Degradation Pong Simulator")
-clock = pygame.time.Clock()
-# font for scores and messages
-font = pygame.font.Font(None, 74)
-small_font = pygame.font.Font(None, 24)
-
-def load_sound(filename):
-    try:
-        return pygame.mixer.Sound(filename)
-    except FileNotFoundError:
-        print(f"Warning: Could not load {filename}. Sound will be disabled.")
-        return None
-
-# load audio files
-sfx_ai_scored = load_sound("audio_files/ai_scored.wav")
-sfx_background_music = load_sound("audio_files/background_music.wav")
-sfx_paddle_hit = load_sound("audio_files/paddle_hit.wav")
-sfx_player_scored = load_sound("audio_files/player_scored.wav")
-
-if sfx_background_music:
-    sfx_background_music.play(-1)
-    sfx_background_music.set_volume(0.3)
-
-# object instantiations
-# player is left paddle
-player_paddle = Paddle(50, (HEIGHT // 2 - PADDLE_HEIGHT // 2) + CONTROL_PANEL_HEIGHT, PADDLE_SPEED)
-# ai is right paddle
-ai_paddle = Paddle((WIDTH - PADDLE_WIDTH - 50), (HEIGHT // 2 - PADDLE_HEIGHT // 2) + CONTROL_PANEL_HEIGHT, PADDLE_SPEED)
-ball = Ball((WIDTH // 2 - BALL_SIZE // 2), (HEIGHT // 2 - BALL_SIZE / 2) + CONTROL_PANEL_HEIGHT, BALL_SPEED)
-
-# init degradation engine
-engine = DegradationEngine(player_paddle, ai_paddle)
-engine.set_parameters(0, 0)
-
-# create sliders
-latency_slider = Slider(SLIDER_X_START, SLIDER_Y, SLIDER_WIDTH, 50, 0, 500, "Latency (ms)")
-loss_slider = Slider(SLIDER_X_START + SLIDER_SPACING, SLIDER_Y, SLIDER_WIDTH, 50, 0, 100, "Avg Packet loss (%)")
-sliders = [latency_slider, loss_slider]
-
-# create start, pause, play again button
-start_pause_button = Button(BUTTON_X, BUTTON_Y, BUTTON_WIDTH, BUTTON_HEIGHT, "START", BLUE)
-
-# create mute button for background music
-mute_button = Button(MUTE_BTN_X, MUTE_BTN_Y, MUTE_BTN_W, 30, "MUTE", GRAY)
-
-# create buttons for scenarios
+from components.text_cache import get_font, render_text
+from components.sparkline import Sparkline
+from simulation import Simulation, EVENT_PADDLE_HIT, EVENT_AI_SCORED, EVENT_PLAYER_SCORED
+from clock import MonotonicClock
+from network_trace import open_trace, TracePlayer
+from recording import MatchRecorder
+from profiler import FrameProfiler
+from audio import GameAudio
+from metrics_exporter import MetricsExporter, GameSnapshot
+
+# headless match state (paddles, ball, engine, scores)
+# its simulated clock follows real monotonic time, read once per frame
+real_clock = MonotonicClock()
+sim = Simulation()
+# optional recording.MatchRecorder for --record
+recorder = None
+# optional metrics_exporter.MetricsExporter for --metrics-port / --metrics-file
+metrics = None
+# per-stage frame timings, shared with the simulation
+profiler = FrameProfiler()
+sim.profiler = profiler
+
+# display, audio and widgets are created in setup()
+screen = None
+clock = None
+font = None
+small_font = None
+profiler_font = None
+audio = None
+latency_slider = None
+loss_slider = None
+sliders = []
+start_pause_button = None
+mute_button = None
+send_rate_button = None
 preset_buttons = []
-preset_keys = list(PRESET_MAP.keys())
-for i, key in enumerate(preset_keys):
-    x_pos = 210 + (i * (PRESET_WIDTH + GAP))
-    btn = Button(x_pos, PRESET_Y, PRESET_WIDTH, PRESET_HEIGHT, key, GRAY)
-    preset_buttons.append(btn)
-
-# score tracking
-player_score = 0
-ai_score = 0
-
-# game state 
-game_paused = False
-game_paused_timer = 0
-reset_stats_pending = False
-is_game_running = False
-is_game_over = False
+delay_sparkline = None
+loss_sparkline = None
+
+# ui state
 is_muted = False
+# arrow keys held this frame, applied on every simulation tick
+player_move = 0
+show_profiler = False
+# --profile (or metrics export): frames are timed with the overlay hidden too
+always_profile = False
+profiler_lines = []
+last_profiler_update = 0
+# stats column shows delivered delay percentiles instead of packet counts (T)
+show_delay_stats = False
+delay_lines = []
+delay_lines_version = None
+# ms from startup until the first frame was on screen
+first_frame_ms = None
+
+# ball visibility draws, independent of the engine's loss streams
+visual_loss_stream = sim.streams.stream('visual_loss')
 
 # visual state
 hit_flash = False
@@ -87,12 +75,76 @@ score_flash_timer = 0
 ball_visible = True
 last_visual_loss_check = 0
 
+# dirty-rect rendering state
+static_layers = {}     # background color -> cached static surface
+overlay_surfaces = {}  # overlay color -> reusable semi-transparent surface
+item_states = {}       # dynamic item name -> (state key, bounds) last drawn
+last_frame_full = True
+
+
+def setup(audio_enabled=True):
+    """
+    Open the window and create control panel widgets. Audio loads in the
+    background and isn't waited for, audio_enabled False never opens the mixer
+    """
+    global screen, clock, font, small_font, profiler_font, audio
+    global latency_slider, loss_slider, sliders, start_pause_button, mute_button, send_rate_button, preset_buttons
+    global delay_sparkline, loss_sparkline
+
+    # game set up, only the pygame modules the game uses
+    pygame.display.init()
+    pygame.font.init()
+    # mixer opened here on the main thread, only decoding runs in the background
+    audio = GameAudio(audio_enabled)
+    audio.start()
+    screen = pygame.display.set_mode((WIDTH, TOTAL_HEIGHT))
+    pygame.display.set_caption("Network Degradation Pong Simulator")
+    clock = pygame.time.Clock()
+    # font for scores and messages
+    font = get_font(74)
+    small_font = get_font(24)
+    # the profiler overlay fits a line per stage in the stats column
+    profiler_font = get_font(15)
+
+    # create sliders
+    latency_slider = Slider(SLIDER_X_START, SLIDER_Y, SLIDER_WIDTH, 50, 0, 500, "Latency (ms)")
+    loss_slider = Slider(SLIDER_X_START + SLIDER_SPACING, SLIDER_Y, SLIDER_WIDTH, 50, 0, 100, "Avg Packet loss (%)")
+    sliders = [latency_slider, loss_slider]
+
+    # create start, pause, play again button
+    start_pause_button = Button(BUTTON_X, BUTTON_Y, BUTTON_WIDTH, BUTTON_HEIGHT, "START", BLUE)
+
+    # create mute button for background music
+    mute_button = Button(MUTE_BTN_X, MUTE_BTN_Y, MUTE_BTN_W, 30, "MUTE", GRAY)
+
+    # create send rate button, cycles through SEND_RATES
+    send_rate_button = Button(SEND_RATE_BTN_X, SEND_RATE_BTN_Y, SEND_RATE_BTN_W, SEND_RATE_BTN_H,
+                              f"Send rate: {sim.get_send_rate()} Hz", GRAY)
+
+    # rolling delivered delay & loss of both flows
+    delay_sparkline = Sparkline(SPARKLINE_X, SPARKLINE_Y, SPARKLINE_W, SPARKLINE_H, "delay", " ms")
+    loss_sparkline = Sparkline(SPARKLINE_X + SPARKLINE_W + SPARKLINE_GAP, SPARKLINE_Y, SPARKLINE_W, SPARKLINE_H,
+                               "loss", "%")
+
+    # create buttons for scenarios
+    preset_buttons = []
+    for i, key in enumerate(PRESET_BUTTONS):
+        x_pos = 210 + (i * (PRESET_WIDTH + GAP))
+        btn = Button(x_pos, PRESET_Y, PRESET_WIDTH, PRESET_HEIGHT, key, GRAY)
+        preset_buttons.append(btn)
+
 
 def update_degradation_params():
     """Read values from sliders to update engine params"""
+    # a replayed trace sets the engine, sliders only show its values
+    if sim.trace_player is not None:
+        latency_slider.set_value(round(sim.engine.latency, 1))
+        loss_slider.set_value(round(sim.engine.loss_percent, 2))
+        return
+
     latency = latency_slider.get_value()
     loss = loss_slider.get_value()
-    engine.set_parameters(latency, loss)
+    sim.set_parameters(latency, loss)
 
 def set_scenario(preset_name):
     """Update sliders and engine to match preset chosen"""
@@ -101,60 +153,90 @@ def set_scenario(preset_name):
     latency_slider.set_value(data['latency'])
     loss_slider.set_value(data['loss'])
     # apply to engine
-    engine.set_parameters(data['latency'], data['loss'])
-
-def toggle_game_state():
-    """Helper to toggle start/pause/reset"""
-    global is_game_running, is_game_over, player_score, ai_score, game_paused
-    
-    if is_game_over:
-        # reset game params for fresh start
-        player_score = 0
-        ai_score = 0
-        ball.speed = BALL_SPEED
-        # reset engine
-        engine.reset_stats()
-        # reset state flags
-        is_game_over = False
-        is_game_running = True
-        game_paused = False
-        ball.reset()
+    sim.set_scenario(preset_name)
+
+def cycle_send_rate():
+    """Switch to the next client send rate in SEND_RATES"""
+    current = sim.get_send_rate()
+    if current in SEND_RATES:
+        send_rate = SEND_RATES[(SEND_RATES.index(current) + 1) % len(SEND_RATES)]
     else:
-        # if paused, play; if playing, pause
-        is_game_running = not is_game_running
-    
+        send_rate = SEND_RATES[0]
+    sim.set_send_rate(send_rate)
+    send_rate_button.text = f"Send rate: {send_rate} Hz"
+
+def toggle_profiler():
+    """Show/hide the frame profiler overlay, timing only runs while it is shown (or with --profile)"""
+    global show_profiler
+    show_profiler = not show_profiler
+    profiler.enabled = show_profiler or always_profile
+
+def shutdown():
+    """Finish the recording (if any), dump frame timings and quit"""
+    if recorder is not None:
+        recorder.close()
+    if metrics is not None:
+        metrics.publish(GameSnapshot(sim, profiler, clock.get_fps()))
+        metrics.close()
+    if profiler.stages:
+        print(profiler.format_dump())
+    if first_frame_ms is not None:
+        print(f"startup: first frame after {first_frame_ms:.0f} ms, {describe_audio()}")
+    pygame.quit()
+    sys.exit()
+
 def handle_input():
     """Handle all user input for player, sliders, and quitting game"""
-    global game_paused, is_game_over, is_game_running, ai_score, player_score, is_muted
+    global is_muted, player_move, show_delay_stats
 
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
+            shutdown()
 
         # handle start/pause button with keyboard
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_RETURN or event.key == pygame.K_SPACE:
-                toggle_game_state()
+                sim.toggle_game_state()
+
+            # toggle frame profiler overlay
+            if event.key == pygame.K_F3:
+                toggle_profiler()
+
+            # toggle client-side prediction of the player paddle
+            if event.key == pygame.K_p:
+                sim.set_prediction(not sim.prediction_enabled)
+
+            # switch the stats column between packet counts and delay percentiles
+            if event.key == pygame.K_t:
+                show_delay_stats = not show_delay_stats
+
+            # scrub through a replayed trace
+            if sim.trace_player is not None:
+                if event.key == pygame.K_LEFT:
+                    sim.trace_player.scrub(-TRACE_SCRUB_STEP)
+                elif event.key == pygame.K_RIGHT:
+                    sim.trace_player.scrub(TRACE_SCRUB_STEP)
 
         # handle start/pause button with mouse
         if start_pause_button.handle_click(event):
-            toggle_game_state()
+            sim.toggle_game_state()
 
         # handle mute button
         if mute_button.handle_click(event):
             is_muted = not is_muted
             if is_muted:
                 mute_button.text = "UNMUTE"
-                if sfx_background_music:
-                    sfx_background_music.set_volume(0.0)
+                audio.set_music_volume(0.0)
             else:
                 mute_button.text = "MUTE"
-                if sfx_background_music:
-                    sfx_background_music.set_volume(0.5)
+                audio.set_music_volume(UNMUTED_MUSIC_VOLUME)
+
+        # handle send rate button
+        if send_rate_button.handle_click(event):
+            cycle_send_rate()
 
         # handle scenario buttons
-        if not is_game_over:
+        if not sim.is_game_over:
             for btn in preset_buttons:
                 if btn.handle_click(event):
                     for b in preset_buttons:
@@ -169,281 +251,426 @@ def handle_input():
             slider.handle_event(event)
 
         # if slider values manually changed, deactivate preset buttons
+        # and go back to the default impairment models
         if prev_latency != latency_slider.get_value() or prev_loss != loss_slider.get_value():
+            if any(btn.active for btn in preset_buttons):
+                sim.engine.set_models()
             for btn in preset_buttons:
                 btn.active = False
 
-    # only move if not paused
-    if is_game_running and not game_paused and not is_game_over:
-        keys = pygame.key.get_pressed()
-
-        # player movement
-        if keys[pygame.K_UP]:
-            engine.queue_input(player_paddle, -PADDLE_SPEED)
-        if keys[pygame.K_DOWN]:
-            engine.queue_input(player_paddle, PADDLE_SPEED)
-
-def ai_movement(paddle, ball):
-    """Implement a simple and perfect AI player"""
-    # determine difference from ai paddle and ball
-    center_diff = ball.centery - paddle.centery
-    target_move = 0
-
-    # check if ball is below paddle center
-    if center_diff > 0:
-        # move down with a limit of the speed
-        target_move = min(paddle.speed, center_diff)
-    # check if ball is above paddle center
-    elif center_diff < 0:
-        # move up with a limit of the speed
-        target_move = -min(paddle.speed, abs(center_diff))
-    
-    engine.queue_input(paddle, target_move)
-
-def apply_lagged_actions():
-    """Apply actions released by engine after latency expires"""
-    released_actions = engine.get_due_actions()
-
-    for action in released_actions:
-        paddle = action['target']
-        move_amount = action['data']
-        # apply move physically
-        paddle.y += move_amount
-
-        # boundary check to not go off screen
-        if paddle.top < CONTROL_PANEL_HEIGHT:
-            paddle.top = CONTROL_PANEL_HEIGHT
-        if paddle.bottom > TOTAL_HEIGHT:
-            paddle.bottom = TOTAL_HEIGHT
-
-def check_collision():
-    """Handle ball collisions with walls and paddles"""
-    global player_score, ai_score, game_paused, game_paused_timer
+    # player movement, queued per tick by keyboard_player (ignored while paused)
+    keys = pygame.key.get_pressed()
+    player_move = 0
+    if keys[pygame.K_UP]:
+        player_move -= PADDLE_SPEED
+    if keys[pygame.K_DOWN]:
+        player_move += PADDLE_SPEED
+
+def keyboard_player(sim):
+    """Player controller for Simulation.advance: the keys held this frame"""
+    return round(player_move * sim.tick_scale)
+
+def handle_events(events):
+    """Play sounds and start flashes for events from the simulation step"""
     global hit_flash, hit_flash_timer, score_flash, score_flash_timer
-    global reset_stats_pending, is_game_over, is_game_running
-
-    # top & bottom wall collision
-    if ball.top <= CONTROL_PANEL_HEIGHT or ball.bottom >= TOTAL_HEIGHT:
-        ball.velocity_y *= -1
-
-    hit_occurred = False
-    # paddle collision with ball
-    if ball.colliderect(player_paddle) and ball.velocity_x < 0:
-        ball.velocity_x *= -1
-        hit_occurred = True
-    if ai_paddle.colliderect(ball) and ball.velocity_x > 0:
-        ball.velocity_x *= -1
-        hit_occurred = True
-
-    # play paddle hit audio
-    if hit_occurred and sfx_paddle_hit:
-        sfx_paddle_hit.play()
-
-    score_occurred = False
-    # scoring (left & right walls)
-    # ball passed left paddle, AI scores
-    if ball.left <= 0:
-        ai_score += 1
-        score_occurred = True
-        if sfx_ai_scored:
-            sfx_ai_scored.play()
-
-        # activate pause
-        game_paused = True
-        game_paused_timer = pygame.time.get_ticks()
-
-        # activate red flash
-        hit_flash = True
-        hit_flash_timer = pygame.time.get_ticks()
-
-        reset_stats_pending = True
-
-    # ball passed right paddle, player scores
-    if ball.right >= WIDTH:
-        player_score += 1
-        score_occurred = True
-        if sfx_player_scored: 
-            sfx_player_scored.play()
-
-        # increase speed if player scores
-        ball.increase_speed()
-
-        # activate pause
-        game_paused = True
-        game_paused_timer = pygame.time.get_ticks()
-
-        # activate green flash
-        score_flash = True
-        score_flash_timer = pygame.time.get_ticks()
-
-    if score_occurred:
-        reset_stats_pending = True
-        # check for game over
-        if player_score >= MAX_SCORE or ai_score >= MAX_SCORE:
-            is_game_over = True
-            is_game_running = False
-            game_paused = False
-        else:
-            ball.reset()
+
+    for event in events:
+        # play paddle hit audio
+        if event == EVENT_PADDLE_HIT:
+            audio.play('paddle_hit')
+
+        # ball passed left paddle, AI scores
+        elif event == EVENT_AI_SCORED:
+            audio.play('ai_scored')
+            # activate red flash
+            hit_flash = True
+            hit_flash_timer = sim.clock.now_ms()
+
+        # ball passed right paddle, player scores
+        elif event == EVENT_PLAYER_SCORED:
+            audio.play('player_scored')
+            # activate green flash
+            score_flash = True
+            score_flash_timer = sim.clock.now_ms()
 
 def transparent_background(color):
     """Display a semi-transparent background for popup/overlays"""
-    # semi-transparent background
-    overlay = pygame.Surface((WIDTH, HEIGHT))
-    overlay.set_alpha(200)
-    overlay.fill(color)
+    # semi-transparent background, one reusable surface per color
+    overlay = overlay_surfaces.get(color)
+    if overlay is None:
+        overlay = pygame.Surface((WIDTH, HEIGHT))
+        overlay.set_alpha(200)
+        overlay.fill(color)
+        overlay_surfaces[color] = overlay
     screen.blit(overlay, (0, CONTROL_PANEL_HEIGHT))
 
-
-def draw_elements():
-    """Draw all game elements, sliders, & scores onto screen"""
-    global hit_flash, score_flash, ball_visible, last_visual_loss_check
-
-    background_color = BLACK  # default
-    if hit_flash:
-        background_color = RED
-    elif score_flash:
-        background_color = GREEN
-
-    screen.fill(background_color)
-
-    # draw control background & sliders
-    pygame.draw.rect(screen, CONTROL_CENTER_BLUE, (0, 0, WIDTH, CONTROL_PANEL_HEIGHT))
-    pygame.draw.line(screen, WHITE, (0, CONTROL_PANEL_HEIGHT), (WIDTH, CONTROL_PANEL_HEIGHT))
-
-    # handle ball visibility based on packet loss
-    time_now = pygame.time.get_ticks()
+def get_static_layer(background_color):
+    """
+    Cached surface with everything that never changes: field background,
+    control panel, dividing lines and player labels
+    """
+    layer = static_layers.get(background_color)
+    if layer is None:
+        layer = pygame.Surface((WIDTH, TOTAL_HEIGHT)).convert()
+        layer.fill(background_color)
+
+        # draw control background
+        pygame.draw.rect(layer, CONTROL_CENTER_BLUE, (0, 0, WIDTH, CONTROL_PANEL_HEIGHT))
+        pygame.draw.line(layer, WHITE, (0, CONTROL_PANEL_HEIGHT), (WIDTH, CONTROL_PANEL_HEIGHT))
+
+        # draw dividing line
+        pygame.draw.aaline(layer, WHITE, (WIDTH // 2, CONTROL_PANEL_HEIGHT), (WIDTH // 2, TOTAL_HEIGHT))
+
+        # draw  player labels
+        label_player = render_text(small_font, "PLAYER", GRAY)
+        label_ai = render_text(small_font, "COMPUTER", GRAY)
+        # Left side (Player)
+        layer.blit(label_player, label_player.get_rect(center=(WIDTH // 4, CONTROL_PANEL_HEIGHT + 20)))
+        # Right side (Computer)
+        layer.blit(label_ai, label_ai.get_rect(center=(3 * WIDTH // 4, CONTROL_PANEL_HEIGHT + 20)))
+
+        static_layers[background_color] = layer
+    return layer
+
+def update_ball_visibility():
+    """Hide or show the ball based on packet loss, checked every VISUAL_LOSS_INTERVAL"""
+    global ball_visible, last_visual_loss_check
+
+    time_now = sim.clock.now_ms()
     if time_now - last_visual_loss_check > VISUAL_LOSS_INTERVAL:
         current_loss_percent = loss_slider.get_value()
-        if random.random() * 100 < current_loss_percent:
+        if visual_loss_stream.random() * 100 < current_loss_percent:
             ball_visible = False
         else:
             ball_visible = True
         last_visual_loss_check = time_now
-    # draw sliders
-    for slider in sliders:
-        slider.draw(screen)
 
-    # draw presets
-    for btn in preset_buttons:
-        btn.draw(screen)
-
-    # draw mute
-    mute_button.draw(screen)
-
-    # get & display stats
-    stats = engine.get_stats()
-    # only show live stats during game
-    if not is_game_over:
-        rate_text = small_font.render(f"Actual Loss Rate: {stats['loss rate']:.1f}%", True,
-                                        RED if stats['loss rate'] > 0 else GREEN)
-        screen.blit(rate_text, (600, 20))
-        total_count_text = small_font.render(f"Sent: {stats['sent']}", True, WHITE)
-        screen.blit(total_count_text, (600, 45))
-        received_count_text = small_font.render(f"Received: {stats['received']}", True, GREEN)
-        screen.blit(received_count_text, (600, 70))
-        lost_count_text = small_font.render(f"Lost: {stats['lost']}", True, RED)
-        screen.blit(lost_count_text, (600, 95))
-
-    # draw buttons
-    if is_game_over:
+def update_start_pause_button():
+    """Match start/pause button text and color to game state"""
+    if sim.is_game_over:
         start_pause_button.text = "PLAY AGAIN"
         start_pause_button.color = GREEN
     else:
-        start_pause_button.text = "PAUSE" if is_game_running else "START"
+        start_pause_button.text = "PAUSE" if sim.is_game_running else "START"
         start_pause_button.color = BLUE
-    start_pause_button.draw(screen)
 
-    # draw paddles & ball
-    pygame.draw.rect(screen, WHITE, player_paddle)
-    pygame.draw.rect(screen, WHITE, ai_paddle)
-    if ball_visible:
-        pygame.draw.ellipse(screen, WHITE, ball)
+def get_stats_lines():
+    """(text, color, position) of live stats, empty once the game is over"""
+    # only show live stats during game, the profiler overlay takes their place
+    if sim.is_game_over or show_profiler:
+        return []
+    if show_delay_stats:
+        return get_delay_lines()
+    stats = sim.engine.get_stats()
+    return [
+        (f"Actual Loss Rate: {stats['loss rate']:.1f}%", RED if stats['loss rate'] > 0 else GREEN, (600, 20)),
+        # link buffer drops next to the sent count when a link is set, the lost line runs into MUTE
+        (f"Sent: {stats['sent']}" + (f" Q-drops: {stats['queue drops']}" if sim.engine.link_spec else ""), WHITE, (600, 45)),
+        (f"Received: {stats['received']}", GREEN, (600, 70)),
+        (f"Lost: {stats['lost']}", RED, (600, 95))
+    ]
+
+def get_delay_lines():
+    """(text, color, position) of session delay percentiles per flow, refreshed with the sparklines"""
+    global delay_lines, delay_lines_version
+
+    engine = sim.engine
+    version = (engine.player_telemetry.delay_series.appended, engine.ai_telemetry.delay_series.appended)
+    if version != delay_lines_version or not delay_lines:
+        delay_lines_version = version
+        session = engine.get_session_stats()
+        player = session['player']['delay percentiles']
+        ai = session['ai']['delay percentiles']
+        delay_lines = [
+            ("Session p50/95/99 ms", WHITE, (600, 20)),
+            (f"Player: {player[0]:.0f} / {player[1]:.0f} / {player[2]:.0f}", GREEN, (600, 45)),
+            (f"AI: {ai[0]:.0f} / {ai[1]:.0f} / {ai[2]:.0f}", RED, (600, 70))
+        ]
+    return delay_lines
+
+def get_prediction_lines():
+    """(text, color, position) of prediction mode and how often it was wrong"""
+    position = (10, TOTAL_HEIGHT - 25)
+    if not sim.prediction_enabled:
+        return [("Prediction OFF (P)", GRAY, position)]
+    stats = sim.predictor.get_stats()
+    return [(f"Prediction ON (P): {stats['mispredicted']:.1f}% frames off, avg {stats['mean error']:.1f} px",
+             WHITE, position)]
+
+def get_score_lines():
+    """(text, color, position) of both scores"""
+    return [
+        (str(sim.player_score), WHITE, (WIDTH // 2 - 60, CONTROL_PANEL_HEIGHT + 20)),
+        (str(sim.ai_score), WHITE, (WIDTH // 2 + 30, CONTROL_PANEL_HEIGHT + 20))
+    ]
+
+def text_lines_item(name, text_font, lines):
+    """Dynamic item for a group of text lines"""
+    bounds = pygame.Rect(0, 0, 0, 0)
+    for text, color, position in lines:
+        line_rect = pygame.Rect(position, text_font.size(text))
+        bounds = line_rect if bounds.width == 0 else bounds.union(line_rect)
+
+    def draw():
+        for text, color, position in lines:
+            screen.blit(render_text(text_font, text, color), position)
+
+    return (name, tuple(lines), bounds, draw)
+
+def get_dynamic_items():
+    """
+    Everything drawn on top of the static layer, in draw order, as
+    (name, state key, screen bounds, draw function). An item only needs
+    repainting in dirty-rect mode when its state key changes
+    """
+    items = []
 
-    # draw dividing line
-    pygame.draw.aaline(screen, WHITE, (WIDTH // 2, CONTROL_PANEL_HEIGHT), (WIDTH // 2, TOTAL_HEIGHT))
+    # draw sliders
+    for i, slider in enumerate(sliders):
+        items.append((f"slider {i}", (slider.value, slider.thumb_x, slider.dragging),
+                      slider.get_bounds(), lambda slider=slider: slider.draw(screen)))
 
-    # draw  player labels
-    label_player = small_font.render("PLAYER", True, GRAY)
-    label_ai = small_font.render("COMPUTER", True, GRAY)
-    # Left side (Player)
-    screen.blit(label_player, label_player.get_rect(center=(WIDTH // 4, CONTROL_PANEL_HEIGHT + 20)))
-    # Right side (Computer)
-    screen.blit(label_ai, label_ai.get_rect(center=(3 * WIDTH // 4, CONTROL_PANEL_HEIGHT + 20)))
+    # draw presets, mute, send rate & start/pause buttons
+    for i, btn in enumerate(preset_buttons + [mute_button, send_rate_button, start_pause_button]):
+        items.append((f"button {i}", (btn.text, btn.color, btn.is_hovered, btn.active),
+                      btn.rect.copy(), lambda btn=btn: btn.draw(screen)))
 
+    # get & display stats
+    items.append(text_lines_item("stats", small_font, get_stats_lines()))
+    # frame profiler overlay in the stats column, empty while hidden
+    items.append(text_lines_item("profiler", profiler_font, get_profiler_lines()))
+    # rolling delay & loss per flow, redrawn when a sample is added
+    engine = sim.engine
+    player_telemetry, ai_telemetry = engine.player_telemetry, engine.ai_telemetry
+    def draw_sparklines():
+        delay_sparkline.draw(screen, [(ai_telemetry.delay_series, RED), (player_telemetry.delay_series, GREEN)])
+        loss_sparkline.draw(screen, [(ai_telemetry.loss_series, RED), (player_telemetry.loss_series, GREEN)])
+    items.append(("sparklines", (player_telemetry.delay_series.appended, ai_telemetry.delay_series.appended),
+                  delay_sparkline.get_bounds().union(loss_sparkline.get_bounds()), draw_sparklines))
     # render scores
-    player_text = font.render(str(player_score), True, WHITE)
-    ai_text = font.render(str(ai_score), True, WHITE)
-    screen.blit(player_text, (WIDTH // 2 - 60, CONTROL_PANEL_HEIGHT + 20))
-    screen.blit(ai_text, (WIDTH // 2 + 30, CONTROL_PANEL_HEIGHT + 20))
-
+    items.append(text_lines_item("scores", font, get_score_lines()))
+    items.append(text_lines_item("prediction", small_font, get_prediction_lines()))
+
+    # draw paddles & ball between the last two ticks, the player's own paddle where they predict it to be
+    ball, player_paddle, ai_paddle = sim.interpolated_rects()
+    for name, paddle in (("player paddle", player_paddle), ("ai paddle", ai_paddle)):
+        items.append((name, tuple(paddle), paddle,
+                      lambda paddle=paddle: pygame.draw.rect(screen, WHITE, paddle)))
+
+    def draw_ball():
+        if ball_visible:
+            pygame.draw.ellipse(screen, WHITE, ball)
+    items.append(("ball", (tuple(ball), ball_visible), ball, draw_ball))
+
+    return items
+
+def get_profiler_lines():
+    """(text, color, position) of the profiler overlay, refreshed every PROFILER_OVERLAY_INTERVAL"""
+    global profiler_lines, last_profiler_update
+
+    if not show_profiler:
+        return []
+
+    time_now = real_clock.now_ms()
+    if time_now - last_profiler_update > PROFILER_OVERLAY_INTERVAL or not profiler_lines:
+        last_profiler_update = time_now
+        x, y = 600, 0
+        profiler_lines = [(f"p50 / p99 ms  (budget {FRAME_BUDGET_MS:.1f})", WHITE, (x, y))]
+        for i, (stage, p50, p99) in enumerate(profiler.summary(), start=1):
+            color = RED if p99 > FRAME_BUDGET_MS else GREEN
+            profiler_lines.append((f"{stage}: {p50:.2f} / {p99:.2f}", color, (x, y + i * 10)))
+    return profiler_lines
+
+def draw_overlays():
+    """Pause and game over overlays on top of the field"""
     # pause overlay button
-    if not is_game_running and not is_game_over:
+    if not sim.is_game_running and not sim.is_game_over:
         transparent_background(BLACK)
-        pause = font.render("PAUSED", True, WHITE)
+        pause = render_text(font, "PAUSED", WHITE)
         screen.blit(pause, pause.get_rect(center=(WIDTH / 2, TOTAL_HEIGHT / 2)))
 
     # end of game display
-    if is_game_over:
-        player_won = player_score > ai_score
+    if sim.is_game_over:
+        player_won = sim.player_score > sim.ai_score
         transparent_background(GREEN) if player_won else transparent_background(RED)
-        
-        game_over_text = font.render("GAME OVER", True, WHITE)
+
+        game_over_text = render_text(font, "GAME OVER", WHITE)
         screen.blit(game_over_text, game_over_text.get_rect(center=(WIDTH/2, CONTROL_PANEL_HEIGHT + 160)))
-        
+
         if player_won:
-            result_text = font.render("YOU WON!", True, WHITE)
+            result_text = render_text(font, "YOU WON!", WHITE)
         else:
-            result_text = font.render("COMPUTER WON!", True, WHITE)
+            result_text = render_text(font, "COMPUTER WON!", WHITE)
         screen.blit(result_text, result_text.get_rect(center=(WIDTH/2, CONTROL_PANEL_HEIGHT + 250)))
-        
-        final_score_text = font.render(f"Final Score: {player_score} - {ai_score}", True, WHITE)
+
+        final_score_text = render_text(font, f"Final Score: {sim.player_score} - {sim.ai_score}", WHITE)
         screen.blit(final_score_text, final_score_text.get_rect(center=(WIDTH/2, CONTROL_PANEL_HEIGHT + 320)))
 
+def draw_full(items, background_color):
+    """Repaint the whole screen and flip"""
+    screen.blit(get_static_layer(background_color), (0, 0))
+    for name, state, bounds, draw in items:
+        draw()
+    draw_overlays()
     pygame.display.flip()
 
-def game_loop():
-    """Main driver of the game"""
-    global game_paused, game_paused_timer
-    global hit_flash, hit_flash_timer, score_flash, score_flash_timer
-    global reset_stats_pending
+def draw_dirty(items):
+    """Repaint and push only the areas of items whose state changed since last frame"""
+    dirty_rects = []
+    for name, state, bounds, draw in items:
+        previous = item_states.get(name)
+        if previous is None or previous[0] != state:
+            # clear where it was, paint where it is
+            if previous is not None:
+                dirty_rects.append(previous[1])
+            dirty_rects.append(bounds)
+
+    if not dirty_rects:
+        return
+
+    # anything overlapping a cleared area must be repainted whole
+    # (re-blending anti-aliased text over itself would smear it)
+    redraw = set()
+    grew = True
+    while grew:
+        grew = False
+        for name, state, bounds, draw in items:
+            if name not in redraw and bounds.collidelist(dirty_rects) != -1:
+                redraw.add(name)
+                dirty_rects.append(bounds)
+                grew = True
+
+    static_layer = get_static_layer(BLACK)
+    for rect in dirty_rects:
+        screen.blit(static_layer, rect, rect)
+    for name, state, bounds, draw in items:
+        if name in redraw:
+            draw()
+
+    pygame.display.update(dirty_rects)
+
+def draw_elements():
+    """Draw all game elements, sliders, & scores onto screen"""
+    global last_frame_full
+
+    update_ball_visibility()
+    update_start_pause_button()
+
+    background_color = BLACK  # default
+    if hit_flash:
+        background_color = RED
+    elif score_flash:
+        background_color = GREEN
+
+    items = get_dynamic_items()
+
+    # flashes and overlays cover the whole field, so repaint everything
+    # and once more after they end to get back to the plain background
+    full_frame = background_color != BLACK or not sim.is_game_running
+    if not DIRTY_RECT_RENDERING or full_frame or last_frame_full:
+        draw_full(items, background_color)
+    else:
+        draw_dirty(items)
+    last_frame_full = full_frame
+
+    # remember what is on screen for the next dirty frame
+    item_states.clear()
+    for name, state, bounds, draw in items:
+        item_states[name] = (state, bounds)
+
+def update_flashes():
+    """End red/green flashes after FLASH_DURATION"""
+    global hit_flash, score_flash
+
+    # flash red
+    if hit_flash:
+        time_now = sim.clock.now_ms()
+        if time_now - hit_flash_timer > FLASH_DURATION:
+            hit_flash = False
+    # flash green
+    if score_flash:
+        time_now = sim.clock.now_ms()
+        if time_now - score_flash_timer > FLASH_DURATION:
+            score_flash = False
+
+def report_first_frame():
+    """Print how long startup took until the first frame was shown"""
+    global first_frame_ms
+    first_frame_ms = (time.perf_counter_ns() - STARTUP_NS) / 1e6
+    print(f"first frame after {first_frame_ms:.0f} ms ({describe_audio()})")
+
+def describe_audio():
+    """Audio state for the startup report"""
+    if not audio.enabled:
+        return "audio off"
+    if audio.load_ms is None:
+        return "audio still loading in the background"
+    return f"audio loaded in {audio.load_ms:.0f} ms"
+
+
+def game_loop(render_fps=RENDER_FPS):
+    """Main driver of the game, renders at render_fps (0 = uncapped)"""
     running = True
     while running:
+        frame_start = profiler.start()
         update_degradation_params()
+        stage_start = profiler.lap('params', frame_start)
         handle_input()
+        stage_start = profiler.lap('input', stage_start)
 
-        # pause game
-        if game_paused:
-            time_now = pygame.time.get_ticks()
-            if time_now - game_paused_timer > PAUSE_DURATION:
-                game_paused = False
-
-                # reset stats
-                if reset_stats_pending:
-                    engine.reset_stats()
-                    reset_stats_pending = False
-
-        # only if manually started and not paused between scores
-        if is_game_running and not game_paused:
-            ball.move()
-            check_collision()
-            ai_movement(ai_paddle, ball)
-            apply_lagged_actions()
-
-        # flash red
-        if hit_flash:
-            time_now = pygame.time.get_ticks()
-            if time_now - hit_flash_timer > FLASH_DURATION:
-                hit_flash = False
-        # flash green
-        if score_flash:
-            time_now = pygame.time.get_ticks()
-            if time_now - score_flash_timer > FLASH_DURATION:
-                score_flash = False
+        # advance simulation in fixed ticks up to now: pause timer, physics, ai, lagged actions
+        handle_events(sim.advance(real_clock.now_ns(), keyboard_player))
+        update_flashes()
+        stage_start = profiler.lap('step', stage_start)
 
         draw_elements()
-        clock.tick(FPS)
+        profiler.lap('draw', stage_start)
+        if first_frame_ms is None:
+            report_first_frame()
+        stage_start = profiler.lap('frame', frame_start)
+        clock.tick(render_fps)
+        profiler.lap('clock tick', stage_start)
+
+        # a copy of the numbers, the exporter threads never read live game state
+        if metrics is not None and metrics.due(real_clock.now_ms()):
+            metrics.publish(GameSnapshot(sim, profiler, clock.get_fps()))
 
 if __name__ == "__main__":
-    game_loop()
-    
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Network Degradation Pong Simulator")
+    parser.add_argument('--trace', help="replay a recorded network trace (csv or .ndtr), left/right arrows scrub")
+    parser.add_argument('--trace-offset', type=float, default=0, help="start this many seconds into the trace")
+    parser.add_argument('--record', help="record the session for replay with recording.py")
+    parser.add_argument('--fps', type=int, default=RENDER_FPS,
+                        help=f"render rate, 0 = uncapped (the match always ticks at {SIMULATION_RATE} Hz)")
+    parser.add_argument('--profile', action='store_true',
+                        help="time every frame stage and print histograms on exit (F3 shows the overlay)")
+    parser.add_argument('--no-audio', action='store_true', help="don't open the audio device at all")
+    parser.add_argument('--metrics-port', type=int,
+                        help="serve prometheus metrics on http://127.0.0.1:PORT/metrics (implies --profile)")
+    parser.add_argument('--metrics-file', help="append a json line of metrics every second (implies --profile)")
+    parser.add_argument('--link-rate', type=float,
+                        help="put each flow behind a link of this many kbit/s (an input packet is 35 bytes)")
+    parser.add_argument('--buffer', type=int, default=LINK_BUFFER_PACKETS, help="link buffer in packets")
+    parser.add_argument('--queue', choices=QUEUE_DISCIPLINES, default=DEFAULT_QUEUE_DISCIPLINE,
+                        help="what the link buffer drops: drop_tail, red (random early) or codel (by queueing delay)")
+    parser.add_argument('--ai', choices=AI_MODES, default=DEFAULT_AI_MODE,
+                        help="track: follow the ball every tick, intercept: plan once per trajectory")
+    parser.add_argument('--difficulty', choices=list(AI_DIFFICULTY), default=DEFAULT_AI_DIFFICULTY)
+    args = parser.parse_args()
+
+    # frame time metrics come from the profiler
+    always_profile = args.profile or args.metrics_port is not None or args.metrics_file is not None
+    profiler.enabled = always_profile
+    if args.metrics_port is not None or args.metrics_file is not None:
+        metrics = MetricsExporter(args.metrics_port, args.metrics_file)
+        metrics.start()
+    setup(audio_enabled=not args.no_audio)
+    sim.set_ai(args.ai, args.difficulty)
+    if args.link_rate is not None:
+        sim.engine.set_link({'rate' : args.link_rate, 'buffer' : args.buffer, 'queue' : (args.queue, {})})
+    if args.record:
+        recorder = MatchRecorder(args.record)
+        recorder.attach(sim)
+    if args.trace:
+        sim.set_trace(TracePlayer(open_trace(args.trace), offset_ms=int(args.trace_offset * 1000)))
+    game_loop(args.fps)
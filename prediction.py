@@ -0,0 +1,88 @@
+from collections import deque
+from config import CONTROL_PANEL_HEIGHT, TOTAL_HEIGHT, PREDICTION_SMOOTHING, PREDICTION_SNAP_DISTANCE, PREDICTION_TOLERANCE
+
+def clamp_paddle_y(y, height):
+    """Keep a paddle top inside the playing field"""
+    return min(max(y, CONTROL_PANEL_HEIGHT), TOTAL_HEIGHT - height)
+
+class PaddlePredictor:
+    """
+    Client-side prediction & reconciliation for the player paddle.
+
+    Inputs move the displayed paddle at once, the authoritative paddle only
+    moves when the delayed packet is released. Every frame the prediction is
+    rebuilt from the authoritative position plus the inputs the server has
+    not processed yet, and the displayed paddle eases towards it so that
+    corrections (lost or reordered packets) don't make it jump.
+
+    The server acknowledges the highest packet sequence it has processed,
+    unacknowledged inputs at or below it were lost (or arrive late, in which
+    case they show up in the authoritative position).
+    """
+    def __init__(self, paddle):
+        self.paddle = paddle
+        # (sequence, move) sent but not acknowledged, in send order
+        self.pending = deque()
+        self.reset()
+
+    def reset(self):
+        """Forget pending inputs and snap to the authoritative paddle"""
+        self.pending.clear()
+        self.last_ack = -1
+        self.display_y = float(self.paddle.y)
+        self.frames = 0
+        self.mispredicted_frames = 0
+        self.error_total = 0.0
+
+    def apply_local(self, move_amount):
+        """Move the displayed paddle straight away for a local input"""
+        self.display_y = clamp_paddle_y(self.display_y + move_amount, self.paddle.height)
+
+    def on_send(self, sequence, move_amount):
+        """An input left the client as packet `sequence`"""
+        self.pending.append((sequence, move_amount))
+
+    def on_ack(self, sequence):
+        """The server applied packet `sequence`"""
+        if sequence > self.last_ack:
+            self.last_ack = sequence
+        pending = self.pending
+        while pending and pending[0][0] <= self.last_ack:
+            pending.popleft()
+
+    def predicted_y(self, unsent_move=0):
+        """Authoritative position with every unprocessed input replayed on top"""
+        height = self.paddle.height
+        y = self.paddle.y
+        for sequence, move_amount in self.pending:
+            y = clamp_paddle_y(y + move_amount, height)
+        return clamp_paddle_y(y + unsent_move, height)
+
+    def reconcile(self, unsent_move=0):
+        """Correct the displayed paddle towards the prediction, once per frame"""
+        target = self.predicted_y(unsent_move)
+        error = target - self.display_y
+
+        self.frames += 1
+        if abs(error) > PREDICTION_TOLERANCE:
+            self.mispredicted_frames += 1
+            self.error_total += abs(error)
+
+        # far off (e.g. a burst of losses): jump, otherwise ease in
+        if abs(error) > PREDICTION_SNAP_DISTANCE or abs(error) < 0.5:
+            self.display_y = float(target)
+        else:
+            self.display_y += error * PREDICTION_SMOOTHING
+
+    def display_rect(self):
+        """Copy of the paddle rect at the displayed position"""
+        rect = self.paddle.copy()
+        rect.y = round(self.display_y)
+        return rect
+
+    def get_stats(self):
+        """Share of frames the prediction was off and the mean error (px) when it was"""
+        return {
+            'mispredicted' : self.mispredicted_frames / self.frames * 100 if self.frames else 0.0,
+            'mean error' : self.error_total / self.mispredicted_frames if self.mispredicted_frames else 0.0
+        }
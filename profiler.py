@@ -0,0 +1,95 @@
+import time
+from array import array
+from bisect import bisect_left
+from config import PROFILER_WINDOW, PROFILER_BUCKETS_US, FRAME_BUDGET_MS
+
+BUCKET_EDGES_NS = [edge * 1000 for edge in PROFILER_BUCKETS_US]
+
+class StageTimings:
+    """
+    Durations of one stage: a fixed-size ring of the last `window` samples
+    for rolling percentiles, and a bucketed histogram of the whole session
+    """
+    def __init__(self, window=PROFILER_WINDOW):
+        self.window = window
+        self.samples = array('q', bytes(8 * window))
+        self.index = 0
+        self.filled = 0
+        # last bucket counts everything above the final edge
+        self.bucket_counts = [0] * (len(BUCKET_EDGES_NS) + 1)
+        self.total_count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, duration_ns):
+        self.samples[self.index] = duration_ns
+        self.index += 1
+        if self.index == self.window:
+            self.index = 0
+        if self.filled < self.window:
+            self.filled += 1
+
+        self.bucket_counts[bisect_left(BUCKET_EDGES_NS, duration_ns)] += 1
+        self.total_count += 1
+        self.total_ns += duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+
+    def percentiles_ms(self, *fractions):
+        """Rolling percentiles (ms) over the window, e.g. percentiles_ms(0.5, 0.99)"""
+        if self.filled == 0:
+            return [0.0 for _ in fractions]
+        ordered = sorted(self.samples[:self.filled])
+        return [ordered[min(self.filled - 1, int(fraction * self.filled))] / 1e6 for fraction in fractions]
+
+class FrameProfiler:
+    """
+    Per-stage frame timing. Call start() at the beginning of a stage and
+    lap(stage, start) at the end, lap returns the start of the next stage.
+    While disabled both return 0 straight away, so leaving the calls in the
+    game loop costs next to nothing.
+    """
+    def __init__(self, enabled=False, window=PROFILER_WINDOW):
+        self.enabled = enabled
+        self.window = window
+        # stage name -> StageTimings, in first-seen order
+        self.stages = {}
+
+    def start(self):
+        if not self.enabled:
+            return 0
+        return time.perf_counter_ns()
+
+    def lap(self, stage, start_ns):
+        if not self.enabled:
+            return 0
+        time_now = time.perf_counter_ns()
+        timings = self.stages.get(stage)
+        if timings is None:
+            timings = StageTimings(self.window)
+            self.stages[stage] = timings
+        timings.add(time_now - start_ns)
+        return time_now
+
+    def summary(self):
+        """(stage, p50 ms, p99 ms) for every stage seen"""
+        rows = []
+        for stage, timings in self.stages.items():
+            p50, p99 = timings.percentiles_ms(0.5, 0.99)
+            rows.append((stage, p50, p99))
+        return rows
+
+    def format_dump(self):
+        """Session histograms of every stage as text"""
+        labels = [f"<={edge / 1000:g}ms" for edge in PROFILER_BUCKETS_US] + [f">{PROFILER_BUCKETS_US[-1] / 1000:g}ms"]
+        lines = [f"frame profile (budget {FRAME_BUDGET_MS:.1f} ms)",
+                 f"{'stage':<16}{'frames':>8}{'mean ms':>9}{'p50 ms':>8}{'p99 ms':>8}{'max ms':>8}  histogram"]
+        for stage, timings in self.stages.items():
+            if timings.total_count == 0:
+                continue
+            p50, p99 = timings.percentiles_ms(0.5, 0.99)
+            mean = timings.total_ns / timings.total_count / 1e6
+            buckets = ' '.join(f"{label}:{count}" for label, count in zip(labels, timings.bucket_counts) if count)
+            lines.append(f"{stage:<16}{timings.total_count:>8}{mean:>9.3f}{p50:>8.3f}{p99:>8.3f}"
+                         f"{timings.max_ns / 1e6:>8.3f}  {buckets}")
+        return '\n'.join(lines)
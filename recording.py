@@ -0,0 +1,324 @@
+"""
+Compact match recordings and bit-for-bit headless replay.
+
+A recording is an append-only log of length-prefixed binary records:
+every simulation step with its clock time, every player input,
+start/pause/reset, send rate and engine param changes, plus every
+packet released and every score as a check. The RNG seed is in the
+header, so replaying the inputs on a fresh Simulation must reproduce
+the released packets and scores exactly.
+
+usage: python recording.py replay session.ndrec
+       python -m cProfile -s cumtime recording.py replay session.ndrec
+"""
+import json
+import math
+import queue
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+from config import RECORD_CHUNK_SIZE
+from simulation import Simulation
+
+RECORDING_MAGIC = b'NDRC'
+RECORDING_VERSION = 4
+
+# every record: payload length, record type, payload
+RECORD_HEADER = struct.Struct('<IB')
+
+HEADER = 0        # json: version, seed, send rate, tick rate, ai, params, models, link, clock time
+STEP = 1          # frame, time_ns
+INPUT = 2         # frame, move amount
+TOGGLE = 3        # frame
+RESET = 4         # frame
+SEND_RATE = 5     # frame, send rate
+PARAMS = 6        # frame, in step, latency, loss, max jitter (nan for None)
+MODELS = 7        # frame, in step, json [loss model, jitter model]
+RELEASE = 8       # frame, flow (0 player, 1 ai), data, time_sent, time_due
+SCORE = 9         # frame, player score, ai score
+LINK = 10         # frame, in step, json link spec
+
+FRAME = struct.Struct('<I')
+STEP_RECORD = struct.Struct('<Iq')
+INPUT_RECORD = struct.Struct('<Id')
+SEND_RATE_RECORD = struct.Struct('<IH')
+PARAMS_RECORD = struct.Struct('<IBddd')
+MODELS_PREFIX = struct.Struct('<IB')
+RELEASE_RECORD = struct.Struct('<IBdqq')
+SCORE_RECORD = struct.Struct('<IBB')
+
+class ReplayMismatch(Exception):
+    """Replayed match diverged from the recording"""
+
+class MatchRecorder:
+    """
+    Records a Simulation from the moment it is attached.
+    Records are packed into an in-memory buffer and handed to a writer
+    thread in RECORD_CHUNK_SIZE chunks, so the game loop never waits on disk.
+    """
+    def __init__(self, path, chunk_size=RECORD_CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.sim = None
+        self.records = 0
+        self._file = open(path, 'wb')
+        self._file.write(RECORDING_MAGIC)
+        self._buffer = bytearray()
+        self._chunks = queue.Queue()
+        self._writer = threading.Thread(target=self._write_chunks, name="match recorder", daemon=True)
+        self._writer.start()
+
+    def attach(self, sim):
+        """Start recording sim, which should not have been stepped or played yet"""
+        self.sim = sim
+        sim.recorder = self
+        sim.engine.recorder = self
+        engine = sim.engine
+        header = {
+            'version' : RECORDING_VERSION,
+            'seed' : sim.seed,
+            'send_rate' : sim.get_send_rate(),
+            'tick_rate' : sim.tick_rate,
+            'ai_mode' : sim.ai_mode,
+            'ai_difficulty' : sim.ai_difficulty,
+            'time_ns' : sim.clock.now_ns(),
+            'latency' : engine.latency,
+            'loss' : engine.loss_percent,
+            'max_jitter' : engine.max_jitter,
+            'loss_model' : engine.loss_model_spec,
+            'jitter_model' : engine.jitter_model_spec,
+            'link' : engine.link_spec
+        }
+        self._write(HEADER, json.dumps(header).encode())
+
+    def _write(self, record_type, payload):
+        self._buffer += RECORD_HEADER.pack(len(payload), record_type)
+        self._buffer += payload
+        self.records += 1
+        if len(self._buffer) >= self.chunk_size:
+            self._chunks.put(bytes(self._buffer))
+            self._buffer.clear()
+
+    def _write_chunks(self):
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None:
+                break
+            self._file.write(chunk)
+            self._file.flush()
+
+    def close(self):
+        """Write what is buffered, stop the writer thread and close the file"""
+        if self.sim is not None:
+            self.sim.recorder = None
+            self.sim.engine.recorder = None
+        if self._buffer:
+            self._chunks.put(bytes(self._buffer))
+            self._buffer.clear()
+        self._chunks.put(None)
+        self._writer.join()
+        self._file.close()
+
+    # hooks called by Simulation & DegradationEngine
+
+    def record_step(self, time_ns):
+        self._write(STEP, STEP_RECORD.pack(self.sim.frame, time_ns))
+
+    def record_input(self, move_amount):
+        self._write(INPUT, INPUT_RECORD.pack(self.sim.frame, move_amount))
+
+    def record_toggle(self):
+        self._write(TOGGLE, FRAME.pack(self.sim.frame))
+
+    def record_reset(self):
+        self._write(RESET, FRAME.pack(self.sim.frame))
+
+    def record_send_rate(self, send_rate):
+        self._write(SEND_RATE, SEND_RATE_RECORD.pack(self.sim.frame, send_rate))
+
+    def record_parameters(self, latency, loss_percent, max_jitter):
+        max_jitter = math.nan if max_jitter is None else max_jitter
+        self._write(PARAMS, PARAMS_RECORD.pack(self.sim.frame, self.sim.in_step, latency, loss_percent, max_jitter))
+
+    def record_models(self, loss_model, jitter_model):
+        specs = json.dumps([loss_model, jitter_model]).encode()
+        self._write(MODELS, MODELS_PREFIX.pack(self.sim.frame, self.sim.in_step) + specs)
+
+    def record_link(self, link):
+        self._write(LINK, MODELS_PREFIX.pack(self.sim.frame, self.sim.in_step) + json.dumps(link).encode())
+
+    def record_release(self, packet, is_ai):
+        self._write(RELEASE, RELEASE_RECORD.pack(self.sim.frame, is_ai, packet.data,
+                                                 packet.time_sent, packet.time_due))
+
+    def record_score(self, player_score, ai_score):
+        self._write(SCORE, SCORE_RECORD.pack(self.sim.frame, player_score, ai_score))
+
+def read_records(path):
+    """Yield (record type, payload) from a recording"""
+    with open(path, 'rb') as recording_file:
+        if recording_file.read(len(RECORDING_MAGIC)) != RECORDING_MAGIC:
+            raise ValueError(f"{path} is not a match recording")
+        while True:
+            header = recording_file.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                # a recording cut short by a crash ends at the last whole record
+                return
+            length, record_type = RECORD_HEADER.unpack(header)
+            payload = recording_file.read(length)
+            if len(payload) < length:
+                return
+            yield record_type, payload
+
+class MatchReplayer:
+    """
+    Rebuilds a recorded match on a fresh headless Simulation, as fast as
+    possible. With verify, every released packet and score is compared to
+    the recording and the first difference raises ReplayMismatch.
+    """
+    def __init__(self, path, verify=True):
+        self.path = path
+        self.verify = verify
+        self.sim = None
+        self._produced = deque()
+        self._checked = 0
+        self._pending_step = None
+
+    def _start(self, header):
+        header = json.loads(header)
+        if header['version'] != RECORDING_VERSION:
+            raise ValueError(f"{self.path} has unsupported recording version {header['version']}")
+        sim = Simulation(seed=header['seed'], send_rate=header['send_rate'], tick_rate=header['tick_rate'])
+        sim.set_ai(header['ai_mode'], header['ai_difficulty'])
+        sim.clock.advance_to(header['time_ns'])
+        sim.engine.set_models(header['loss_model'], header['jitter_model'])
+        sim.engine.set_link(header['link'])
+        sim.engine.set_parameters(header['latency'], header['loss'], header['max_jitter'])
+        # replay hooks only collect what the replayed match produces
+        sim.recorder = self
+        sim.engine.recorder = self
+        self.sim = sim
+
+    def _run_pending_step(self):
+        if self._pending_step is not None:
+            time_ns = self._pending_step
+            self._pending_step = None
+            self.sim.step(time_ns)
+
+    def _check(self, record_type, payload):
+        """Compare one recorded outcome with the next one the replay produced"""
+        self._run_pending_step()
+        if not self.verify:
+            return
+        if not self._produced:
+            raise ReplayMismatch(f"frame {self.sim.frame}: recorded {record_type} {payload.hex()} was not replayed")
+        produced = self._produced.popleft()
+        if produced != (record_type, payload):
+            raise ReplayMismatch(f"frame {self.sim.frame}: recorded {record_type} {payload.hex()}, "
+                                 f"replayed {produced[0]} {produced[1].hex()}")
+        self._checked += 1
+
+    def _check_all_consumed(self):
+        if self.verify and self._produced:
+            record_type, payload = self._produced[0]
+            raise ReplayMismatch(f"frame {self.sim.frame}: replay produced unrecorded {record_type} {payload.hex()}")
+
+    def run(self):
+        """Replay the whole recording, returns match summary"""
+        start = time.perf_counter()
+        for record_type, payload in read_records(self.path):
+            if record_type == HEADER:
+                self._start(payload)
+
+            elif record_type in (RELEASE, SCORE):
+                self._check(record_type, payload)
+
+            elif record_type in (PARAMS, MODELS, LINK) and payload[FRAME.size]:
+                # changes made inside a step (trace) happen before anything in that step
+                self._apply(record_type, payload)
+
+            else:
+                # anything else happens between steps
+                self._run_pending_step()
+                self._check_all_consumed()
+                if record_type == STEP:
+                    self._pending_step = STEP_RECORD.unpack(payload)[1]
+                else:
+                    self._apply(record_type, payload)
+
+        self._run_pending_step()
+        self._check_all_consumed()
+        sim = self.sim
+        return {
+            'frames' : sim.frame,
+            'player_score' : sim.player_score,
+            'ai_score' : sim.ai_score,
+            'checked' : self._checked,
+            'seconds' : time.perf_counter() - start
+        }
+
+    def _apply(self, record_type, payload):
+        sim = self.sim
+        if record_type == INPUT:
+            sim.queue_player_input(INPUT_RECORD.unpack(payload)[1])
+        elif record_type == TOGGLE:
+            sim.toggle_game_state()
+        elif record_type == RESET:
+            sim.reset_game()
+        elif record_type == SEND_RATE:
+            sim.set_send_rate(SEND_RATE_RECORD.unpack(payload)[1])
+        elif record_type == PARAMS:
+            frame, in_step, latency, loss, max_jitter = PARAMS_RECORD.unpack(payload)
+            sim.engine.set_parameters(latency, loss, None if math.isnan(max_jitter) else max_jitter)
+        elif record_type == MODELS:
+            loss_model, jitter_model = json.loads(payload[MODELS_PREFIX.size:])
+            sim.engine.set_models(loss_model, jitter_model)
+        elif record_type == LINK:
+            sim.engine.set_link(json.loads(payload[MODELS_PREFIX.size:]))
+
+    # hooks called by the replayed Simulation & DegradationEngine
+
+    def record_step(self, time_ns):
+        pass
+
+    def record_input(self, move_amount):
+        pass
+
+    def record_toggle(self):
+        pass
+
+    def record_reset(self):
+        pass
+
+    def record_send_rate(self, send_rate):
+        pass
+
+    def record_parameters(self, latency, loss_percent, max_jitter):
+        pass
+
+    def record_models(self, loss_model, jitter_model):
+        pass
+
+    def record_link(self, link):
+        pass
+
+    def record_release(self, packet, is_ai):
+        if self.verify:
+            self._produced.append((RELEASE, RELEASE_RECORD.pack(self.sim.frame, is_ai, packet.data,
+                                                                packet.time_sent, packet.time_due)))
+
+    def record_score(self, player_score, ai_score):
+        if self.verify:
+            self._produced.append((SCORE, SCORE_RECORD.pack(self.sim.frame, player_score, ai_score)))
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != 'replay':
+        print("usage: python recording.py replay session.ndrec")
+        sys.exit(1)
+    result = MatchReplayer(sys.argv[2]).run()
+    print(f"replayed {result['frames']} frames in {result['seconds']:.2f} s, "
+          f"final score {result['player_score']} - {result['ai_score']}, "
+          f"{result['checked']} packets/scores match the recording")
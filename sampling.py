@@ -0,0 +1,61 @@
+import zlib
+import numpy as np
+from config import RNG_BLOCK_SIZE
+
+class RandomStream:
+    """
+    Uniform [0, 1) draws from one independent generator.
+    Draws are made in NumPy blocks and handed out one at a time,
+    the next block is only generated once the current one runs out.
+    """
+    def __init__(self, seed_sequence, block_size=RNG_BLOCK_SIZE):
+        self.generator = np.random.default_rng(seed_sequence)
+        self.block_size = block_size
+        # python floats so per-draw indexing stays cheap
+        self._block = []
+        self._index = 0
+        self.blocks_generated = 0
+
+    def _refill(self):
+        self._block = self.generator.random(self.block_size).tolist()
+        self._index = 0
+        self.blocks_generated += 1
+
+    def random(self):
+        """Next draw in [0, 1)"""
+        if self._index >= len(self._block):
+            self._refill()
+        value = self._block[self._index]
+        self._index += 1
+        return value
+
+    def uniform(self, low, high):
+        """Next draw in [low, high)"""
+        return low + (high - low) * self.random()
+
+    def choice(self, options):
+        """Pick one item of a non-empty sequence"""
+        return options[int(self.random() * len(options))]
+
+class RandomStreams:
+    """
+    Named, independent random streams all derived from a single seed.
+    The same seed and stream name always give the same draws,
+    no matter which other streams are in use.
+    """
+    def __init__(self, seed=None, block_size=RNG_BLOCK_SIZE):
+        seed_sequence = np.random.SeedSequence(seed)
+        # keep the (possibly OS generated) entropy so any run can be repeated
+        self.seed = seed_sequence.entropy
+        self.block_size = block_size
+        self._streams = {}
+
+    def stream(self, name):
+        """Get (or create) the stream for name"""
+        stream = self._streams.get(name)
+        if stream is None:
+            # stable key from the name so streams don't depend on creation order
+            spawn_key = (zlib.crc32(name.encode()),)
+            stream = RandomStream(np.random.SeedSequence(self.seed, spawn_key=spawn_key), self.block_size)
+            self._streams[name] = stream
+        return stream
@@ -0,0 +1,518 @@
+from config import *
+from components.paddle import Paddle
+from components.ball import Ball
+from degradation_engine import DegradationEngine
+from clock import SimulatedClock, NS_PER_MS, NS_PER_SECOND
+from sampling import RandomStreams
+from input_coalescer import InputCoalescer
+from profiler import FrameProfiler
+from prediction import PaddlePredictor
+from ai_player import InterceptAI
+from collision import HIT_PADDLE, GOAL_LEFT, GOAL_RIGHT
+
+# simulated time covered by one call to Simulation.step (one fixed tick) by default
+FRAME_NS = NS_PER_SECOND // SIMULATION_RATE
+PAUSE_DURATION_NS = PAUSE_DURATION * NS_PER_MS
+
+# events returned from Simulation.step for the renderer (sounds, flashes)
+EVENT_PADDLE_HIT = 'paddle_hit'
+EVENT_AI_SCORED = 'ai_scored'
+EVENT_PLAYER_SCORED = 'player_scored'
+EVENT_GAME_OVER = 'game_over'
+
+class Simulation:
+    """
+    Headless pong match: paddles, ball, degradation engine and scoring.
+    No display or audio. With the default SimulatedClock time only moves
+    when step() is called; pass a MonotonicClock to follow real time.
+    tick_rate (Hz) sets the time one step covers, collisions are swept so
+    headless runs can take much larger steps than the game's 60 Hz.
+    """
+    def __init__(self, seed=None, clock=None, send_rate=DEFAULT_SEND_RATE, tick_rate=SIMULATION_RATE):
+        # every random draw of the match comes from streams of this one seed
+        self.streams = RandomStreams(seed)
+        self.seed = self.streams.seed
+
+        # shared by the engine and the pause timer
+        self.clock = clock if clock is not None else SimulatedClock()
+        # time per step, and how many SPEED_REFERENCE_RATE ticks of movement that is
+        self.tick_rate = tick_rate
+        self.tick_ns = NS_PER_SECOND // tick_rate
+        self.tick_scale = SPEED_REFERENCE_RATE / tick_rate
+
+        # object instantiations
+        # player is left paddle
+        self.player_paddle = Paddle(50, (HEIGHT // 2 - PADDLE_HEIGHT // 2) + CONTROL_PANEL_HEIGHT, PADDLE_SPEED)
+        # ai is right paddle
+        self.ai_paddle = Paddle((WIDTH - PADDLE_WIDTH - 50), (HEIGHT // 2 - PADDLE_HEIGHT // 2) + CONTROL_PANEL_HEIGHT, PADDLE_SPEED)
+        self.ball = Ball((WIDTH // 2 - BALL_SIZE // 2), (HEIGHT // 2 - BALL_SIZE / 2) + CONTROL_PANEL_HEIGHT, BALL_SPEED,
+                         rng=self.streams.stream('serve'))
+
+        # init degradation engine on simulated time
+        self.engine = DegradationEngine(self.player_paddle, self.ai_paddle, clock=self.clock, streams=self.streams)
+        self.engine.set_parameters(0, 0)
+        # inputs are merged and sent at the client send rate
+        self.player_sender = InputCoalescer(self.engine, self.player_paddle, self.clock, send_rate)
+        self.ai_sender = InputCoalescer(self.engine, self.ai_paddle, self.clock, send_rate)
+        # optional client-side prediction of the player paddle, display only:
+        # collisions always use the authoritative paddle
+        self.predictor = PaddlePredictor(self.player_paddle)
+        self.prediction_enabled = False
+        # False when the right paddle is played by a second human (net_server.py)
+        self.ai_enabled = True
+        # how the ai plays (AI_MODES, AI_DIFFICULTY), the InterceptAI in 'intercept' mode
+        self.ai_planner = None
+        self.set_ai(DEFAULT_AI_MODE, DEFAULT_AI_DIFFICULTY)
+
+        # frames stepped so far, and whether a step is running (for recordings)
+        self.frame = 0
+        self.in_step = False
+        # optional recording.MatchRecorder (or anything with its record_* methods)
+        self.recorder = None
+        # stage timings of step(), off unless enabled
+        self.profiler = FrameProfiler()
+
+        # optional network_trace.TracePlayer driving the engine params
+        self.trace_player = None
+        self.trace_start_ns = 0
+
+        # bound once so releasing packets doesn't create a method object per frame
+        self._apply_packet = self.apply_packet
+        self._release_time = 0
+
+        # fixed timestep (advance): real time the match gave up when it fell
+        # too far behind, and how far into the next tick the caller's time is
+        self.lag_ns = 0
+        self.render_alpha = 0.0
+        # ball x/y, player y, ai y, predicted player y at the start of the last tick
+        self.previous_positions = None
+
+        # score tracking
+        self.player_score = 0
+        self.ai_score = 0
+        # matches finished since the simulation was created, never reset
+        self.matches_finished = 0
+        self.player_wins = 0
+
+        # game state
+        self.game_paused = False
+        self.game_paused_timer = 0
+        self.reset_stats_pending = False
+        self.is_game_running = False
+        self.is_game_over = False
+
+        # match totals for headless runs
+        self.reset_match_stats()
+
+    def is_active(self):
+        """True while paddles and ball are allowed to move"""
+        return self.is_game_running and not self.game_paused and not self.is_game_over
+
+    def set_parameters(self, latency, loss):
+        """Update engine degradation params"""
+        self.engine.set_parameters(latency, loss)
+
+    def set_trace(self, trace_player):
+        """Drive latency/loss/jitter from a trace from now on, None to stop"""
+        self.trace_player = trace_player
+        self.trace_start_ns = self.clock.now_ns()
+        if trace_player is not None:
+            trace_player.update(0)
+            trace_player.apply(self.engine)
+
+    def set_send_rate(self, send_rate):
+        """Set client send rate (Hz) for both paddles"""
+        self.player_sender.set_send_rate(send_rate)
+        self.ai_sender.set_send_rate(send_rate)
+        if self.recorder is not None:
+            self.recorder.record_send_rate(send_rate)
+
+    def get_send_rate(self):
+        return self.player_sender.send_rate
+
+    def set_prediction(self, enabled):
+        """Turn client-side prediction of the player paddle on/off"""
+        self.prediction_enabled = enabled
+        self.predictor.reset()
+
+    def get_player_display_rect(self):
+        """Where the player sees their paddle: predicted if prediction is on"""
+        if self.prediction_enabled:
+            return self.predictor.display_rect()
+        return self.player_paddle.copy()
+
+    def set_ai(self, mode, difficulty):
+        """Pick the ai mode and an AI_DIFFICULTY level, before the match starts"""
+        self.ai_mode = mode
+        self.ai_difficulty = difficulty
+        level = AI_DIFFICULTY[difficulty]
+        self.engine.ai_reaction_time = AI_REACTION_TIME * level['reaction']
+        self.ai_track_speed = self.ai_paddle.speed * level['speed']
+        if mode == 'intercept':
+            self.ai_planner = InterceptAI(self.ai_paddle, self.ball, self.engine, self.streams.stream('ai_aim'), level)
+        else:
+            self.ai_planner = None
+
+    def set_scenario(self, preset_name):
+        """Apply a PRESET_MAP entry (values and impairment models) to the engine"""
+        data = PRESET_MAP[preset_name]
+        self.engine.set_parameters(data['latency'], data['loss'])
+        self.engine.set_models(data.get('loss_model'), data.get('jitter_model'))
+
+    def reset_match_stats(self):
+        """Clear rally and delivered-delay totals kept across points"""
+        self.points_played = 0
+        self.rally_hits = 0
+        self.player_delivered = 0
+        self.player_delay_ns = 0
+        self.ai_delivered = 0
+        self.ai_delay_ns = 0
+        # link drops of both flows at the start of the match (link counters are never reset)
+        self.queue_drops_start = self.get_queue_drops()
+
+    def get_queue_drops(self):
+        """Packets both flows' links dropped since they were set"""
+        engine = self.engine
+        return sum(link.dropped for link in (engine.player_link, engine.ai_link) if link is not None)
+
+    def reset_game(self):
+        """Reset scores, ball and engine for a fresh match"""
+        if self.recorder is not None:
+            self.recorder.record_reset()
+        self.reset_match_stats()
+        self.player_score = 0
+        self.ai_score = 0
+        self.ball.speed = BALL_SPEED
+        # reset engine
+        self.engine.reset_stats()
+        self.player_sender.reset()
+        self.ai_sender.reset()
+        self.predictor.reset()
+        if self.ai_planner is not None:
+            self.ai_planner.reset()
+        # reset state flags
+        self.is_game_over = False
+        self.is_game_running = True
+        self.game_paused = False
+        self.ball.reset()
+
+    def toggle_game_state(self):
+        """Toggle start/pause/reset"""
+        if self.is_game_over:
+            self.reset_game()
+        else:
+            # if paused, play; if playing, pause
+            if self.recorder is not None:
+                self.recorder.record_toggle()
+            self.is_game_running = not self.is_game_running
+
+    def queue_player_input(self, move_amount):
+        """Buffer a player move for the next send, ignored while not active"""
+        if self.is_active():
+            if self.recorder is not None:
+                self.recorder.record_input(move_amount)
+            self.player_sender.add(move_amount)
+            if self.prediction_enabled:
+                self.predictor.apply_local(move_amount)
+
+    def ai_movement(self):
+        """Implement a simple and perfect AI player"""
+        paddle = self.ai_paddle
+        # determine difference from ai paddle and ball
+        center_diff = self.ball.centery - paddle.centery
+        target_move = 0
+        # paddle speed is per SPEED_REFERENCE_RATE tick
+        speed = round(self.ai_track_speed * self.tick_scale)
+
+        # check if ball is below paddle center
+        if center_diff > 0:
+            # move down with a limit of the speed
+            target_move = min(speed, center_diff)
+        # check if ball is above paddle center
+        elif center_diff < 0:
+            # move up with a limit of the speed
+            target_move = -min(speed, abs(center_diff))
+
+        self.ai_sender.add(target_move)
+        self.ai_sender.flush()
+
+    def apply_lagged_actions(self):
+        """Apply actions released by engine after latency expires"""
+        self._release_time = self.clock.now_ns()
+        self.engine.release_due_actions(self._apply_packet)
+        if self.ai_planner is not None and self.ai_enabled:
+            self.ai_planner.follow(self.tick_scale)
+
+    def apply_packet(self, packet):
+        """Move a paddle by one released packet"""
+        paddle = packet.target
+        if self.recorder is not None:
+            self.recorder.record_release(packet, paddle is self.ai_paddle)
+
+        # delay the packet actually got, including frame quantization
+        if paddle is self.player_paddle:
+            self.player_delivered += 1
+            self.player_delay_ns += self._release_time - packet.time_sent
+            if self.prediction_enabled:
+                self.predictor.on_ack(packet.sequence)
+        else:
+            self.ai_delivered += 1
+            self.ai_delay_ns += self._release_time - packet.time_sent
+            # intercept plans are a height to head for, not a move
+            if self.ai_planner is not None:
+                self.ai_planner.on_packet(packet)
+                return
+
+        # apply move physically
+        paddle.y += packet.data
+
+        # boundary check to not go off screen
+        if paddle.top < CONTROL_PANEL_HEIGHT:
+            paddle.top = CONTROL_PANEL_HEIGHT
+        if paddle.bottom > TOTAL_HEIGHT:
+            paddle.bottom = TOTAL_HEIGHT
+
+    def check_collision(self, impacts):
+        """
+        Handle what the ball hit while moving (walls & paddles already bounced
+        it, see collision.py): rally hits and scoring. Returns list of events
+        """
+        ball = self.ball
+        events = []
+
+        # paddle collisions
+        for impact in impacts:
+            if impact == HIT_PADDLE:
+                self.rally_hits += 1
+                events.append(EVENT_PADDLE_HIT)
+                if self.ai_planner is not None:
+                    self.ai_planner.invalidate()
+
+        score_occurred = False
+        # scoring (left & right walls)
+        # ball passed left paddle, AI scores
+        if GOAL_LEFT in impacts:
+            self.ai_score += 1
+            score_occurred = True
+            events.append(EVENT_AI_SCORED)
+
+        # ball passed right paddle, player scores
+        if GOAL_RIGHT in impacts:
+            self.player_score += 1
+            score_occurred = True
+            events.append(EVENT_PLAYER_SCORED)
+
+            # increase speed if player scores
+            ball.increase_speed()
+
+        if score_occurred:
+            self.points_played += 1
+            if self.recorder is not None:
+                self.recorder.record_score(self.player_score, self.ai_score)
+            # activate pause
+            self.game_paused = True
+            self.game_paused_timer = self.clock.now_ns()
+            self.reset_stats_pending = True
+
+            # check for game over
+            if self.player_score >= MAX_SCORE or self.ai_score >= MAX_SCORE:
+                self.is_game_over = True
+                self.is_game_running = False
+                self.game_paused = False
+                self.matches_finished += 1
+                if self.player_score > self.ai_score:
+                    self.player_wins += 1
+                events.append(EVENT_GAME_OVER)
+            else:
+                ball.reset()
+                if self.ai_planner is not None:
+                    self.ai_planner.invalidate()
+
+        return events
+
+    def advance(self, time_ns, player_controller=None):
+        """
+        Run as many fixed ticks as fit up to time_ns (the caller's clock, e.g. real
+        time), so gameplay speed doesn't depend on how often this is called.
+        player_controller(sim) returns the player's move amount before every tick.
+        Leftover time sets render_alpha for interpolated_rects. Returns list of events
+        """
+        if not isinstance(self.clock, SimulatedClock):
+            return self.step()
+
+        target_ns = time_ns - self.lag_ns
+        events = []
+        substeps = 0
+        while self.clock.now_ns() + self.tick_ns <= target_ns:
+            if substeps == MAX_SUBSTEPS:
+                # far behind (slow frame, dragged window): fall behind real time instead of spiralling
+                self.lag_ns += target_ns - self.clock.now_ns()
+                target_ns = self.clock.now_ns()
+                break
+            if player_controller is not None:
+                move_amount = player_controller(self)
+                if move_amount:
+                    self.queue_player_input(move_amount)
+            events.extend(self.step(self.clock.now_ns() + self.tick_ns))
+            substeps += 1
+
+        self.render_alpha = (target_ns - self.clock.now_ns()) / self.tick_ns
+        return events
+
+    def get_positions(self):
+        """ball x/y, player y, ai y, predicted player y"""
+        return (self.ball.x, self.ball.y, self.player_paddle.y, self.ai_paddle.y, self.predictor.display_y)
+
+    def interpolated_rects(self):
+        """
+        Ball, player (as displayed) and ai rects between the last two ticks,
+        render_alpha of the way to the current ones
+        """
+        ball = self.ball.copy()
+        player = self.get_player_display_rect()
+        ai = self.ai_paddle.copy()
+        previous = self.previous_positions
+        if previous is None:
+            return ball, player, ai
+
+        alpha = self.render_alpha
+        current = self.get_positions()
+        def blend(i):
+            return round(previous[i] + (current[i] - previous[i]) * alpha)
+        ball.x = blend(0)
+        ball.y = blend(1)
+        player.y = blend(4) if self.prediction_enabled else blend(2)
+        ai.y = blend(3)
+        return ball, player, ai
+
+    def step(self, time_ns=None):
+        """
+        Advance the match by one frame. A simulated clock is moved forward
+        tick_ns, or to time_ns when the caller follows another clock (the
+        game passes real time). A real clock is left alone. Returns list of events
+        """
+        if isinstance(self.clock, SimulatedClock):
+            if time_ns is None:
+                self.clock.advance_ns(self.tick_ns)
+            else:
+                self.clock.advance_to(time_ns)
+        self.frame += 1
+        self.in_step = True
+        self.previous_positions = self.get_positions()
+        if self.recorder is not None:
+            self.recorder.record_step(self.clock.now_ns())
+        events = []
+
+        # follow the trace with simulated time
+        if self.trace_player is not None:
+            self.trace_player.update((self.clock.now_ns() - self.trace_start_ns) // NS_PER_MS)
+            self.trace_player.apply(self.engine)
+
+        # player inputs were made during the frame that just ended
+        move_amount = self.player_sender.pending_move
+        sequence = self.player_sender.flush()
+        if sequence is not None and self.prediction_enabled:
+            self.predictor.on_send(sequence, move_amount)
+
+        # pause between points
+        if self.game_paused:
+            if self.clock.now_ns() - self.game_paused_timer > PAUSE_DURATION_NS:
+                self.game_paused = False
+
+                # reset stats
+                if self.reset_stats_pending:
+                    self.engine.reset_stats()
+                    self.player_sender.reset()
+                    self.ai_sender.reset()
+                    self.predictor.reset()
+                    if self.ai_planner is not None:
+                        self.ai_planner.reset()
+                    self.reset_stats_pending = False
+
+        # only if started and not paused between scores
+        if self.is_game_running and not self.game_paused:
+            profiler = self.profiler
+            stage_start = profiler.start()
+            impacts = self.ball.move(self.player_paddle, self.ai_paddle, self.tick_scale)
+            events.extend(self.check_collision(impacts))
+            stage_start = profiler.lap('physics', stage_start)
+            if self.ai_enabled:
+                if self.ai_planner is None:
+                    self.ai_movement()
+                else:
+                    self.ai_planner.plan()
+            stage_start = profiler.lap('ai', stage_start)
+            self.apply_lagged_actions()
+            profiler.lap('lagged actions', stage_start)
+
+        if self.prediction_enabled:
+            self.predictor.reconcile(self.player_sender.pending_move)
+
+        # serve or restart: don't draw the ball sliding back to the center
+        if EVENT_AI_SCORED in events or EVENT_PLAYER_SCORED in events:
+            self.previous_positions = self.get_positions()
+
+        self.in_step = False
+        return events
+
+    def skip_idle(self):
+        """
+        Jump a simulated clock over the pause between points, where nothing moves.
+        Stops one frame short so the next step() ends the pause on the same
+        frame boundary as stepping through it would.
+        """
+        if not self.game_paused or not isinstance(self.clock, SimulatedClock):
+            return
+        remaining_ns = self.game_paused_timer + PAUSE_DURATION_NS - self.clock.now_ns()
+        idle_frames = remaining_ns // self.tick_ns
+        if idle_frames > 0:
+            self.clock.advance_ns(idle_frames * self.tick_ns)
+
+    def run_match(self, player_controller=None, max_time_ms=None):
+        """
+        Play a whole match as fast as possible.
+        player_controller(sim) returns a move amount for the player paddle (0 for none).
+        Returns dict of match results.
+        """
+        self.reset_game()
+        start_ns = self.clock.now_ns()
+        max_time_ns = max_time_ms * NS_PER_MS if max_time_ms is not None else None
+
+        while not self.is_game_over:
+            if max_time_ns is not None and self.clock.now_ns() - start_ns >= max_time_ns:
+                break
+            self.skip_idle()
+            if player_controller is not None:
+                move_amount = player_controller(self)
+                if move_amount:
+                    self.queue_player_input(move_amount)
+            self.step()
+
+        return {
+            'player_score' : self.player_score,
+            'ai_score' : self.ai_score,
+            'player_won' : self.player_score > self.ai_score,
+            'finished' : self.is_game_over,
+            'duration_ms' : (self.clock.now_ns() - start_ns) // NS_PER_MS,
+            'points' : self.points_played,
+            'rally_hits' : self.rally_hits,
+            'player_delivered' : self.player_delivered,
+            'player_delay_ms' : self.player_delay_ns / self.player_delivered / NS_PER_MS if self.player_delivered else 0.0,
+            'ai_delivered' : self.ai_delivered,
+            'ai_delay_ms' : self.ai_delay_ns / self.ai_delivered / NS_PER_MS if self.ai_delivered else 0.0,
+            'queue_drops' : self.get_queue_drops() - self.queue_drops_start
+        }
+
+
+def tracking_player(sim):
+    """
+    Bot for the player paddle in headless matches.
+    Holds the arrow key towards the ball, so its inputs go through the engine like a human's.
+    """
+    speed = round(PADDLE_SPEED * sim.tick_scale)
+    center_diff = sim.ball.centery - sim.player_paddle.centery
+    if center_diff > speed:
+        return speed
+    if center_diff < -speed:
+        return -speed
+    return 0
@@ -0,0 +1,209 @@
+"""
+Parameter sweep over latency x loss (x link rate) grids and every PRESET_MAP entry.
+Runs headless matches across a process pool and appends one row per
+finished cell to a CSV. Rows are keyed by a hash of the game config,
+cell parameters and seed, so rerunning (or extending) a sweep with the
+same output file only computes the cells that are missing.
+
+usage: python sweep.py --latency 0:500:50 --loss 0:100:10 --presets --matches 20
+       python sweep.py --latency 50 --loss 0 --link-rate 8,16,32 --queue codel
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+from multiprocessing import Pool
+
+from config import *
+from simulation import Simulation, tracking_player
+from metrics_exporter import MetricsExporter, SweepSnapshot
+
+# a match that never ends (endless rally) is cut off after this much simulated time
+MAX_MATCH_TIME_MS = 10 * 60 * 1000
+
+RESULT_FIELDS = [
+    'cell_key', 'label', 'latency', 'loss', 'link_rate', 'link_buffer', 'queue', 'send_rate', 'tick_rate', 'ai_mode', 'ai_difficulty', 'seed',
+    'matches', 'player_win_rate', 'mean_player_score', 'mean_ai_score', 'mean_rally_hits',
+    'mean_duration_ms', 'player_delay_ms', 'ai_delay_ms', 'mean_queue_drops', 'unfinished'
+]
+
+def parse_range(text):
+    """'start:stop:step' (stop inclusive) or a comma list -> list of floats"""
+    if ':' in text:
+        start, stop, step = (float(part) for part in text.split(':'))
+        values = []
+        value = start
+        while value <= stop + 1e-9:
+            values.append(round(value, 2))
+            value += step
+        return values
+    return [float(part) for part in text.split(',')]
+
+def cell_key(cell):
+    """Hash of everything that decides a cell's outcome"""
+    game_config = {
+        'FPS' : FPS, 'MAX_SCORE' : MAX_SCORE, 'AI_REACTION_TIME' : AI_REACTION_TIME,
+        'PADDLE_SPEED' : PADDLE_SPEED, 'BALL_SPEED' : BALL_SPEED, 'SPEED_REFERENCE_RATE' : SPEED_REFERENCE_RATE,
+        'BALL_SPEED_INCREMENT' : BALL_SPEED_INCREMENT, 'PAUSE_DURATION' : PAUSE_DURATION,
+        'JITTER_MAP' : sorted(JITTER_MAP.items()), 'MAX_MATCH_TIME_MS' : MAX_MATCH_TIME_MS,
+        'AI_DIFFICULTY' : AI_DIFFICULTY, 'AI_PLAN_TOLERANCE' : AI_PLAN_TOLERANCE,
+        'LINK_PACKET_BYTES' : LINK_PACKET_BYTES
+    }
+    params = {key : cell.get(key) for key in ('latency', 'loss', 'loss_model', 'jitter_model', 'link', 'send_rate', 'tick_rate',
+                                              'ai_mode', 'ai_difficulty', 'seed', 'matches')}
+    blob = json.dumps([game_config, params], sort_keys=True)
+    return hashlib.sha1(blob.encode()).hexdigest()[:16]
+
+def build_cells(latencies, losses, presets, matches, seed, send_rate=DEFAULT_SEND_RATE, tick_rate=SIMULATION_RATE,
+                ai_mode=DEFAULT_AI_MODE, ai_difficulty=DEFAULT_AI_DIFFICULTY,
+                link_rates=(None,), link_buffer=LINK_BUFFER_PACKETS, queue=DEFAULT_QUEUE_DISCIPLINE):
+    """Grid cells followed by one cell per preset (and link rate, None for no link)"""
+    links = [None if rate is None else {'rate' : rate, 'buffer' : link_buffer, 'queue' : (queue, {})}
+             for rate in link_rates]
+    cells = []
+    for link in links:
+        for latency in latencies:
+            for loss in losses:
+                cells.append({'label' : 'grid', 'latency' : latency, 'loss' : loss, 'link' : link})
+        if presets:
+            for name, data in PRESET_MAP.items():
+                cells.append({'label' : name, 'latency' : data['latency'], 'loss' : data['loss'], 'link' : link,
+                              'loss_model' : data.get('loss_model'), 'jitter_model' : data.get('jitter_model')})
+
+    for cell in cells:
+        cell['send_rate'] = send_rate
+        cell['tick_rate'] = tick_rate
+        cell['ai_mode'] = ai_mode
+        cell['ai_difficulty'] = ai_difficulty
+        cell['seed'] = seed
+        cell['matches'] = matches
+        cell['cell_key'] = cell_key(cell)
+    return cells
+
+def run_cell(cell):
+    """Play all matches of one cell and aggregate them into a result row"""
+    results = []
+    for match_index in range(cell['matches']):
+        # each match gets its own stream of the sweep seed
+        sim = Simulation(seed=[cell['seed'], match_index], send_rate=cell['send_rate'], tick_rate=cell['tick_rate'])
+        sim.set_ai(cell['ai_mode'], cell['ai_difficulty'])
+        sim.set_parameters(cell['latency'], cell['loss'])
+        sim.engine.set_models(cell.get('loss_model'), cell.get('jitter_model'))
+        sim.engine.set_link(cell['link'])
+        results.append(sim.run_match(tracking_player, max_time_ms=MAX_MATCH_TIME_MS))
+
+    count = len(results)
+    points = sum(r['points'] for r in results)
+    player_delivered = sum(r['player_delivered'] for r in results)
+    ai_delivered = sum(r['ai_delivered'] for r in results)
+    link = cell['link']
+
+    return {
+        'cell_key' : cell['cell_key'],
+        'label' : cell['label'],
+        'latency' : cell['latency'],
+        'loss' : cell['loss'],
+        'link_rate' : link['rate'] if link else '',
+        'link_buffer' : link['buffer'] if link else '',
+        'queue' : link['queue'][0] if link else '',
+        'send_rate' : cell['send_rate'],
+        'tick_rate' : cell['tick_rate'],
+        'ai_mode' : cell['ai_mode'],
+        'ai_difficulty' : cell['ai_difficulty'],
+        'seed' : cell['seed'],
+        'matches' : count,
+        'player_win_rate' : sum(r['player_won'] for r in results) / count,
+        'mean_player_score' : sum(r['player_score'] for r in results) / count,
+        'mean_ai_score' : sum(r['ai_score'] for r in results) / count,
+        'mean_rally_hits' : sum(r['rally_hits'] for r in results) / points if points else 0.0,
+        'mean_duration_ms' : sum(r['duration_ms'] for r in results) / count,
+        # weighted by packets so matches with more traffic count more
+        'player_delay_ms' : sum(r['player_delay_ms'] * r['player_delivered'] for r in results) / player_delivered if player_delivered else 0.0,
+        'ai_delay_ms' : sum(r['ai_delay_ms'] * r['ai_delivered'] for r in results) / ai_delivered if ai_delivered else 0.0,
+        'mean_queue_drops' : sum(r['queue_drops'] for r in results) / count,
+        'unfinished' : sum(not r['finished'] for r in results)
+    }
+
+def load_finished_keys(path):
+    """cell_keys already in the results file"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return set()
+    with open(path, newline='') as results_file:
+        reader = csv.DictReader(results_file)
+        if reader.fieldnames != RESULT_FIELDS:
+            raise ValueError(f"{path} has different columns than this sweep writes, use another --out")
+        return {row['cell_key'] for row in reader}
+
+def run_sweep(cells, out_path, workers=None, metrics=None):
+    """
+    Compute missing cells in parallel, appending each row as soon as it finishes.
+    Progress is published to metrics (a MetricsExporter) after every cell
+    """
+    finished = load_finished_keys(out_path)
+    pending = [cell for cell in cells if cell['cell_key'] not in finished]
+    cached = len(cells) - len(pending)
+    print(f"{len(cells)} cells, {cached} cached, {len(pending)} to run")
+    rows = []
+    if metrics is not None:
+        metrics.publish(SweepSnapshot(len(cells), cached, rows))
+    if not pending:
+        return 0
+
+    write_header = not os.path.exists(out_path) or os.path.getsize(out_path) == 0
+    with open(out_path, 'a', newline='') as results_file:
+        writer = csv.DictWriter(results_file, fieldnames=RESULT_FIELDS)
+        if write_header:
+            writer.writeheader()
+
+        with Pool(workers) as pool:
+            for done, row in enumerate(pool.imap_unordered(run_cell, pending), start=1):
+                writer.writerow(row)
+                # flush per cell so an interrupted sweep keeps its finished cells
+                results_file.flush()
+                rows.append(row)
+                if metrics is not None:
+                    metrics.publish(SweepSnapshot(len(cells), cached, rows))
+                print(f"[{done}/{len(pending)}] {row['label']} latency={row['latency']} loss={row['loss']} "
+                      f"win rate={row['player_win_rate']:.2f}")
+    return len(pending)
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep headless matches over latency x loss")
+    parser.add_argument('--latency', default='0:500:50', help="ms, 'start:stop:step' or comma list")
+    parser.add_argument('--loss', default='0:100:10', help="percent, 'start:stop:step' or comma list")
+    parser.add_argument('--presets', action='store_true', help="also run every PRESET_MAP entry")
+    parser.add_argument('--matches', type=int, default=20, help="matches per cell")
+    parser.add_argument('--link-rate', help="kbit/s of a link in front of each flow, 'start:stop:step' or comma list "
+                                           "(default: unlimited)")
+    parser.add_argument('--buffer', type=int, default=LINK_BUFFER_PACKETS, help="link buffer in packets")
+    parser.add_argument('--queue', choices=QUEUE_DISCIPLINES, default=DEFAULT_QUEUE_DISCIPLINE,
+                        help="link queue discipline")
+    parser.add_argument('--send-rate', type=int, default=DEFAULT_SEND_RATE, help="client send rate (Hz)")
+    parser.add_argument('--tick-rate', type=int, default=SIMULATION_RATE,
+                        help="simulation steps per simulated second, lower is faster (collisions are swept)")
+    parser.add_argument('--ai', choices=AI_MODES, default=DEFAULT_AI_MODE,
+                        help="ai paddle mode, intercept plans once per trajectory and sends far fewer packets")
+    parser.add_argument('--difficulty', choices=list(AI_DIFFICULTY), default=DEFAULT_AI_DIFFICULTY)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: cpu count)")
+    parser.add_argument('--out', default='sweep_results.csv')
+    parser.add_argument('--metrics-port', type=int, help="serve progress as prometheus metrics on localhost")
+    parser.add_argument('--metrics-file', help="append progress as json lines every second")
+    args = parser.parse_args()
+
+    cells = build_cells(parse_range(args.latency), parse_range(args.loss), args.presets, args.matches,
+                        args.seed, args.send_rate, args.tick_rate, args.ai, args.difficulty,
+                        parse_range(args.link_rate) if args.link_rate else (None,), args.buffer, args.queue)
+    metrics = None
+    if args.metrics_port is not None or args.metrics_file is not None:
+        metrics = MetricsExporter(args.metrics_port, args.metrics_file)
+        metrics.start()
+    try:
+        run_sweep(cells, args.out, args.workers, metrics)
+    finally:
+        if metrics is not None:
+            metrics.close()
+
+if __name__ == "__main__":
+    main()
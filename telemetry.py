@@ -0,0 +1,177 @@
+"""
+Delivered-delay telemetry per flow (player / ai), in constant memory.
+
+DelayHistogram is an HDR-style log-linear histogram: exact up to
+2 * 2**TELEMETRY_PRECISION_BITS us, then every power of two is split in
+2**TELEMETRY_PRECISION_BITS buckets, so any percentile is within ~3% of the
+true value however many packets were seen. RingSeries keeps the last
+TELEMETRY_HISTORY interval samples (mean delay, loss %) for sparklines.
+"""
+import math
+from array import array
+from config import TELEMETRY_PRECISION_BITS, TELEMETRY_MAX_DELAY, TELEMETRY_INTERVAL, TELEMETRY_HISTORY
+from clock import NS_PER_MS
+
+SUB_BUCKETS = 1 << TELEMETRY_PRECISION_BITS
+PRECISION_SHIFT = TELEMETRY_PRECISION_BITS + 1
+# delays are bucketed in whole us, anything longer goes in the last bucket
+MAX_DELAY_US = TELEMETRY_MAX_DELAY * 1000
+
+def bucket_index(delay_us):
+    """Histogram bucket of a delay in us"""
+    shift = delay_us.bit_length() - PRECISION_SHIFT
+    if shift <= 0:
+        return delay_us
+    return SUB_BUCKETS * shift + (delay_us >> shift)
+
+def bucket_bounds(index):
+    """(lowest us, width us) of a bucket"""
+    shift = index // SUB_BUCKETS - 1
+    if shift <= 0:
+        return index, 1
+    return (index - SUB_BUCKETS * shift) << shift, 1 << shift
+
+BUCKET_COUNT = bucket_index(MAX_DELAY_US) + 1
+
+class DelayHistogram:
+    def __init__(self):
+        self.counts = array('q', bytes(8 * BUCKET_COUNT))
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def copy(self):
+        """Independent histogram with the same counts (the copy is a memcpy of the buckets)"""
+        other = DelayHistogram.__new__(DelayHistogram)
+        other.counts = self.counts[:]
+        other.count = self.count
+        other.total_ns = self.total_ns
+        other.max_ns = self.max_ns
+        return other
+
+    def snapshot(self):
+        """Copy of the counts, percentiles_ms(base=...) then covers only what came after"""
+        return self.counts[:], self.count
+
+    def add(self, delay_ns):
+        # runs for every released packet: bucket_index inlined
+        delay_us = delay_ns // 1000
+        if delay_us > MAX_DELAY_US:
+            delay_us = MAX_DELAY_US
+        elif delay_us < 0:
+            delay_us = 0
+        shift = delay_us.bit_length() - PRECISION_SHIFT
+        self.counts[delay_us if shift <= 0 else SUB_BUCKETS * shift + (delay_us >> shift)] += 1
+        self.count += 1
+        self.total_ns += delay_ns
+        if delay_ns > self.max_ns:
+            self.max_ns = delay_ns
+
+    def percentiles_ms(self, *fractions, base=None):
+        """
+        Delay percentiles (ms), e.g. percentiles_ms(0.5, 0.99), in one pass over the
+        buckets. With a snapshot() as base only delays added since then count
+        """
+        counts = self.counts
+        count = self.count
+        if base is not None:
+            base_counts, base_count = base
+            counts = [now - before for now, before in zip(counts, base_counts)]
+            count -= base_count
+        if count == 0:
+            return [0.0 for _ in fractions]
+        # rank of every fraction, walked in increasing order
+        ranks = sorted((max(1, math.ceil(fraction * count)), i) for i, fraction in enumerate(fractions))
+        results = [0.0] * len(fractions)
+        next_rank = 0
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            if not bucket_count:
+                continue
+            seen += bucket_count
+            while next_rank < len(ranks) and ranks[next_rank][0] <= seen:
+                low, width = bucket_bounds(index)
+                # middle of the bucket
+                results[ranks[next_rank][1]] = (low + (width - 1) / 2) / 1000
+                next_rank += 1
+            if next_rank == len(ranks):
+                break
+        return results
+
+    def mean_ms(self):
+        return self.total_ns / self.count / NS_PER_MS if self.count else 0.0
+
+class RingSeries:
+    """Last `size` values, nan where there was nothing to measure"""
+    def __init__(self, size=TELEMETRY_HISTORY):
+        self.size = size
+        self.samples = array('d', [math.nan] * size)
+        self.index = 0
+        # values ever appended, changes whenever the series does
+        self.appended = 0
+
+    def append(self, value):
+        self.samples[self.index] = value
+        self.index += 1
+        if self.index == self.size:
+            self.index = 0
+        self.appended += 1
+
+    def values(self):
+        """Oldest first"""
+        return self.samples[self.index:].tolist() + self.samples[:self.index].tolist()
+
+class FlowTelemetry:
+    """
+    Delay every delivered packet of one flow got from send to release, and
+    its loss. The session histogram and the series cover everything since
+    the flow was created and are never cleared. The current point is a
+    snapshot of the session histogram taken when it started, restarted with
+    the engine's other per-point counters, so each packet is counted once.
+    """
+    def __init__(self, interval_ms=TELEMETRY_INTERVAL, history=TELEMETRY_HISTORY):
+        self.session = DelayHistogram()
+        self.point_start = self.session.snapshot()
+        # one sample per interval: mean delay (ms) and loss (%)
+        self.delay_series = RingSeries(history)
+        self.loss_series = RingSeries(history)
+        self.interval_ns = interval_ms * NS_PER_MS
+        self.next_sample_ns = None
+        self.sent = 0
+        self.lost = 0
+        # session totals at the start of the interval
+        self._interval_start = (0, 0, 0, 0)
+
+    def start_point(self):
+        """Per-point percentiles count from here"""
+        self.point_start = self.session.snapshot()
+
+    def point_percentiles_ms(self, *fractions):
+        return self.session.percentiles_ms(*fractions, base=self.point_start)
+
+    def on_sent(self, lost):
+        self.sent += 1
+        if lost:
+            self.lost += 1
+
+    def sample(self, time_now):
+        """Close the interval if it is over, intervals skipped entirely (paused game) are gaps"""
+        if self.next_sample_ns is None:
+            self.next_sample_ns = time_now + self.interval_ns
+            return
+        if time_now < self.next_sample_ns:
+            return
+
+        session = self.session
+        start_count, start_total_ns, start_sent, start_lost = self._interval_start
+        delivered = session.count - start_count
+        sent = self.sent - start_sent
+        self.delay_series.append((session.total_ns - start_total_ns) / delivered / NS_PER_MS if delivered else math.nan)
+        self.loss_series.append((self.lost - start_lost) / sent * 100 if sent else math.nan)
+        self._interval_start = (session.count, session.total_ns, self.sent, self.lost)
+
+        missed = (time_now - self.next_sample_ns) // self.interval_ns
+        for _ in range(min(missed, self.delay_series.size)):
+            self.delay_series.append(math.nan)
+            self.loss_series.append(math.nan)
+        self.next_sample_ns += (missed + 1) * self.interval_ns
@@ -0,0 +1,18 @@
+import numpy as np
+
+from batch_env import BatchPong, preset_conditions
+
+def play(seed, matches=64):
+    return BatchPong(matches, preset_conditions(matches)[1], seed=seed).run(max_time_ms=20_000)
+
+def test_same_seed_same_results():
+    first = play(5)
+    second = play(5)
+    assert first.keys() == second.keys()
+    for key in first:
+        np.testing.assert_array_equal(first[key], second[key], err_msg=key)
+
+def test_other_seed_other_results():
+    first = play(5)
+    other = play(6)
+    assert not all(np.array_equal(first[key], other[key]) for key in first)
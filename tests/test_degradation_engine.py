@@ -0,0 +1,58 @@
+from clock import SimulatedClock, NS_PER_MS
+from degradation_engine import DegradationEngine
+from sampling import RandomStreams
+
+def make_engine(latency, max_jitter, allow_reordering=True):
+    clock = SimulatedClock()
+    player, ai = object(), object()
+    engine = DegradationEngine(player, ai, clock=clock, allow_reordering=allow_reordering, streams=RandomStreams(7))
+    engine.set_parameters(latency, 0.0, max_jitter)
+    return engine, clock, player, ai
+
+def send_and_release(engine, clock, paddle, packets, step_ms=1):
+    """Send packets numbered 0.. every step_ms, then release them all. Returns released packets' (number, time_due)"""
+    for number in range(packets):
+        engine.queue_input(paddle, number)
+        clock.advance_ms(step_ms)
+    clock.advance_ms(10_000)
+    released = []
+    engine.release_due_actions(lambda packet: released.append((packet.data, packet.time_due)))
+    return released
+
+def test_releases_by_due_time():
+    engine, clock, player, ai = make_engine(100, 80)
+    released = send_and_release(engine, clock, player, 500)
+    assert len(released) == 500
+    due_times = [time_due for number, time_due in released]
+    assert due_times == sorted(due_times)
+
+def test_equal_due_times_release_in_send_order():
+    engine, clock, player, ai = make_engine(100, 0)
+    released = send_and_release(engine, clock, player, 50, step_ms=0)
+    assert {time_due for number, time_due in released} == {100 * NS_PER_MS}
+    assert [number for number, time_due in released] == list(range(50))
+
+def test_only_due_packets_release():
+    engine, clock, player, ai = make_engine(100, 0)
+    engine.queue_input(player, 1)
+    clock.advance_ms(99)
+    assert engine.get_due_actions() == []
+    clock.advance_ms(1)
+    assert [action['data'] for action in engine.get_due_actions()] == [1]
+
+def test_jitter_reorders_packets():
+    engine, clock, player, ai = make_engine(100, 80)
+    numbers = [number for number, time_due in send_and_release(engine, clock, player, 500)]
+    assert numbers != sorted(numbers)
+
+def test_no_reordering_keeps_send_order_per_paddle():
+    engine, clock, player, ai = make_engine(100, 80, allow_reordering=False)
+    for number in range(500):
+        engine.queue_input(player if number % 2 else ai, number)
+        clock.advance_ms(1)
+    clock.advance_ms(10_000)
+    released = engine.get_due_actions()
+    for paddle in (player, ai):
+        numbers = [action['data'] for action in released if action['target'] is paddle]
+        assert len(numbers) == 250
+        assert numbers == sorted(numbers)
@@ -0,0 +1,48 @@
+import pytest
+
+from clock import NS_PER_MS
+from link_model import BottleneckLink
+from sampling import RandomStreams
+
+# 35 byte packets at 12 kbit/s leave every ~23.3 ms
+RATE = 12
+BUFFER = 20
+
+def offer(queue, interval_ms, packets=1000):
+    """Packets arriving every interval_ms. Returns the link and each delivered packet's delay (ms)"""
+    link = BottleneckLink(RATE, buffer=BUFFER, queue=(queue, {}))
+    stream = RandomStreams(1).stream('queue')
+    delays = []
+    for i in range(packets):
+        time_ns = i * interval_ms * NS_PER_MS
+        departure_ns = link.enqueue(time_ns, stream)
+        if departure_ns is not None:
+            delays.append((departure_ns - time_ns) / NS_PER_MS)
+    return link, delays
+
+@pytest.mark.parametrize('queue', ['drop_tail', 'red', 'codel'])
+def test_no_drops_below_the_rate(queue):
+    link, delays = offer(queue, 30)
+    assert link.dropped == 0
+    assert len(delays) == 1000
+
+@pytest.mark.parametrize('queue, dropped', [('drop_tail', 551), ('red', 556), ('codel', 569)])
+def test_drop_counts_when_overloaded(queue, dropped):
+    link, delays = offer(queue, 10)
+    assert link.arrived == 1000
+    assert link.dropped == dropped
+    assert len(delays) == 1000 - dropped
+
+def test_drop_tail_drops_only_when_full():
+    link = BottleneckLink(RATE, buffer=BUFFER, queue=('drop_tail', {}))
+    stream = RandomStreams(1).stream('queue')
+    for i in range(1000):
+        time_ns = i * 10 * NS_PER_MS
+        backlog = link.backlog(time_ns)
+        assert (link.enqueue(time_ns, stream) is None) == (backlog >= BUFFER)
+
+def test_codel_keeps_the_standing_queue_short():
+    drop_tail_delays = offer('drop_tail', 10)[1]
+    codel_delays = offer('codel', 10)[1]
+    late = slice(-100, None)
+    assert sum(codel_delays[late]) < sum(drop_tail_delays[late]) / 4
@@ -0,0 +1,50 @@
+import pytest
+
+from network_trace import BinaryTrace, CsvTrace, convert_csv_to_binary
+
+SAMPLES = 50
+STEP_MS = 100
+STRIDE = 4
+
+@pytest.fixture(params=['csv', 'binary'])
+def trace(request, tmp_path):
+    """Samples every STEP_MS from 1000 ms, rtt tells them apart"""
+    csv_path = tmp_path / 'trace.csv'
+    with open(csv_path, 'w') as csv_file:
+        csv_file.write('timestamp_ms,rtt_ms,loss_percent,jitter_ms\n')
+        for i in range(SAMPLES):
+            csv_file.write(f'{1000 + i * STEP_MS},{i},0.5,2\n')
+    if request.param == 'csv':
+        trace = CsvTrace(csv_path, stride=STRIDE)
+    else:
+        binary_path = tmp_path / 'trace.ndtr'
+        convert_csv_to_binary(csv_path, binary_path)
+        trace = BinaryTrace(binary_path)
+    yield trace
+    trace.close()
+
+def test_bounds(trace):
+    assert trace.count == SAMPLES
+    assert trace.start_ms == 1000
+    assert trace.end_ms == 1000 + (SAMPLES - 1) * STEP_MS
+
+@pytest.mark.parametrize('time_ms, index', [
+    (0, 0),                                   # before the first sample
+    (1000, 0),                                # on the first sample
+    (1099, 0),                                # just before the second
+    (1100, 1),
+    (1000 + STRIDE * STEP_MS - 1, STRIDE - 1),   # last sample of the first csv index block
+    (1000 + STRIDE * STEP_MS, STRIDE),           # first sample of the next block
+    (1000 + (SAMPLES - 1) * STEP_MS, SAMPLES - 1),  # on the last sample
+    (10 ** 9, SAMPLES - 1),                   # past the end
+])
+def test_seek_gives_sample_in_effect(trace, time_ms, index):
+    samples = list(trace.iter_from(time_ms))
+    assert [sample.rtt_ms for sample in samples] == list(range(index, SAMPLES))
+    assert samples[0].timestamp_ms == 1000 + index * STEP_MS
+
+def test_csv_rejects_backwards_timestamps(tmp_path):
+    csv_path = tmp_path / 'backwards.csv'
+    csv_path.write_text('timestamp_ms,rtt_ms,loss_percent,jitter_ms\n0,1,0,0\n200,1,0,0\n100,1,0,0\n')
+    with pytest.raises(ValueError, match='row 3'):
+        CsvTrace(csv_path)
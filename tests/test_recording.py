@@ -0,0 +1,46 @@
+import pytest
+
+from recording import (MatchRecorder, MatchReplayer, ReplayMismatch, read_records,
+                       RECORDING_MAGIC, RECORD_HEADER, RELEASE, RELEASE_RECORD)
+from simulation import Simulation, tracking_player
+
+def record_match(path, frames=3000):
+    sim = Simulation(seed=3)
+    sim.set_scenario('Wi-Fi')
+    recorder = MatchRecorder(path)
+    recorder.attach(sim)
+    sim.toggle_game_state()
+    for _ in range(frames):
+        if sim.is_game_over:
+            sim.toggle_game_state()
+        move = tracking_player(sim)
+        if move:
+            sim.queue_player_input(move)
+        sim.step()
+    recorder.close()
+    return sim
+
+def test_replay_reproduces_the_match(tmp_path):
+    path = tmp_path / 'match.ndrec'
+    sim = record_match(path)
+    result = MatchReplayer(path).run()
+    assert result['frames'] == sim.frame
+    assert (result['player_score'], result['ai_score']) == (sim.player_score, sim.ai_score)
+    assert result['checked'] > 0
+
+def test_tampered_release_raises(tmp_path):
+    path = tmp_path / 'match.ndrec'
+    record_match(path)
+    tampered_path = tmp_path / 'tampered.ndrec'
+    tampered = False
+    with open(tampered_path, 'wb') as tampered_file:
+        tampered_file.write(RECORDING_MAGIC)
+        for record_type, payload in read_records(path):
+            if record_type == RELEASE and not tampered:
+                frame, is_ai, data, time_sent, time_due = RELEASE_RECORD.unpack(payload)
+                payload = RELEASE_RECORD.pack(frame, is_ai, data + 1, time_sent, time_due)
+                tampered = True
+            tampered_file.write(RECORD_HEADER.pack(len(payload), record_type) + payload)
+    assert tampered
+    with pytest.raises(ReplayMismatch):
+        MatchReplayer(tampered_path).run()
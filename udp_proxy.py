@@ -0,0 +1,358 @@
+"""
+Userspace netem for loopback UDP: a relay that applies the game's latency,
+jitter and loss to any datagram traffic passing through it.
+
+Clients send to the proxy's port instead of the service, every client gets
+its own upstream socket so replies find their way back. Both directions
+are impaired independently by the same per-packet step as
+DegradationEngine (impairment.ImpairedFlow), latency is one way so the round trip is
+twice the latency.
+
+Packets wait in one min-heap per direction. A single timer is armed for the
+earliest due packet, and each timer callback releases everything due up to
+PROXY_TIMER_SLACK later, so timer handling is per batch, not per packet.
+
+run: python udp_proxy.py --target 127.0.0.1:9000 --preset Sat
+"""
+import argparse
+import asyncio
+import heapq
+import ipaddress
+import socket
+from itertools import count
+
+from config import *
+from clock import MonotonicClock, NS_PER_MS
+from sampling import RandomStreams
+from packet_store import PacketPool
+from impairment import ImpairedFlow, max_jitter_for
+
+UPSTREAM = 'upstream'      # client -> service
+DOWNSTREAM = 'downstream'  # service -> client
+
+TIMER_SLACK_NS = int(PROXY_TIMER_SLACK * NS_PER_MS)
+
+class ImpairedLink:
+    """One direction through the proxy: loss, delay and the release heap"""
+    def __init__(self, name, streams, pool):
+        self.name = name
+        self.pool = pool
+        # the same per-packet loss & delay step as DegradationEngine
+        self.flow = ImpairedFlow(streams.stream(f'{name}_loss'), streams.stream(f'{name}_jitter'))
+        # min-heap of (time_due, sequence, Packet) entries, ties in arrival order
+        self.queue = []
+        self._sequence = count()
+        self.configure(0, 0.0)
+        self.reset_stats()
+
+    def configure(self, latency, loss_percent, max_jitter=None, loss_model=None, jitter_model=None):
+        """Same parameters as DegradationEngine.set_parameters / set_models"""
+        self.flow.set_models(loss_model, jitter_model)
+        if max_jitter is None:
+            max_jitter = max_jitter_for(latency)
+        self.flow.configure(latency, loss_percent, max_jitter)
+
+    def submit(self, target, data, time_now):
+        """Queue a datagram, returns its due time (ns) or None if it was lost"""
+        self.sent += 1
+        if self.flow.is_lost():
+            self.lost += 1
+            return None
+
+        time_due = self.flow.due_time(time_now)
+        self.pool.push(self.queue, target, data, time_now, time_due, next(self._sequence))
+        return time_due
+
+    def release_due(self, time_now, send, slack=0):
+        """
+        Call send(target, data) for every packet due by time_now + slack.
+        Delay is counted up to time_now, when the packet actually goes out. Returns number released
+        """
+        queue = self.queue
+        pool = self.pool
+        released = 0
+        delay_total = 0
+        time_limit = time_now + slack
+        while queue and queue[0][0] <= time_limit:
+            packet = heapq.heappop(queue)[2]
+            send(packet.target, packet.data)
+            delay = time_now - packet.time_sent
+            delay_total += delay
+            if delay > self.delay_max_ns:
+                self.delay_max_ns = delay
+            pool.release(packet)
+            released += 1
+        self.delivered += released
+        self.delay_total_ns += delay_total
+        return released
+
+    def next_due_time(self):
+        return self.queue[0][0] if self.queue else None
+
+    def get_stats(self):
+        """Like DegradationEngine.get_stats, plus delay of delivered packets"""
+        total = self.sent
+        lost = self.lost
+        return {
+            'sent' : total,
+            'received' : total - lost,
+            'lost' : lost,
+            'loss rate' : (lost / total) * 100 if total > 0 else 0.0,
+            'in flight' : len(self.queue),
+            'mean delay' : self.delay_total_ns / self.delivered / NS_PER_MS if self.delivered else 0.0,
+            'max delay' : self.delay_max_ns / NS_PER_MS
+        }
+
+    def reset_stats(self):
+        self.sent = 0
+        self.lost = 0
+        self.delivered = 0
+        self.delay_total_ns = 0
+        self.delay_max_ns = 0
+
+
+class UpstreamSession:
+    """Socket towards the service for one client, replies go back through the downstream link"""
+    def __init__(self, proxy, client_address):
+        self.proxy = proxy
+        self.client_address = client_address
+        self.sock = open_socket()
+        self.sock.connect(proxy.target_address)
+        # last datagram in either direction, ms
+        self.last_seen = 0
+
+    def read_ready(self):
+        proxy = self.proxy
+        self.last_seen = proxy.clock.now_ms()
+        for data in drain(self.sock):
+            proxy.relay(proxy.downstream, self, data)
+
+    def send(self, data):
+        try:
+            self.sock.send(data)
+        except (BlockingIOError, ConnectionRefusedError):
+            # kernel buffer full or service not up: the datagram is gone, like on a real network
+            self.proxy.send_errors += 1
+
+    def close(self):
+        self.sock.close()
+
+
+class ImpairmentProxy:
+    """
+    Listening side of the relay, owns both links and the release timer.
+    Sockets are read with loop.add_reader and drained up to PROXY_READ_BATCH
+    datagrams per wakeup, asyncio datagram transports read one per wakeup.
+    """
+    def __init__(self, target_address, seed=None):
+        self.target_address = target_address
+        self.clock = MonotonicClock()
+        self.streams = RandomStreams(seed)
+        self.pool = PacketPool()
+        self.upstream = ImpairedLink(UPSTREAM, self.streams, self.pool)
+        self.downstream = ImpairedLink(DOWNSTREAM, self.streams, self.pool)
+        self.sock = None
+        self.loop = None
+        # client address -> UpstreamSession
+        self.sessions = {}
+        self.send_errors = 0
+
+        # one timer for the earliest due packet of either link
+        self._timer = None
+        self._timer_due = None
+        self.timer_callbacks = 0
+
+        # bound once, called per released packet
+        self._send_upstream = self.send_upstream
+        self._send_downstream = self.send_downstream
+
+    def configure(self, latency, loss_percent, max_jitter=None, loss_model=None, jitter_model=None):
+        for link in (self.upstream, self.downstream):
+            link.configure(latency, loss_percent, max_jitter, loss_model, jitter_model)
+
+    def set_scenario(self, preset_name):
+        """Apply a PRESET_MAP entry to both directions"""
+        data = PRESET_MAP[preset_name]
+        self.configure(data['latency'], data['loss'], None, data.get('loss_model'), data.get('jitter_model'))
+
+    def start(self, listen_port, loop=None):
+        """Bind on loopback and start relaying on the loop. Returns the listening address"""
+        self.loop = loop if loop is not None else asyncio.get_running_loop()
+        self.sock = open_socket()
+        self.sock.bind((NET_HOST, listen_port))
+        self.loop.add_reader(self.sock.fileno(), self.read_ready)
+        return self.sock.getsockname()
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        for session in self.sessions.values():
+            self.loop.remove_reader(session.sock.fileno())
+            session.close()
+        self.sessions.clear()
+        if self.sock is not None:
+            self.loop.remove_reader(self.sock.fileno())
+            self.sock.close()
+            self.sock = None
+
+    def read_ready(self):
+        sessions = self.sessions
+        time_now_ms = self.clock.now_ms()
+        for data, address in drain_from(self.sock):
+            session = sessions.get(address)
+            if session is None:
+                session = self.open_session(address)
+            session.last_seen = time_now_ms
+            self.relay(self.upstream, session, data)
+
+    def open_session(self, client_address):
+        session = UpstreamSession(self, client_address)
+        self.sessions[client_address] = session
+        self.loop.add_reader(session.sock.fileno(), session.read_ready)
+        return session
+
+    def close_idle_sessions(self):
+        time_now = self.clock.now_ms()
+        for client_address, session in list(self.sessions.items()):
+            if time_now - session.last_seen > PROXY_SESSION_TIMEOUT:
+                self.loop.remove_reader(session.sock.fileno())
+                session.close()
+                del self.sessions[client_address]
+
+    def relay(self, link, session, data):
+        """Impair one datagram, arm the timer if it is now the first one due"""
+        time_due = link.submit(session, data, self.clock.now_ns())
+        if time_due is not None and (self._timer_due is None or time_due < self._timer_due):
+            self.arm_timer(time_due)
+
+    def arm_timer(self, time_due):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer_due = time_due
+        delay_seconds = max(0, time_due - self.clock.now_ns()) / 1e9
+        self._timer = self.loop.call_later(delay_seconds, self.release_due)
+
+    def release_due(self):
+        """Timer callback: send every packet due within the slack, re-arm for the next"""
+        self._timer = None
+        self._timer_due = None
+        self.timer_callbacks += 1
+        time_now = self.clock.now_ns()
+        self.upstream.release_due(time_now, self._send_upstream, TIMER_SLACK_NS)
+        self.downstream.release_due(time_now, self._send_downstream, TIMER_SLACK_NS)
+
+        next_due = [due for due in (self.upstream.next_due_time(), self.downstream.next_due_time()) if due is not None]
+        if next_due:
+            self.arm_timer(min(next_due))
+
+    def send_upstream(self, session, data):
+        session.send(data)
+
+    def send_downstream(self, session, data):
+        try:
+            self.sock.sendto(data, session.client_address)
+        except (BlockingIOError, ConnectionRefusedError):
+            self.send_errors += 1
+
+    def get_stats(self):
+        return {UPSTREAM : self.upstream.get_stats(), DOWNSTREAM : self.downstream.get_stats()}
+
+
+def open_socket():
+    """
+    Non-blocking udp socket with kernel buffers big enough for bursts,
+    a timer callback can release thousands of datagrams at once
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    for option in (socket.SO_RCVBUF, socket.SO_SNDBUF):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, option, PROXY_SOCKET_BUFFER)
+        except OSError:
+            pass
+    return sock
+
+
+def drain(sock):
+    """Up to PROXY_READ_BATCH datagrams waiting on a connected socket"""
+    for _ in range(PROXY_READ_BATCH):
+        try:
+            yield sock.recv(PROXY_MAX_DATAGRAM)
+        except (BlockingIOError, ConnectionRefusedError):
+            return
+
+
+def drain_from(sock):
+    """Up to PROXY_READ_BATCH (data, address) waiting on the listening socket"""
+    for _ in range(PROXY_READ_BATCH):
+        try:
+            yield sock.recvfrom(PROXY_MAX_DATAGRAM)
+        except (BlockingIOError, ConnectionRefusedError):
+            return
+
+
+def format_stats(proxy, previous, interval_seconds):
+    """One live stats line, rates since the previous stats"""
+    parts = []
+    stats = proxy.get_stats()
+    for direction in (UPSTREAM, DOWNSTREAM):
+        link = stats[direction]
+        rate = (link['sent'] - previous.get(direction, 0)) / interval_seconds
+        previous[direction] = link['sent']
+        parts.append(f"{direction} {rate:>9,.0f} pkt/s lost {link['loss rate']:.1f}% "
+                     f"delay {link['mean delay']:.1f}/{link['max delay']:.1f} ms "
+                     f"in flight {link['in flight']}")
+    return ' | '.join(parts) + f" | clients {len(proxy.sessions)} send errors {proxy.send_errors}"
+
+
+async def run_proxy(target_address, listen_port, preset=None, latency=None, loss=None, max_jitter=None, seed=None):
+    proxy = ImpairmentProxy(target_address, seed)
+    if preset is not None:
+        proxy.set_scenario(preset)
+    if latency is not None or loss is not None or max_jitter is not None:
+        settings = PRESET_MAP.get(preset, {})
+        proxy.configure(latency if latency is not None else settings.get('latency', 0),
+                        loss if loss is not None else settings.get('loss', 0.0),
+                        max_jitter, settings.get('loss_model'), settings.get('jitter_model'))
+
+    proxy.start(listen_port)
+    print(f"relaying {NET_HOST}:{listen_port} -> {target_address[0]}:{target_address[1]}")
+    previous = {}
+    try:
+        while True:
+            await asyncio.sleep(PROXY_STATS_INTERVAL / 1000)
+            print(format_stats(proxy, previous, PROXY_STATS_INTERVAL / 1000))
+            proxy.close_idle_sessions()
+    finally:
+        proxy.close()
+
+
+def parse_address(text):
+    """'host:port' on loopback only"""
+    host, _, port = text.rpartition(':')
+    host = host or NET_HOST
+    if not ipaddress.ip_address(host).is_loopback:
+        raise argparse.ArgumentTypeError(f"{host} is not a loopback address")
+    return host, int(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Loopback UDP relay applying latency, jitter and loss")
+    parser.add_argument('--target', type=parse_address, required=True, help="service address, e.g. 127.0.0.1:9000")
+    parser.add_argument('--listen-port', type=int, default=PROXY_PORT)
+    parser.add_argument('--preset', choices=list(PRESET_MAP))
+    parser.add_argument('--latency', type=int, help="one way ms, overrides the preset")
+    parser.add_argument('--loss', type=float, help="%%, overrides the preset")
+    parser.add_argument('--jitter', type=float, help="max jitter ms, default from JITTER_MAP")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run_proxy(args.target, args.listen_port, args.preset, args.latency, args.loss,
+                              args.jitter, args.seed))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()